@@ -0,0 +1,51 @@
+"""
+Ranking metrics for the suggester evaluation, computed over whole arrays of
+ranks at once.
+
+A rank is the 1-based position of the sought entity in the suggestion list,
+with 0 meaning the entity was not suggested at all. As there is a single
+relevant item per query, relevance is binary (see README.md).
+"""
+
+import numpy as np
+
+
+def binary_ndcg(ranks):
+    """
+    nDCG per query for binary relevance: 1 at rank 1, 1/log2(rank) below that
+    and 0 if not found. This is the formula used for the Phase 1 evaluation,
+    kept so that results remain comparable with test_ranks.txt.
+    """
+    ranks = np.asarray(ranks, dtype=float)
+    ndcg = np.zeros(ranks.shape)
+    found = ranks > 1
+    ndcg[found] = 1.0 / np.log2(ranks[found])
+    ndcg[ranks == 1] = 1.0
+    return ndcg
+
+
+def reciprocal_rank(ranks):
+    """
+    Reciprocal rank per query, 0 if not found
+    """
+    ranks = np.asarray(ranks, dtype=float)
+    rr = np.zeros(ranks.shape)
+    found = ranks > 0
+    rr[found] = 1.0 / ranks[found]
+    return rr
+
+
+def summarise(ranks):
+    """
+    Returns the mean nDCG, MRR and found@1 / found-at-all rates for a list of ranks
+    """
+    ranks = np.asarray(ranks, dtype=float)
+    if ranks.size == 0:
+        return { 'queries' : 0, 'ndcg' : 0.0, 'mrr' : 0.0, 'found_at_1' : 0.0, 'found' : 0.0 }
+    return {
+        'queries' : int(ranks.size),
+        'ndcg' : float(binary_ndcg(ranks).mean()),
+        'mrr' : float(reciprocal_rank(ranks).mean()),
+        'found_at_1' : float((ranks == 1).mean()),
+        'found' : float((ranks > 0).mean())
+    }
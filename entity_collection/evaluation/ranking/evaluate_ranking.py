@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Usage: python3 evaluate_ranking.py [--endpoint URL [--endpoint URL]] [--permuted] [--refresh]
+#
+# Ranking evaluation of the suggester over the testbed in ../test_strings.txt.
+#
+# Queries are run concurrently, and raw responses are kept in the response
+# store (../responses.db by default), so that re-scoring after a change to
+# this script or to the metrics needs no further requests; pass --refresh to
+# re-query the endpoints. Given two endpoints, the per-query results are shown
+# side by side with the change in nDCG.
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import metrics
+from response_store import ResponseStore, DEFAULT_STORE
+from testbed import load_test_strings, TEST_STRINGS, TEST_STRINGS_PERMUTED
+
+AUTOSUGGEST_API = "http://test-entity.europeana.eu/entity/suggest?wskey=apidemo&text="
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), 'ranking_results.tsv')
+
+
+def find_rank(body, sought_id):
+    """
+    Returns the 1-based position of sought_id in a suggest API response, or 0
+    """
+    try:
+        suggestions = json.loads(body.decode('utf-8'))['contains']
+    except (ValueError, KeyError):
+        return 0
+    for i, contained in enumerate(suggestions):
+        if contained.get('@id') == sought_id:
+            return i + 1
+    return 0
+
+
+def rank_endpoint(store, endpoint, test_strings, concurrency=8, refresh=False):
+    """
+    Returns the rank of the sought entity for every (label, query, id) in test_strings
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_maxsize=concurrency))
+    session.mount('https://', HTTPAdapter(pool_maxsize=concurrency))
+
+    def rank(test_string):
+        (_, query, sought_id) = test_string
+        try:
+            (status, _, body) = store.fetch(session, endpoint, query, refresh)
+        except requests.exceptions.RequestException as e:
+            print("request failed for [%s]: %s" % (query, e))
+            return 0
+        if status != 200:
+            print("request failed for [%s]: status %s" % (query, status))
+            return 0
+        return find_rank(body, sought_id)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(rank, test_strings))
+
+
+def print_summary(endpoint, summary):
+    print("%s\n  queries: %d  nDCG: %.4f  MRR: %.4f  found@1: %.2f  found: %.2f" %
+          (endpoint, summary['queries'], summary['ndcg'], summary['mrr'], summary['found_at_1'], summary['found']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ranking evaluation of the entity suggester")
+    parser.add_argument('--endpoint', action='append', help="suggest URL to which the query is appended (give twice to compare)")
+    parser.add_argument('--permuted', action='store_true', help="use the permuted testbed")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--refresh', action='store_true', help="re-query endpoints instead of using stored responses")
+    parser.add_argument('--store', default=DEFAULT_STORE, help="response store location")
+    args = parser.parse_args()
+
+    endpoints = args.endpoint or [AUTOSUGGEST_API]
+    if len(endpoints) > 2:
+        parser.error("at most two endpoints can be compared")
+    test_strings = load_test_strings(TEST_STRINGS_PERMUTED if args.permuted else TEST_STRINGS)
+    store = ResponseStore(args.store)
+
+    all_ranks = [rank_endpoint(store, endpoint, test_strings, args.concurrency, args.refresh) for endpoint in endpoints]
+    all_ndcgs = [metrics.binary_ndcg(ranks) for ranks in all_ranks]
+    store.close()
+
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as results:
+        header = ["query", "sought_id"]
+        for i in range(len(endpoints)):
+            header.extend(["rank_" + str(i + 1), "ndcg_" + str(i + 1)])
+        if len(endpoints) == 2:
+            header.append("ndcg_change")
+        results.write("\t".join(header) + "\n")
+        for j, (_, query, sought_id) in enumerate(test_strings):
+            row = [query, sought_id]
+            for i in range(len(endpoints)):
+                row.extend([str(all_ranks[i][j]), "%.4f" % all_ndcgs[i][j]])
+            if len(endpoints) == 2:
+                change = all_ndcgs[1][j] - all_ndcgs[0][j]
+                row.append("%+.4f" % change)
+                if change != 0:
+                    print("%-12s %3d -> %3d  (%+.4f)" % (query, all_ranks[0][j], all_ranks[1][j], change))
+            results.write("\t".join(row) + "\n")
+
+    summaries = [metrics.summarise(ranks) for ranks in all_ranks]
+    for endpoint, summary in zip(endpoints, summaries):
+        print_summary(endpoint, summary)
+    if len(endpoints) == 2:
+        print("nDCG change: %+.4f  MRR change: %+.4f" %
+              (summaries[1]['ndcg'] - summaries[0]['ndcg'], summaries[1]['mrr'] - summaries[0]['mrr']))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Usage: python3 record_responses.py [--endpoint URL ...] [--concurrency 1] [--store responses.db]
+#
+# Records the suggest responses needed by the responsiveness and ranking
+# evaluations - every typing prefix of every testbed string - into the
+# response store, together with their latencies. Once recorded, the
+# evaluations can be run offline against stub_server.py --replay.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from response_store import ResponseStore, DEFAULT_STORE
+from testbed import load_test_strings, typing_prefixes, TEST_STRINGS, TEST_STRINGS_PERMUTED
+
+# the endpoints used by responsiveness/ and ranking/
+DEFAULT_ENDPOINTS = [
+    "http://144.76.218.178:9191/solr/ec_dev_cloud/suggestEntity?wt=json&indent=true&q=",
+    "http://test-entity.europeana.eu/entity/suggest?wskey=apidemo&text="
+]
+
+
+def testbed_queries():
+    queries = set()
+    for testbed in (TEST_STRINGS, TEST_STRINGS_PERMUTED):
+        for (_, auto_string, _) in load_test_strings(testbed):
+            queries.update(typing_prefixes(auto_string))
+    return sorted(queries)
+
+
+def record(store, endpoint, queries, concurrency=1):
+    session = requests.Session()
+
+    def record_query(query):
+        try:
+            (status, _, _) = store.fetch(session, endpoint, query, refresh=True)
+            return status == 200
+        except requests.exceptions.RequestException as e:
+            print("request failed for [%s]: %s" % (query, e))
+            return False
+
+    # recording serially by default, so that latencies reflect an unloaded server
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        recorded = sum(executor.map(record_query, queries))
+    print("%d of %d responses recorded from %s" % (recorded, len(queries), endpoint))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record suggest responses for offline replay")
+    parser.add_argument('--endpoint', action='append', help="suggest URL to which the query is appended")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--store', default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    store = ResponseStore(args.store)
+    queries = testbed_queries()
+    for endpoint in (args.endpoint or DEFAULT_ENDPOINTS):
+        record(store, endpoint, queries, args.concurrency)
+    store.close()
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_STORE = os.path.join(os.path.dirname(__file__), 'responses.db')
+
+
+class ResponseStore:
+    """
+    On-disk store of raw suggest responses, keyed by endpoint + query.
+
+    Evaluation runs read responses from here where available and only query
+    the live endpoint on a miss (or when refresh is requested), so that
+    re-scoring a testbed needs no network traffic. Bodies are stored
+    zlib-compressed together with the status code and the latency observed
+    when they were recorded.
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT, query TEXT, status INTEGER, latency REAL, body BLOB, recorded REAL)")
+
+    @staticmethod
+    def make_key(endpoint, query):
+        return hashlib.sha1((endpoint + "\n" + query).encode('utf-8')).hexdigest()
+
+    def get(self, endpoint, query):
+        """
+        Returns (status, latency, body bytes) for a stored response, or None
+        """
+        with self.lock:
+            row = self.db.execute("SELECT status, latency, body FROM responses WHERE key=?", (self.make_key(endpoint, query),)).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1], zlib.decompress(row[2]))
+
+    def put(self, endpoint, query, status, latency, body):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (self.make_key(endpoint, query), endpoint, query, status, latency, zlib.compress(body), time.time()))
+
+    def fetch(self, session, endpoint, query, refresh=False, timeout=30):
+        """
+        Returns (status, latency, body bytes) for endpoint + query, from the
+        store if present, otherwise from the live endpoint (storing the result)
+        """
+        if not refresh:
+            stored = self.get(endpoint, query)
+            if stored is not None:
+                return stored
+        from urllib.parse import quote
+        start = time.time()
+        res = session.get(endpoint + quote(query), timeout=timeout)
+        body = res.content
+        latency = time.time() - start
+        # only successful responses are worth replaying
+        if res.status_code == 200:
+            self.put(endpoint, query, res.status_code, latency, body)
+        return (res.status_code, latency, body)
+
+    def endpoints(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT endpoint FROM responses")]
+
+    def size(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.db.close()
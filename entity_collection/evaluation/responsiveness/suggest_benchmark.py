@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Usage: python3 suggest_benchmark.py [--url URL] [--concurrency 10] [--rate 50] [--baseline baseline.json]
+#                                     [--tolerance 0.2] [--error-tolerance 0.01] [--save-baseline]
+#
+# Load test of the suggest handler over the testbed in ../test_strings.txt.
+#
+# Each test string is replayed as a typing session ('Pet', 'Pete', 'Peter');
+# --concurrency sessions run at once, so that the handler sees the overlapping
+# traffic of several users typing, and --rate caps the total number of requests
+# per second. Latency percentiles, throughput and errors are written to
+# benchmark_results.json and, if a baseline is given, compared against it.
+# The baseline (baseline.json next to this script, written with
+# --save-baseline) is kept under version control, so that every run and CI
+# compare against the same figures; benchmark_results.json is not.
+#
+# To benchmark the harness itself rather than a server, start ../stub_server.py
+# and pass --url http://localhost:8983/suggest?q=
+
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from testbed import load_test_strings, typing_prefixes
+
+COMPLETE_HANDLER = "http://144.76.218.178:9191/solr/ec_dev_cloud/suggestEntity?wt=json&indent=true&q="
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_results.json')
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+COMPARED_STATS = ['mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly so that no more than rate requests per second are
+    sent across all threads. A rate of None or 0 means no limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(latencies, errors, elapsed):
+    latencies_ms = sorted([latency * 1000 for latency in latencies])
+    total = len(latencies_ms) + errors
+    return {
+        'requests' : total,
+        'errors' : errors,
+        'error_rate' : errors / float(total) if total else 0.0,
+        'elapsed_s' : elapsed,
+        'throughput_rps' : total / elapsed if elapsed > 0 else 0.0,
+        'mean_ms' : sum(latencies_ms) / len(latencies_ms) if latencies_ms else 0.0,
+        'p50_ms' : percentile(latencies_ms, 50),
+        'p90_ms' : percentile(latencies_ms, 90),
+        'p99_ms' : percentile(latencies_ms, 99),
+        'max_ms' : latencies_ms[-1] if latencies_ms else 0.0
+    }
+
+
+def run_benchmark(url, sessions, concurrency, rate=None, think_time=0, timeout=10):
+    """
+    Runs the typing sessions (lists of queries) against url with the given
+    number of concurrent users. Returns the summary statistics.
+    """
+    import requests
+
+    session_queue = queue.Queue()
+    for session in sessions:
+        session_queue.put(session)
+    limiter = RateLimiter(rate)
+    latencies = []
+    errors = [0]
+    results_lock = threading.Lock()
+
+    def user():
+        http = requests.Session()
+        while True:
+            try:
+                prefixes = session_queue.get_nowait()
+            except queue.Empty:
+                return
+            for prefix in prefixes:
+                limiter.wait()
+                start = time.time()
+                try:
+                    res = http.get(url + quote(prefix), timeout=timeout)
+                    res.content
+                    ok = res.status_code == 200
+                except requests.exceptions.RequestException:
+                    ok = False
+                roundtrip = time.time() - start
+                with results_lock:
+                    if ok:
+                        latencies.append(roundtrip)
+                    else:
+                        errors[0] += 1
+                if think_time:
+                    time.sleep(think_time)
+
+    start = time.time()
+    users = [threading.Thread(target=user) for _ in range(concurrency)]
+    for u in users:
+        u.start()
+    for u in users:
+        u.join()
+    return summarise(latencies, errors[0], time.time() - start)
+
+
+def compare_to_baseline(stats, baseline, tolerance, error_tolerance=0.01):
+    """
+    Prints current against baseline figures and returns the list of latency
+    statistics that are more than tolerance (a fraction) worse than baseline,
+    plus 'error_rate' if the error rate rose by more than error_tolerance
+    (an absolute difference of rates, 0.01 being one percentage point)
+    """
+    regressions = []
+    print("%-16s %12s %12s %9s" % ("", "baseline", "current", "change"))
+    for stat in COMPARED_STATS + ['throughput_rps', 'error_rate']:
+        old, new = baseline.get(stat, 0.0), stats[stat]
+        change = (new - old) / old * 100 if old else 0.0
+        print("%-16s %12.2f %12.2f %+8.1f%%" % (stat, old, new, change))
+        if stat in COMPARED_STATS and old and new > old * (1 + tolerance):
+            regressions.append(stat)
+    if stats['error_rate'] > baseline.get('error_rate', 0.0) + error_tolerance:
+        regressions.append('error_rate')
+    return regressions
+
+
+def print_stats(stats):
+    print("requests: %d (errors: %d)  throughput: %.1f req/s" % (stats['requests'], stats['errors'], stats['throughput_rps']))
+    print("latency ms  mean: %.1f  p50: %.1f  p90: %.1f  p99: %.1f  max: %.1f" %
+          (stats['mean_ms'], stats['p50_ms'], stats['p90_ms'], stats['p99_ms'], stats['max_ms']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent latency benchmark of the suggest handler")
+    parser.add_argument('--url', default=COMPLETE_HANDLER, help="handler URL, to which the query is appended")
+    parser.add_argument('--concurrency', type=int, default=10, help="number of simultaneous typing users")
+    parser.add_argument('--rate', type=float, default=0, help="maximum requests per second (0: unlimited)")
+    parser.add_argument('--think-time', type=float, default=0, help="pause between keystrokes in milliseconds")
+    parser.add_argument('--repeat', type=int, default=1, help="number of passes over the testbed")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed fractional slowdown before failing")
+    parser.add_argument('--error-tolerance', type=float, default=0.01,
+                        help="allowed rise of the error rate before failing (0.01: one percentage point)")
+    args = parser.parse_args()
+
+    sessions = [typing_prefixes(auto_string) for (_, auto_string, _) in load_test_strings()] * args.repeat
+    stats = run_benchmark(args.url, sessions, args.concurrency, args.rate, args.think_time / 1000.0)
+    stats['url'] = args.url
+    stats['concurrency'] = args.concurrency
+    stats['rate'] = args.rate
+    print_stats(stats)
+
+    with open(RESULTS_FILE, 'w') as results:
+        json.dump(stats, results, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(stats, baseline_file, indent=2)
+        print("baseline saved to " + args.baseline)
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_to_baseline(stats, baseline, args.tolerance, args.error_tolerance)
+        if regressions:
+            print("REGRESSION in: " + ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Usage: python3 stub_server.py [--port 8983] [--latency 50]
+#        python3 stub_server.py --replay [responses.db] [--latency-scale 1.0]
+#
+# Local stand-in for the suggest endpoints, so that the evaluation harnesses
+# can run without network access.
+#
+# By default every request is answered with an empty suggestion list after a
+# fixed delay. With --replay, requests are answered from the response store
+# populated by record_responses.py: the request path is matched against the
+# recorded endpoints (ignoring scheme and host), and the recorded body is
+# returned after the recorded latency. Unrecorded queries get a 404.
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote, urlsplit
+
+from response_store import ResponseStore, DEFAULT_STORE
+
+EMPTY_SUGGESTIONS = json.dumps({ 'contains' : [] }).encode('utf-8')
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_body(200, EMPTY_SUGGESTIONS)
+
+    def send_body(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the console quiet under load
+        pass
+
+
+class ReplayHandler(StubHandler):
+
+    store = None
+    latency_scale = 1.0
+    # (request path prefix, recorded endpoint), longest prefix first
+    endpoint_paths = []
+
+    @classmethod
+    def load_store(cls, store):
+        cls.store = store
+        paths = []
+        for endpoint in store.endpoints():
+            parts = urlsplit(endpoint)
+            paths.append((parts.path + ('?' + parts.query if parts.query else ''), endpoint))
+        cls.endpoint_paths = sorted(paths, key=lambda path: len(path[0]), reverse=True)
+
+    def do_GET(self):
+        for (path_prefix, endpoint) in self.endpoint_paths:
+            if self.path.startswith(path_prefix):
+                recorded = self.store.get(endpoint, unquote(self.path[len(path_prefix):]))
+                if recorded is not None:
+                    (status, latency, body) = recorded
+                    time.sleep(latency * self.latency_scale)
+                    self.send_body(status, body)
+                    return
+        self.send_body(404, EMPTY_SUGGESTIONS)
+
+
+def serve(handler_class, port):
+    server = ThreadedHTTPServer(('localhost', port), handler_class)
+    print("serving on http://localhost:%s/" % port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stub of the suggest endpoints")
+    parser.add_argument('--port', type=int, default=8983)
+    parser.add_argument('--latency', type=float, default=0, help="response delay in milliseconds")
+    parser.add_argument('--replay', nargs='?', const=DEFAULT_STORE, help="replay responses from this store")
+    parser.add_argument('--latency-scale', type=float, default=1.0, help="multiplier applied to recorded latencies")
+    args = parser.parse_args()
+    if args.replay:
+        ReplayHandler.load_store(ResponseStore(args.replay))
+        ReplayHandler.latency_scale = args.latency_scale
+        print("replaying %d responses from %s" % (ReplayHandler.store.size(), args.replay))
+        serve(ReplayHandler, args.port)
+    else:
+        StubHandler.latency = args.latency / 1000.0
+        serve(StubHandler, args.port)
@@ -0,0 +1,30 @@
+import os
+
+# the 50-item Best Bets testbed described in README.md
+TEST_STRINGS = os.path.join(os.path.dirname(__file__), 'test_strings.txt')
+TEST_STRINGS_PERMUTED = os.path.join(os.path.dirname(__file__), 'test_strings_permuted.txt')
+
+# autocomplete is not triggered by Solr until at least 3 characters have been entered
+MIN_PREFIX_LENGTH = 3
+
+
+def load_test_strings(path=TEST_STRINGS):
+    """
+    Loads the testbed as a list of (label, autocomplete string, sought entity id)
+    """
+    test_strings = []
+    with open(path, 'r', encoding='utf-8') as testfile:
+        for line in testfile:
+            if line.strip() == "":
+                continue
+            (label, auto_string, sought_id) = line.split("\t")
+            test_strings.append((label, auto_string, sought_id.strip()))
+    return test_strings
+
+
+def typing_prefixes(auto_string, min_length=MIN_PREFIX_LENGTH):
+    """
+    Returns the sequence of queries a user typing auto_string would trigger,
+    e.g. 'Peter' -> ['Pet', 'Pete', 'Peter']
+    """
+    return [auto_string[0:i] for i in range(min_length, len(auto_string) + 1)]
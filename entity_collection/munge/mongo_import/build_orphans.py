@@ -1,7 +1,19 @@
+# Usage: python3 build_orphans.py [--solr] [<missing_entities_file>]
+#
+# Rebuilds the entities listed (one id per line) in the missing entities log,
+# writing them to shared chunk files or, with --solr, straight to the
+# Entity Collection core
+import sys
 from entities.ContextClassHarvesters import IndividualEntityBuilder as ieb
-b = ieb()
 
-with open("logs/import_tests/missing_entities.log", "r") as me:
-    for line in me.readlines():
-        sline = line.strip()
-        b.build_individual_entity(sline)
+args = sys.argv[1:]
+to_solr = '--solr' in args
+args = [arg for arg in args if arg != '--solr']
+missing_file = args[0] if len(args) > 0 else "logs/import_tests/missing_entities.log"
+
+with open(missing_file, "r") as me:
+    entity_ids = [line.strip() for line in me if line.strip() != ""]
+
+b = ieb()
+not_found = b.build_entities(entity_ids, to_solr=to_solr)
+print(str(len(entity_ids) - len(not_found)) + " of " + str(len(entity_ids)) + " missing entities rebuilt.")
@@ -201,15 +201,20 @@ class ContextClassHarvester:
         #return default mongo port, the subclasses may use the type based config (e.g. see also organizations host)
         return self.config.get_mongo_port()
         
-    def build_solr_doc(self, entities, start):
+    def build_solr_doc(self, entities, start, close_client=True, writepath=None):
+        docroot = self.build_solr_docroot(entities)
+        if(close_client):
+            self.client.close()
+        return self.write_to_file(docroot, start, writepath)
+
+    def build_solr_docroot(self, entities):
         from xml.etree import ElementTree as ET
 
         docroot = ET.Element('add')
         for entity_id, values  in entities.items():
             print("processing entity:" + entity_id)
             self.build_entity_doc(docroot, entity_id, values)
-        self.client.close()
-        return self.write_to_file(docroot, start)
+        return docroot
 
     def add_field_list(self, docroot, field_name, values):
         if(values is None):
@@ -233,11 +238,12 @@ class ContextClassHarvester:
         field_value = field_value.replace("\t", " ")
         return field_value
 
-    def write_to_file(self, doc, start):
+    def write_to_file(self, doc, start, writepath=None):
         from xml.etree import ElementTree as ET
         from xml.dom import minidom
         import io
-        writepath = self.get_writepath(start)
+        if(writepath is None):
+            writepath = self.get_writepath(start)
         roughstring = ET.tostring(doc, encoding='utf-8')
         reparsed = minidom.parseString(roughstring)
         reparsed = reparsed.toprettyxml(encoding='utf-8', indent="     ").decode('utf-8')
@@ -564,18 +570,35 @@ class OrganizationHarvester(ContextClassHarvester):
 class IndividualEntityBuilder:
     
     TESTDIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'testfiles', 'dynamic')
+    # maximum number of ids per Mongo $in query when building in batch
+    MONGO_BATCH_SIZE = 1000
+    # seconds to wait for the Entity Collection Solr core to answer an update or commit
+    SOLR_TIMEOUT = 300
 
-    def build_individual_entity(self, entity_id, is_test=False):
-        from pymongo import MongoClient
-        import shutil
+    def get_entity_type(self, entity_id):
         if(entity_id.find("/place/") > 0):
-            harvester = PlaceHarvester()
+            return "place"
         elif(entity_id.find("/agent/") > 0):
-            harvester = AgentHarvester()
+            return "agent"
         elif(entity_id.find("/organization/") > 0):
-            harvester = OrganizationHarvester()
+            return "organization"
         else:
-            harvester = ConceptHarvester()
+            return "concept"
+
+    def get_harvester(self, entity_type):
+        if(entity_type == "place"):
+            return PlaceHarvester()
+        elif(entity_type == "agent"):
+            return AgentHarvester()
+        elif(entity_type == "organization"):
+            return OrganizationHarvester()
+        else:
+            return ConceptHarvester()
+
+    def build_individual_entity(self, entity_id, is_test=False):
+        from pymongo import MongoClient
+        import shutil
+        harvester = self.get_harvester(self.get_entity_type(entity_id))
         
         self.client = MongoClient(harvester.get_mongo_host(), harvester.get_mongo_port())
         entity_rows = self.client.annocultor_db.TermList.find_one({ "codeUri" : entity_id })
@@ -596,6 +619,80 @@ class IndividualEntityBuilder:
 #            print("No entity with that ID found in database. " + str(e))
 #            return
 
+    def build_entities(self, entity_ids, to_solr=False):
+        """
+        Builds many entities at once - typically the orphans listed in
+        logs/import_tests/missing_entities.log after a partially failed import.
+
+        Entities are grouped by type, and each group is harvested by a single
+        harvester (and so a single MongoClient), fetching the Mongo records in
+        bulk. The resulting docs are written to shared files of CHUNK_SIZE
+        entities (<type>_orphans_<n>.xml, numbered on from the orphan files
+        already written so that earlier runs are not overwritten) or, if
+        to_solr is set, posted directly to the Entity Collection Solr core.
+
+        Returns the list of ids that could not be found in Mongo.
+        """
+        by_type = {}
+        for entity_id in entity_ids:
+            by_type.setdefault(self.get_entity_type(entity_id), []).append(entity_id)
+
+        not_found = []
+        for entity_type, type_ids in by_type.items():
+            harvester = self.get_harvester(entity_type)
+            entity_rows = {}
+            for i in range(0, len(type_ids), IndividualEntityBuilder.MONGO_BATCH_SIZE):
+                id_batch = type_ids[i:i + IndividualEntityBuilder.MONGO_BATCH_SIZE]
+                for row in harvester.client.annocultor_db.TermList.find({ "codeUri" : { "$in" : id_batch } }):
+                    entity_rows[row['codeUri']] = row
+            # keep the order of the input file
+            found_ids = [entity_id for entity_id in type_ids if entity_id in entity_rows]
+            not_found.extend([entity_id for entity_id in type_ids if entity_id not in entity_rows])
+
+            chunk_size = ContextClassHarvester.CHUNK_SIZE
+            first_chunk_no = 0 if to_solr else self.next_orphan_chunk_no(harvester)
+            for chunk_no, i in enumerate(range(0, len(found_ids), chunk_size), first_chunk_no):
+                entity_chunk = dict([(entity_id, entity_rows[entity_id]) for entity_id in found_ids[i:i + chunk_size]])
+                if(to_solr):
+                    docroot = harvester.build_solr_docroot(entity_chunk)
+                    self.post_to_solr(harvester, docroot)
+                    print(str(len(entity_chunk)) + " " + harvester.name + " posted to Solr.")
+                else:
+                    writepath = harvester.write_dir + "/" + harvester.name + "_orphans_" + str(chunk_no) + ".xml"
+                    harvester.build_solr_doc(entity_chunk, i, close_client=False, writepath=writepath)
+                    print(str(len(entity_chunk)) + " " + harvester.name + " written to " + writepath)
+            if(to_solr and len(found_ids) > 0):
+                self.commit_solr(harvester)
+            harvester.client.close()
+
+        for entity_id in not_found:
+            print("No entity with ID " + entity_id + " found in database.")
+        return not_found
+
+    def next_orphan_chunk_no(self, harvester):
+        """
+        Returns the number following the highest <type>_orphans_<n>.xml file
+        already in the harvester's write directory
+        """
+        import re
+        if(not os.path.isdir(harvester.write_dir)):
+            return 0
+        orphan_file = re.compile(re.escape(harvester.name) + r"_orphans_(\d+)\.xml$")
+        chunk_nos = [int(match.group(1)) for match in map(orphan_file.match, os.listdir(harvester.write_dir)) if match is not None]
+        return max(chunk_nos) + 1 if len(chunk_nos) > 0 else 0
+
+    def post_to_solr(self, harvester, docroot):
+        import requests
+        from xml.etree import ElementTree as ET
+        update_uri = harvester.config.get_entity_solr() + "/update"
+        res = requests.post(update_uri, data=ET.tostring(docroot, encoding='utf-8'), headers={ "Content-Type" : "text/xml; charset=utf-8" }, timeout=IndividualEntityBuilder.SOLR_TIMEOUT)
+        res.raise_for_status()
+
+    def commit_solr(self, harvester):
+        import requests
+        res = requests.get(harvester.config.get_entity_solr() + "/update", params={ "commit" : "true" }, timeout=IndividualEntityBuilder.SOLR_TIMEOUT)
+        res.raise_for_status()
+
 class ChunkBuilder:
 
     def __init__(self, entity_type, start):
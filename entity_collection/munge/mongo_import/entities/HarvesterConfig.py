@@ -6,6 +6,7 @@ class HarvesterConfig:
     HARVESTER_MONGO_HOST = 'harvester.mongo.host'
     HARVESTER_MONGO_PORT = 'harvester.mongo.port'
     HARVESTER_RELEVANCE_SOLR_URI = 'harvester.relevance.solr.core.uri'
+    HARVESTER_ENTITY_SOLR_URI = 'harvester.entity.solr.core.uri'
     HARVESTER_RELEVANCE_RANKING_MODEL = "harvester.relevance.ranking.model"
     HARVESTER_RELEVANCE_RANKING_MODEL_DEFAULT = "default"
     HARVESTER_RELEVANCE_RANKING_MODEL_NORMALIZED = "normalized"
@@ -33,6 +34,10 @@ class HarvesterConfig:
         key = HarvesterConfig.HARVESTER_RELEVANCE_SOLR_URI
         return self.config.get(HarvesterConfig.DEFAULT_CONFIG_SECTION, key)
         
+    def get_entity_solr (self):
+        key = HarvesterConfig.HARVESTER_ENTITY_SOLR_URI
+        return self.config.get(HarvesterConfig.DEFAULT_CONFIG_SECTION, key).rstrip('/')
+        
     def get_relevance_ranking_model (self):
         key = HarvesterConfig.HARVESTER_RELEVANCE_RANKING_MODEL
         ranking_model = self.config.get(HarvesterConfig.DEFAULT_CONFIG_SECTION, key)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Usage: python3 WikidataCache.py <wikidata_dump.json[.bz2|.gz]> [<lang> ...]
+
+import bz2
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class WikidataCache:
+    """
+       Persistent local cache of Wikidata label -> QID and QID -> labels lookups.
+
+       Lookups are answered from a sqlite database where possible, falling back
+       to the Wikidata API (wbsearchentities / wbgetentities) on a miss and
+       storing the answer for next time. Entries older than ttl seconds are
+       refreshed; failed lookups are remembered for negative_ttl seconds so that
+       batch runs do not keep retrying unknown labels.
+
+       The cache can be preloaded from a Wikidata JSON dump, so that batch runs
+       need make no network requests at all for entities found in the dump.
+    """
+
+    DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'cache', 'wikidata.db')
+    API_URL = "https://www.wikidata.org/w/api.php"
+    DEFAULT_TTL = 30 * 24 * 3600
+    DEFAULT_NEGATIVE_TTL = 24 * 3600
+    PRELOAD_BATCH_SIZE = 10000
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, offline=False):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # in offline mode misses are not resolved against the API
+        self.offline = offline
+        self.session = None
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS label_qid (label TEXT, lang TEXT, qid TEXT, fetched REAL, PRIMARY KEY (label, lang)) WITHOUT ROWID")
+            self.db.execute("CREATE TABLE IF NOT EXISTS qid_labels (qid TEXT PRIMARY KEY, labels TEXT, fetched REAL) WITHOUT ROWID")
+
+    def get_qid(self, label, lang='en'):
+        """
+        Returns the Wikidata identifier (e.g. 'Q90') best matching the
+        passed label, or None if there is none
+        """
+        key = normalize_label(label)
+        with self.lock:
+            row = self.db.execute("SELECT qid, fetched FROM label_qid WHERE label=? AND lang=?", (key, lang)).fetchone()
+        if(row is not None and self._is_fresh(row[0], row[1])):
+            return row[0]
+        if(self.offline):
+            return row[0] if row is not None else None
+        qid = self._search_qid(label, lang)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO label_qid VALUES (?, ?, ?, ?)", (key, lang, qid, time.time()))
+        return qid
+
+    def get_labels(self, qid):
+        """
+        Returns a dict of language code -> label for the passed Wikidata identifier
+        """
+        with self.lock:
+            row = self.db.execute("SELECT labels, fetched FROM qid_labels WHERE qid=?", (qid,)).fetchone()
+        if(row is not None and self._is_fresh(row[0], row[1])):
+            return json.loads(row[0])
+        if(self.offline):
+            return json.loads(row[0]) if row is not None and row[0] is not None else {}
+        labels = self._fetch_labels(qid)
+        stored = json.dumps(labels, ensure_ascii=False) if labels is not None else None
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO qid_labels VALUES (?, ?, ?)", (qid, stored, time.time()))
+        return labels if labels is not None else {}
+
+    def _is_fresh(self, value, fetched):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        return ttl is None or fetched is None or (time.time() - fetched) < ttl
+
+    def _get_session(self):
+        if(self.session is None):
+            import requests
+            self.session = requests.Session()
+        return self.session
+
+    def _search_qid(self, label, lang):
+        params = { 'format' : 'json', 'action' : 'wbsearchentities', 'language' : lang, 'limit' : 1, 'search' : label }
+        try:
+            res = self._get_session().get(WikidataCache.API_URL, params=params).json()
+            if(res.get('success') == 1 and len(res['search']) > 0):
+                return res['search'][0]['id']
+        except (ValueError, KeyError) as e:
+            print("Wikidata search failed for label " + label + ": " + str(e))
+        return None
+
+    def _fetch_labels(self, qid):
+        params = { 'format' : 'json', 'action' : 'wbgetentities', 'props' : 'labels', 'ids' : qid }
+        try:
+            res = self._get_session().get(WikidataCache.API_URL, params=params).json()
+            if(res.get('success') == 1 and qid in res['entities']):
+                labels = res['entities'][qid].get('labels', {})
+                return dict([(lang, lbl['value']) for lang, lbl in labels.items()])
+        except (ValueError, KeyError) as e:
+            print("Wikidata label retrieval failed for " + qid + ": " + str(e))
+        return None
+
+    def preload_dump(self, dump_path, langs=None):
+        """
+        Loads labels from a Wikidata JSON dump (one entity per line, as in
+        latest-all.json.bz2) into the cache. If langs is given, only labels in
+        those languages are kept. Where several entities share a label, the one
+        with the lowest QID number is kept. Returns the number of entities loaded.
+        """
+        loaded = 0
+        label_rows = []
+        qid_rows = []
+        now = time.time()
+        for entity in iter_dump_entities(dump_path):
+            qid = entity.get('id')
+            labels = dict([(lang, lbl['value']) for lang, lbl in entity.get('labels', {}).items() if langs is None or lang in langs])
+            if(qid is None or len(labels) == 0):
+                continue
+            qid_rows.append((qid, json.dumps(labels, ensure_ascii=False), now))
+            for lang, label in labels.items():
+                label_rows.append((normalize_label(label), lang, qid, now))
+            loaded += 1
+            if(len(qid_rows) >= WikidataCache.PRELOAD_BATCH_SIZE):
+                self._store_preload_batch(label_rows, qid_rows)
+                label_rows = []
+                qid_rows = []
+                print(str(loaded) + " Wikidata entities preloaded.")
+        self._store_preload_batch(label_rows, qid_rows)
+        return loaded
+
+    def _store_preload_batch(self, label_rows, qid_rows):
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO qid_labels VALUES (?, ?, ?)", qid_rows)
+            self.db.executemany("INSERT OR IGNORE INTO label_qid VALUES (?, ?, ?, ?)", label_rows)
+            self.db.executemany("UPDATE label_qid SET qid=?, fetched=? WHERE label=? AND lang=? AND (qid IS NULL OR CAST(SUBSTR(qid, 2) AS INTEGER) > ?)",
+                [(qid, fetched, label, lang, qid_number(qid)) for (label, lang, qid, fetched) in label_rows])
+
+    def close(self):
+        self.db.close()
+
+
+def normalize_label(label):
+    return " ".join(label.split()).casefold()
+
+
+def qid_number(qid):
+    try:
+        return int(qid[1:])
+    except ValueError:
+        return 0
+
+
+def iter_dump_entities(dump_path):
+    """
+    Lazily yields the entities of a Wikidata JSON dump, which is a JSON
+    array with one entity per line
+    """
+    if(dump_path.endswith(".bz2")):
+        opener = bz2.open
+    elif(dump_path.endswith(".gz")):
+        opener = gzip.open
+    else:
+        opener = open
+    with opener(dump_path, 'rt', encoding='utf-8') as dump:
+        for line in dump:
+            line = line.strip().rstrip(',')
+            if(line in ('', '[', ']')):
+                continue
+            yield json.loads(line)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        langs = set(sys.argv[2:]) if len(sys.argv) > 2 else None
+        cache = WikidataCache()
+        total = cache.preload_dump(sys.argv[1], langs)
+        print(str(total) + " Wikidata entities preloaded into " + WikidataCache.DEFAULT_DB_PATH)
+        cache.close()
+    else:
+        print("python3 WikidataCache.py <wikidata_dump.json[.bz2|.gz]> [<lang> ...]")
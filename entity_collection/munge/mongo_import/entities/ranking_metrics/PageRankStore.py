@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# Usage: python3 PageRankStore.py <wd_pr_ultimate.tsv[.bz2]> [<pagerank.db>]
+
+import bz2
+import os
+import sqlite3
+
+class PageRankStore:
+    """
+       Indexed on-disk lookup of Wikidata PageRank values.
+
+       The Wikidata PageRank archive (see ../README.md) is a multi-GB TSV file
+       of (Wikidata resource URI, PageRank) pairs. Rather than re-reading the
+       whole file for every entity type, it is loaded once into a sqlite
+       table keyed on the bare Wikidata identifier (e.g. 'Q90'), which all
+       metric population scripts then share.
+    """
+
+    DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'db', 'pagerank.db')
+    PR_URI_PREFIX = "http://wikidata.dbpedia.org/resource/"
+    BATCH_SIZE = 50000
+    # stay well under sqlite's limit on bound parameters
+    MAX_LOOKUP_PARAMS = 500
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS pagerank (wikidata_id TEXT PRIMARY KEY, pagerank REAL) WITHOUT ROWID")
+
+    def load_file(self, pagerank_file, wikidata_ids=None):
+        """
+        Streams the PageRank file into the store, batch_size rows per
+        transaction. If wikidata_ids is given, only those identifiers are kept.
+        Returns the number of rows loaded.
+        """
+        loaded = 0
+        batch = []
+        for (wikidata_id, pagerank) in iter_pagerank_file(pagerank_file, wikidata_ids):
+            batch.append((wikidata_id, pagerank))
+            if(len(batch) >= PageRankStore.BATCH_SIZE):
+                self._insert_batch(batch)
+                loaded += len(batch)
+                batch = []
+                print(str(loaded) + " PageRank values loaded.")
+        if(len(batch) > 0):
+            self._insert_batch(batch)
+            loaded += len(batch)
+        return loaded
+
+    def _insert_batch(self, batch):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO pagerank VALUES (?, ?)", batch)
+
+    def get_pagerank(self, wikidata_id, default=0.0):
+        row = self.db.execute("SELECT pagerank FROM pagerank WHERE wikidata_id=?", (wikidata_id,)).fetchone()
+        if(row is None):
+            return default
+        return row[0]
+
+    def get_pageranks(self, wikidata_ids):
+        """
+        Returns a dict of wikidata id -> PageRank for those of the passed
+        identifiers that are present in the store
+        """
+        wikidata_ids = list(set(wikidata_ids))
+        pageranks = {}
+        for i in range(0, len(wikidata_ids), PageRankStore.MAX_LOOKUP_PARAMS):
+            chunk = wikidata_ids[i:i + PageRankStore.MAX_LOOKUP_PARAMS]
+            qry = "SELECT wikidata_id, pagerank FROM pagerank WHERE wikidata_id IN (" + ",".join("?" * len(chunk)) + ")"
+            for (wikidata_id, pagerank) in self.db.execute(qry, chunk):
+                pageranks[wikidata_id] = pagerank
+        return pageranks
+
+    def size(self):
+        return self.db.execute("SELECT COUNT(*) FROM pagerank").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def iter_pagerank_file(pagerank_file, wikidata_ids=None):
+    """
+    Lazily parses a Wikidata PageRank TSV file (optionally bz2-compressed),
+    yielding (wikidata_id, pagerank) pairs. wikidata_ids, if given, should
+    be a set: only lines for those identifiers are yielded.
+    """
+    opener = bz2.open if pagerank_file.endswith(".bz2") else open
+    prefix_length = len(PageRankStore.PR_URI_PREFIX)
+    with opener(pagerank_file, 'rt', encoding='utf-8') as pr_file:
+        for line in pr_file:
+            (identifier, sep, pagerank) = line.partition("\t")
+            if(sep == ''):
+                continue
+            if(identifier.startswith(PageRankStore.PR_URI_PREFIX)):
+                identifier = identifier[prefix_length:]
+            if(wikidata_ids is not None and identifier not in wikidata_ids):
+                continue
+            try:
+                yield (identifier, float(pagerank))
+            except ValueError:
+                print("Invalid PageRank value for identifier: " + identifier)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        db_path = sys.argv[2] if len(sys.argv) > 2 else PageRankStore.DEFAULT_DB_PATH
+        store = PageRankStore(db_path)
+        total = store.load_file(sys.argv[1])
+        print(str(total) + " PageRank values stored in " + db_path)
+        store.close()
+    else:
+        print("python3 PageRankStore.py <wd_pr_ultimate.tsv[.bz2]> [<pagerank.db>]")
@@ -16,8 +16,10 @@
 # Collection.  They should accordingly be run in a linux screen session to prevent
 # dropped connections and the need to rerun the function from the beginning again.
 #
-# TODO: At the moment, these various functions are run on an ad-hoc basis. Monitor to
-# determine whether a more engineered (Celery?) solution is required.
+# Note: the enrichment, term and Wikipedia updates below are superseded by the
+# populate_metrics.py command-line tool in the mongo_import directory, which runs
+# them with bounded concurrency, batched transactions and resumable checkpoints.
+# These functions are retained for reference only.
 
 from pymongo import MongoClient
 import json, requests, sqlite3
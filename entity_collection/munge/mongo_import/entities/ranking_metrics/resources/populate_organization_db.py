@@ -2,8 +2,11 @@ import requests
 import json
 import sqlite3
 import urllib3
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
 from entities import HarvesterConfig
+from entities.ranking_metrics.PageRankStore import PageRankStore, iter_pagerank_file
 from urllib.parse import quote
 
 # purpose of script is to populate the ranking metrics for Organizations
@@ -71,18 +74,9 @@ def extract_wikidata_identifier(org):
 				break
 	return wikidata_id
 
-def search_wikidata_id(org):
-	lbl = org.def_label
-	#TODO expand to use EU labels 
-	now_query = wikidata_query.replace('XXXXX', lbl)
-	wikidata_req = wikidata_endpoint_url + now_query
-	as_json = requests.get(wikidata_req).json()
-	wikidata_id = as_json['results']['bindings'][0]['item']['value'].split("/")[-1]
-	return wikidata_id
-
 def get_page_rank(wikidata_id, all_pageranks):
 	try:
-		pagerank = float(all_pageranks[wikidata_id].strip())
+		pagerank = float(all_pageranks[wikidata_id])
 		#print("found wikidata page rank for identifier:" + wikidata_id)			
 	except (IndexError, KeyError, ValueError):
 		#response parsing or value retrieval errors
@@ -151,41 +145,42 @@ org_mongo = MongoClient(config.get_mongo_host('organizations'), config.get_mongo
 orgs = org_mongo.annocultor_db.TermList.find({ "entityType" : "OrganizationImpl"})
 
 #create OrgRecords
-wkdt_identifiers = []
+wkdt_identifiers = set()
 for org in orgs:
 	org_id = org['codeUri']
 	label = extract_def_label(org) 		
 	o = OrgRecord(org_id, label)
 	o.wikidata_id = extract_wikidata_identifier(org)
 	if(o.wikidata_id is not None):
-		wkdt_identifiers.append(o.wikidata_id)
+		wkdt_identifiers.add(o.wikidata_id)
 	o.all_labels = extract_all_labels(org)
 	org_records.append(o)
 
-PR_URI_PREFIX = "http://wikidata.dbpedia.org/resource/"		
-pageranks = {}
-	
-# process pagerank file, grab relevant items
-with open('wd_pr_ultimate.tsv') as ult:
-	for line in ult.readlines():
-		(identifier, pr) = line.split("\t")
-		wkdt_identifier = identifier.replace(PR_URI_PREFIX, '')
-		#keep in memory only the EC organizations
-		if(wkdt_identifier in wkdt_identifiers):
-			pageranks[wkdt_identifier] = pr		
+# look up pageranks in the shared PageRank store if it has been built
+# (see PageRankStore.py), otherwise stream the pagerank file, keeping in memory only the EC organizations
+if(os.path.isfile(PageRankStore.DEFAULT_DB_PATH)):
+	pr_store = PageRankStore()
+	pageranks = pr_store.get_pageranks(wkdt_identifiers)
+	pr_store.close()
+else:
+	pageranks = dict(iter_pagerank_file('wd_pr_ultimate.tsv', wkdt_identifiers))
 
 # fetch metrics into OrgRecord
-wikidata_endpoint_url = "https://query.wikidata.org/bigdata/namespace/wdq/sparql?format=json&query="
-wikidata_query = "SELECT ?item WHERE { ?item rdfs:label|skos:altLabel 'XXXXX'@en. } limit 1"
 solr_query = config.get_relevance_solr() + "/select?wt=json&q=XXXXX"
+MAX_CONCURRENT_QUERIES = 8
 for orgr in org_records:
 	if(orgr.wikidata_id is not None):
 		orgr.pagerank = get_page_rank(orgr.wikidata_id, pageranks)
 	else:
 		orgr.pagerank = 0.0
-	#all organizations are known and have at least one record, when enrichment is complete the correct values will be used automatically 
-	orgr.uri_hits = max(compute_enrichment_hits(orgr.id), 1) 
-	orgr.term_hits = compute_term_hits(orgr.all_labels)
+
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES) as executor:
+	uri_hits = executor.map(compute_enrichment_hits, [orgr.id for orgr in org_records])
+	term_hits = executor.map(compute_term_hits, [orgr.all_labels for orgr in org_records])
+	for (orgr, uri_hit_count, term_hit_count) in zip(org_records, uri_hits, term_hits):
+		#all organizations are known and have at least one record, when enrichment is complete the correct values will be used automatically 
+		orgr.uri_hits = max(uri_hit_count, 1)
+		orgr.term_hits = term_hit_count
 
 #finally store metrics to database
 store_metrics(org_records)
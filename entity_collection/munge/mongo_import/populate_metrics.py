@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+#
+# Command-line tool for (re)populating the relevance metric sqlite databases
+# in entities/ranking_metrics/db. Replaces the practice of uncommenting
+# function calls at the bottom of resources/populate_metrics_dbs.py.
+#
+# Usage: python3 populate_metrics.py <metric> <entity_type> [options]
+#
+#   e.g. python3 populate_metrics.py enrichment place --workers 8
+#        python3 populate_metrics.py terms concept --from-mongo
+#        python3 populate_metrics.py wikipedia place --source place_metrics.tsv
+#        python3 populate_metrics.py pagerank organization --from-mongo
+#
+# Each run works through the entity identifiers in sorted order, querying
+# Solr with at most --workers requests in flight, and writes the results
+# back in one transaction per --batch-size rows. After each committed batch
+# the last identifier is written to a checkpoint file under logs/checkpoints,
+# so that an interrupted run picks up where it left off (use --restart to
+# ignore the checkpoint).
+#
+# Entities whose Solr query failed keep their current value. Their
+# identifiers are listed in a .failed file next to the checkpoint and
+# reported at the end of the run; --retry-failed processes just those.
+
+import argparse
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+METRICS_DB_DIR = os.path.join(os.path.dirname(__file__), 'entities', 'ranking_metrics', 'db')
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), 'logs', 'checkpoints')
+
+ENTITY_TYPES = ['agent', 'concept', 'place', 'organization']
+
+# metric name -> column of the hits table
+METRIC_COLUMNS = {
+    'enrichment' : 'europeana_enrichment_hits',
+    'terms' : 'europeana_string_hits',
+    'wikipedia' : 'wikipedia_hits',
+    'pagerank' : 'pagerank'
+}
+
+WIKIDATA_PREFIX = 'http://www.wikidata.org/entity/'
+
+# Solr fields searched for the prefLabels of each entity type
+LABEL_FIELDS = {
+    'agent' : ['who'],
+    'concept' : ['what'],
+    'place' : ['where'],
+    'organization' : ['PROVIDER', 'DATA_PROVIDER', 'provider_aggregation_edm_intermediateProvider']
+}
+
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 500
+
+
+def open_metrics_db(entity_type):
+    """
+    Opens (creating if necessary) the sqlite database for the given entity type
+    """
+    db = sqlite3.connect(os.path.join(METRICS_DB_DIR, entity_type + ".db"))
+    db.execute("""
+            CREATE TABLE IF NOT EXISTS hits (id VARCHAR(200) PRIMARY KEY, wikipedia_hits INTEGER, europeana_enrichment_hits INTEGER, europeana_string_hits INTEGER, pagerank REAL)
+        """)
+    return db
+
+
+def upsert_metric_batch(db, column, rows):
+    """
+    Writes a batch of (entity_id, value) pairs into the given column of the
+    hits table, inserting any entity not already present. The whole batch
+    is written in a single transaction.
+    """
+    if column not in METRIC_COLUMNS.values():
+        raise ValueError("Unknown metric column: " + str(column))
+    with db:
+        db.executemany("INSERT OR IGNORE INTO hits(id) VALUES (?)", [(entity_id,) for (entity_id, _) in rows])
+        db.executemany("UPDATE hits SET " + column + "=? WHERE id=?", [(value, entity_id) for (entity_id, value) in rows])
+
+
+class MetricCheckpoint:
+    """
+    Records the last entity identifier committed for a given metric and
+    entity type, so that interrupted runs can be resumed, along with the
+    identifiers of the entities whose metric could not be computed.
+    """
+
+    def __init__(self, metric, entity_type, checkpoint_dir=CHECKPOINT_DIR):
+        self.path = os.path.join(checkpoint_dir, entity_type + "_" + metric + ".chk")
+        self.failed_path = os.path.join(checkpoint_dir, entity_type + "_" + metric + ".failed")
+
+    def load(self):
+        if(not os.path.isfile(self.path)):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as chk:
+            last_id = chk.read().strip()
+        return last_id if last_id != '' else None
+
+    def save(self, last_id):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as chk:
+            chk.write(last_id)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if(os.path.isfile(self.path)):
+            os.remove(self.path)
+
+    def load_failed(self):
+        if(not os.path.isfile(self.failed_path)):
+            return []
+        with open(self.failed_path, 'r', encoding='utf-8') as failed:
+            return [line.strip() for line in failed if line.strip() != '']
+
+    def add_failed(self, entity_ids):
+        if(len(entity_ids) == 0):
+            return
+        os.makedirs(os.path.dirname(self.failed_path), exist_ok=True)
+        with open(self.failed_path, 'a', encoding='utf-8') as failed:
+            failed.writelines([entity_id + "\n" for entity_id in entity_ids])
+
+    def save_failed(self, entity_ids):
+        self.clear_failed()
+        self.add_failed(entity_ids)
+
+    def clear_failed(self):
+        if(os.path.isfile(self.failed_path)):
+            os.remove(self.failed_path)
+
+
+def batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if(len(batch) == batch_size):
+            yield batch
+            batch = []
+    if(len(batch) > 0):
+        yield batch
+
+
+def list_db_ids(db, after_id=None):
+    """
+    Returns the identifiers already held in the hits table, in sorted order
+    """
+    if(after_id is None):
+        csr = db.execute("SELECT id FROM hits ORDER BY id")
+    else:
+        csr = db.execute("SELECT id FROM hits WHERE id > ? ORDER BY id", (after_id,))
+    # materialise first: the table is updated while we iterate
+    return [row[0] for row in csr.fetchall()]
+
+
+def get_mongo_client(entity_type):
+    from pymongo import MongoClient
+    from entities import HarvesterConfig
+    config = HarvesterConfig.HarvesterConfig()
+    harvester_name = 'organizations' if entity_type == 'organization' else None
+    return MongoClient(config.get_mongo_host(harvester_name), config.get_mongo_port())
+
+
+def list_mongo_ids(moclient, entity_type, after_id=None):
+    """
+    Returns the identifiers of all entities of the given type held in Mongo,
+    in sorted order
+    """
+    uri_pattern = r'^(http://data\.europeana\.eu/' + entity_type + '/).*$'
+    entity_ids = sorted(moclient.annocultor_db.TermList.distinct('codeUri', { 'codeUri' : { '$regex' : uri_pattern } }))
+    return [entity_id for entity_id in entity_ids if after_id is None or entity_id > after_id]
+
+
+def fetch_labels(moclient, entity_ids):
+    """
+    Retrieves the prefLabels of a batch of entities in a single Mongo query.
+    Returns a dict of entity id -> list of labels
+    """
+    labels = {}
+    rows = moclient.annocultor_db.TermList.find({ 'codeUri' : { '$in' : entity_ids } }, { 'codeUri' : 1, 'representation.prefLabel' : 1 })
+    for row in rows:
+        entity_labels = []
+        try:
+            for lang_labels in row['representation']['prefLabel'].values():
+                entity_labels.extend(lang_labels)
+        except KeyError:
+            pass
+        labels[row['codeUri']] = entity_labels
+    return labels
+
+
+class SolrCounter:
+    """
+    Issues rows=0 queries against the relevance Solr core and returns numFound.
+    Queries are POSTed so that long label disjunctions do not hit URI limits.
+    """
+
+    def __init__(self, solr_uri, pool_size=DEFAULT_WORKERS):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.select_uri = solr_uri.rstrip('/') + "/select"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def count(self, query):
+        params = { 'q' : query, 'rows' : 0, 'wt' : 'json' }
+        try:
+            return self.session.post(self.select_uri, data=params).json()['response']['numFound']
+        except (ValueError, KeyError, OSError) as e:
+            # OSError covers the connection errors of requests
+            print("Query failed: " + query[0:200] + " (" + str(e) + ")")
+            return -1
+
+    def count_enrichments(self, entity_id):
+        return self.count(quote_term(entity_id))
+
+    def count_labels(self, entity_type, labels):
+        if(labels is None or len(labels) == 0):
+            return 0
+        fields = LABEL_FIELDS[entity_type]
+        terms = sorted(set(labels))
+        query = " OR ".join([field + ":" + quote_term(term) for term in terms for field in fields])
+        return self.count(query)
+
+
+def quote_term(term):
+    return "\"" + term.replace("\\", "\\\\").replace("\"", "\\\"") + "\""
+
+
+def fetch_wikidata_ids(moclient, entity_ids):
+    """
+    Retrieves the Wikidata identifiers (from owl:sameAs) of a batch of
+    entities in a single Mongo query. Returns a dict of entity id -> QID
+    """
+    wikidata_ids = {}
+    rows = moclient.annocultor_db.TermList.find({ 'codeUri' : { '$in' : entity_ids } }, { 'codeUri' : 1, 'representation.owlSameAs' : 1 })
+    for row in rows:
+        for uri in row.get('representation', {}).get('owlSameAs', []):
+            if(uri.startswith(WIKIDATA_PREFIX)):
+                wikidata_ids[row['codeUri']] = uri[len(WIKIDATA_PREFIX):]
+                break
+    return wikidata_ids
+
+
+def load_wikipedia_hits(source_file):
+    """
+    Loads the per-Place Wikipedia hit counts from a place_metrics.tsv file,
+    keyed on the original (GeoNames) identifier
+    """
+    place_counts = {}
+    with open(source_file, 'r', encoding='utf-8') as places:
+        for place in places:
+            (geonames, _, _, _, wk_hits) = place.split("\t")
+            place_counts[geonames] = int(wk_hits)
+    return place_counts
+
+
+def build_metric_function(metric, entity_type, args):
+    """
+    Returns a function mapping a batch of entity ids to a list of
+    (entity_id, value) pairs for the requested metric
+    """
+    from entities import HarvesterConfig
+
+    if(metric == 'enrichment'):
+        counter = SolrCounter(HarvesterConfig.HarvesterConfig().get_relevance_solr(), args.workers)
+        def compute(executor, entity_ids):
+            return list(zip(entity_ids, executor.map(counter.count_enrichments, entity_ids)))
+        return compute
+
+    if(metric == 'terms'):
+        counter = SolrCounter(HarvesterConfig.HarvesterConfig().get_relevance_solr(), args.workers)
+        moclient = args.moclient
+        def compute(executor, entity_ids):
+            labels = fetch_labels(moclient, entity_ids)
+            batch_labels = [labels.get(entity_id) for entity_id in entity_ids]
+            counts = executor.map(lambda lbls: counter.count_labels(entity_type, lbls), batch_labels)
+            return list(zip(entity_ids, counts))
+        return compute
+
+    if(metric == 'wikipedia'):
+        if(entity_type != 'place'):
+            raise ValueError("Wikipedia hits are only available for places")
+        if(args.source is None):
+            raise ValueError("The wikipedia metric requires --source <place_metrics.tsv>")
+        place_counts = load_wikipedia_hits(args.source)
+        moclient = args.moclient
+        def compute(executor, entity_ids):
+            rows = moclient.annocultor_db.lookup.find({ 'codeUri' : { '$in' : entity_ids } }, { 'codeUri' : 1, 'originalCodeUri' : 1 })
+            geonames = dict([(row['codeUri'], row.get('originalCodeUri')) for row in rows])
+            return [(entity_id, place_counts.get(geonames.get(entity_id), 0)) for entity_id in entity_ids]
+        return compute
+
+    if(metric == 'pagerank'):
+        from entities.ranking_metrics.PageRankStore import PageRankStore
+        store_path = args.source if args.source is not None else PageRankStore.DEFAULT_DB_PATH
+        if(not os.path.isfile(store_path)):
+            raise ValueError("PageRank store not found at " + store_path + "; build it with PageRankStore.py")
+        store = PageRankStore(store_path)
+        moclient = args.moclient
+        def compute(executor, entity_ids):
+            wikidata_ids = fetch_wikidata_ids(moclient, entity_ids)
+            pageranks = store.get_pageranks(wikidata_ids.values())
+            # entities without a Wikidata identifier keep their current value
+            return [(entity_id, pageranks.get(wikidata_ids[entity_id], 0.0)) for entity_id in entity_ids if entity_id in wikidata_ids]
+        return compute
+
+    raise ValueError("Unknown metric: " + str(metric))
+
+
+def run(args):
+    metric = args.metric
+    entity_type = args.entity_type
+    column = METRIC_COLUMNS[metric]
+    checkpoint = MetricCheckpoint(metric, entity_type)
+    if(args.restart):
+        checkpoint.clear()
+    after_id = checkpoint.load()
+    if(args.retry_failed):
+        print("Retrying " + metric + " for the failed " + entity_type + " entities in " + checkpoint.failed_path)
+    elif(after_id is not None):
+        print("Resuming " + metric + " for " + entity_type + " after " + after_id)
+    else:
+        # a fresh run computes every entity again
+        checkpoint.clear_failed()
+
+    args.moclient = None
+    if(args.from_mongo or metric in ('terms', 'wikipedia', 'pagerank')):
+        args.moclient = get_mongo_client(entity_type)
+
+    db = open_metrics_db(entity_type)
+    if(args.retry_failed):
+        entity_ids = checkpoint.load_failed()
+    elif(args.from_mongo):
+        entity_ids = list_mongo_ids(args.moclient, entity_type, after_id)
+    else:
+        entity_ids = list_db_ids(db, after_id)
+    print(str(len(entity_ids)) + " " + entity_type + " entities to process")
+
+    compute = build_metric_function(metric, entity_type, args)
+    processed = 0
+    still_failed = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for batch in batched(entity_ids, args.batch_size):
+            values = [(entity_id, value) for (entity_id, value) in compute(executor, batch) if value is not None]
+            rows = [(entity_id, value) for (entity_id, value) in values if value >= 0]
+            failed = [entity_id for (entity_id, value) in values if value < 0]
+            upsert_metric_batch(db, column, rows)
+            if(args.retry_failed):
+                # the failed file is only rewritten once all retries are done
+                still_failed.extend(failed)
+            else:
+                checkpoint.add_failed(failed)
+                checkpoint.save(batch[-1])
+            processed += len(batch)
+            print(str(processed) + " " + entity_type + " entities processed.")
+    if(args.retry_failed):
+        checkpoint.save_failed(still_failed)
+    else:
+        checkpoint.clear()
+    failed_ids = checkpoint.load_failed()
+    if(len(failed_ids) > 0):
+        print(str(len(failed_ids)) + " " + entity_type + " entities failed and kept their current " + column + ", listed in " + checkpoint.failed_path + " (rerun with --retry-failed)")
+    db.close()
+    if(args.moclient is not None):
+        args.moclient.close()
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Populate Entity Collection relevance metric databases")
+    subparsers = parser.add_subparsers(dest='metric')
+    subparsers.required = True
+    for metric in sorted(METRIC_COLUMNS.keys()):
+        sub = subparsers.add_parser(metric, help="populate the " + METRIC_COLUMNS[metric] + " column")
+        sub.add_argument('entity_type', choices=ENTITY_TYPES)
+        sub.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="maximum concurrent Solr requests")
+        sub.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows written per transaction")
+        sub.add_argument('--from-mongo', action='store_true', help="take entity ids from Mongo rather than the existing db")
+        sub.add_argument('--restart', action='store_true', help="ignore any saved checkpoint")
+        sub.add_argument('--retry-failed', action='store_true', help="only process the entities that failed in earlier runs")
+        sub.add_argument('--source', help="source file for file-based metrics")
+    return parser
+
+
+if __name__ == '__main__':
+    run(build_arg_parser().parse_args(sys.argv[1:]))
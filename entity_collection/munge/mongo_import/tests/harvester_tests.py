@@ -7,7 +7,10 @@
 # data of the imported entities itself.
 #
 #=========================================================================#
+import os
 import sys
+import tempfile
+import types
 import unittest
 import entities.ContextClassHarvesters
 import entities.preview_builder.PreviewBuilder
@@ -46,5 +49,26 @@ class HarvesterTest(unittest.TestCase):
         entity_id = "http://data.europeana.eu/organization/1482250000004503580"
         ieb = entities.ContextClassHarvesters.IndividualEntityBuilder()
         ieb.build_individual_entity(entity_id, is_test=True)
-      
-        
\ No newline at end of file
+
+    # builds several entities of mixed type in one batch
+    def test_build_entities(self):
+        ieb = entities.ContextClassHarvesters.IndividualEntityBuilder()
+        test_entities = [
+            "http://data.europeana.eu/agent/base/11241",
+            "http://data.europeana.eu/place/base/143914",
+            "http://data.europeana.eu/concept/base/207",
+            "http://data.europeana.eu/agent/base/0",     # not in Mongo
+        ]
+        self.assertEqual(ieb.get_entity_type(test_entities[1]), "place")
+        not_found = ieb.build_entities(test_entities)
+        self.assertEqual(not_found, ["http://data.europeana.eu/agent/base/0"])
+
+    # orphan files are numbered on from those of earlier runs
+    def test_next_orphan_chunk_no(self):
+        ieb = entities.ContextClassHarvesters.IndividualEntityBuilder()
+        with tempfile.TemporaryDirectory() as tmp:
+            harvester = types.SimpleNamespace(name="agents", write_dir=tmp)
+            self.assertEqual(ieb.next_orphan_chunk_no(harvester), 0)
+            for name in ["agents_orphans_0.xml", "agents_orphans_7.xml", "places_orphans_9.xml"]:
+                open(os.path.join(tmp, name), 'w').close()
+            self.assertEqual(ieb.next_orphan_chunk_no(harvester), 8)
@@ -0,0 +1,42 @@
+import bz2
+import os
+import tempfile
+import unittest
+from entities.ranking_metrics.PageRankStore import PageRankStore, iter_pagerank_file
+
+PAGERANK_LINES = [
+    "http://wikidata.dbpedia.org/resource/Q90\t4.5\n",
+    "http://wikidata.dbpedia.org/resource/Q142\t12.25\n",
+    "http://wikidata.dbpedia.org/resource/Q64\tnot-a-number\n",
+    "\n",
+]
+
+class PageRankStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tsv_path = os.path.join(self.tmp.name, 'wd_pr_ultimate.tsv')
+        with open(self.tsv_path, 'w', encoding='utf-8') as tsv:
+            tsv.writelines(PAGERANK_LINES)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_pagerank_file(self):
+        self.assertEqual(list(iter_pagerank_file(self.tsv_path)), [('Q90', 4.5), ('Q142', 12.25)])
+        self.assertEqual(list(iter_pagerank_file(self.tsv_path, {'Q142'})), [('Q142', 12.25)])
+
+    def test_iter_bz2_pagerank_file(self):
+        bz2_path = self.tsv_path + ".bz2"
+        with bz2.open(bz2_path, 'wt', encoding='utf-8') as tsv:
+            tsv.writelines(PAGERANK_LINES)
+        self.assertEqual(list(iter_pagerank_file(bz2_path, {'Q90'})), [('Q90', 4.5)])
+
+    def test_store_lookup(self):
+        store = PageRankStore(os.path.join(self.tmp.name, 'pagerank.db'))
+        self.assertEqual(store.load_file(self.tsv_path), 2)
+        self.assertEqual(store.size(), 2)
+        self.assertEqual(store.get_pagerank('Q90'), 4.5)
+        self.assertEqual(store.get_pagerank('Q1'), 0.0)
+        self.assertEqual(store.get_pageranks(['Q90', 'Q142', 'Q1']), {'Q90' : 4.5, 'Q142' : 12.25})
+        store.close()
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import populate_metrics
+
+class PopulateMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = sqlite3.connect(':memory:')
+        self.db.execute("CREATE TABLE hits (id VARCHAR(200) PRIMARY KEY, wikipedia_hits INTEGER, europeana_enrichment_hits INTEGER, europeana_string_hits INTEGER, pagerank REAL)")
+        self.db.execute("INSERT INTO hits VALUES ('http://data.europeana.eu/place/base/1', 5, 10, 20, 1.5)")
+        self.db.commit()
+
+    def test_upsert_metric_batch(self):
+        rows = [("http://data.europeana.eu/place/base/1", 11), ("http://data.europeana.eu/place/base/2", 3)]
+        populate_metrics.upsert_metric_batch(self.db, 'europeana_enrichment_hits', rows)
+        stored = self.db.execute("SELECT id, wikipedia_hits, europeana_enrichment_hits FROM hits ORDER BY id").fetchall()
+        self.assertEqual(stored, [("http://data.europeana.eu/place/base/1", 5, 11), ("http://data.europeana.eu/place/base/2", None, 3)])
+
+    def test_upsert_rejects_unknown_column(self):
+        with self.assertRaises(ValueError):
+            populate_metrics.upsert_metric_batch(self.db, 'id; DROP TABLE hits', [])
+
+    def test_list_db_ids_after_checkpoint(self):
+        populate_metrics.upsert_metric_batch(self.db, 'wikipedia_hits', [("http://data.europeana.eu/place/base/2", 0)])
+        self.assertEqual(populate_metrics.list_db_ids(self.db, "http://data.europeana.eu/place/base/1"), ["http://data.europeana.eu/place/base/2"])
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = populate_metrics.MetricCheckpoint('enrichment', 'place', os.path.join(tmp, 'checkpoints'))
+            self.assertIsNone(checkpoint.load())
+            checkpoint.save("http://data.europeana.eu/place/base/1")
+            self.assertEqual(checkpoint.load(), "http://data.europeana.eu/place/base/1")
+            checkpoint.clear()
+            self.assertIsNone(checkpoint.load())
+
+    def test_batched(self):
+        self.assertEqual(list(populate_metrics.batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_failed_ids(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = populate_metrics.MetricCheckpoint('enrichment', 'place', os.path.join(tmp, 'checkpoints'))
+            self.assertEqual(checkpoint.load_failed(), [])
+            checkpoint.add_failed(["http://data.europeana.eu/place/base/1"])
+            checkpoint.add_failed(["http://data.europeana.eu/place/base/3"])
+            self.assertEqual(checkpoint.load_failed(), ["http://data.europeana.eu/place/base/1", "http://data.europeana.eu/place/base/3"])
+            checkpoint.save_failed(["http://data.europeana.eu/place/base/3"])
+            self.assertEqual(checkpoint.load_failed(), ["http://data.europeana.eu/place/base/3"])
+            checkpoint.save_failed([])
+            self.assertEqual(checkpoint.load_failed(), [])
+
+    def test_run_records_failed_queries(self):
+        entity_ids = ["http://data.europeana.eu/place/base/" + str(i) for i in range(1, 6)]
+        failing = set(entity_ids[1:3])
+        def compute(executor, batch):
+            return [(entity_id, -1 if entity_id in failing else 7) for entity_id in batch]
+        args = populate_metrics.build_arg_parser().parse_args(['enrichment', 'place', '--batch-size', '2', '--workers', '1'])
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'place.db')
+            db = sqlite3.connect(db_path)
+            db.execute("CREATE TABLE hits (id VARCHAR(200) PRIMARY KEY, wikipedia_hits INTEGER, europeana_enrichment_hits INTEGER, europeana_string_hits INTEGER, pagerank REAL)")
+            populate_metrics.upsert_metric_batch(db, 'wikipedia_hits', [(entity_id, 0) for entity_id in entity_ids])
+            checkpoint_class = populate_metrics.MetricCheckpoint
+            checkpoint = checkpoint_class('enrichment', 'place', tmp)
+            with mock.patch.object(populate_metrics, 'MetricCheckpoint', lambda metric, entity_type: checkpoint_class(metric, entity_type, tmp)), \
+                    mock.patch.object(populate_metrics, 'open_metrics_db', lambda entity_type: sqlite3.connect(db_path)), \
+                    mock.patch.object(populate_metrics, 'build_metric_function', lambda metric, entity_type, args: compute):
+                populate_metrics.run(args)
+                self.assertIsNone(checkpoint.load())
+                self.assertEqual(checkpoint.load_failed(), sorted(failing))
+                failing.discard(entity_ids[1])
+                args.retry_failed = True
+                populate_metrics.run(args)
+                self.assertEqual(checkpoint.load_failed(), [entity_ids[2]])
+            stored = dict(db.execute("SELECT id, europeana_enrichment_hits FROM hits").fetchall())
+            db.close()
+        self.assertEqual(stored, dict([(entity_id, None if entity_id == entity_ids[2] else 7) for entity_id in entity_ids]))
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from entities.WikidataCache import WikidataCache
+
+DUMP_ENTITIES = [
+    { 'id' : 'Q90', 'labels' : { 'en' : { 'language' : 'en', 'value' : 'Paris' }, 'fr' : { 'language' : 'fr', 'value' : 'Paris' } } },
+    { 'id' : 'Q167646', 'labels' : { 'en' : { 'language' : 'en', 'value' : 'Paris' } } },
+    { 'id' : 'Q142', 'labels' : { 'en' : { 'language' : 'en', 'value' : 'France' }, 'de' : { 'language' : 'de', 'value' : 'Frankreich' } } },
+]
+
+class CountingCache(WikidataCache):
+    # resolves misses locally, counting calls instead of going to the API
+
+    lookups = 0
+
+    def _search_qid(self, label, lang):
+        self.lookups += 1
+        return 'Q1' if label == 'Universe' else None
+
+    def _fetch_labels(self, qid):
+        self.lookups += 1
+        return { 'en' : 'universe' }
+
+class WikidataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'wikidata.db')
+        self.dump_path = os.path.join(self.tmp.name, 'dump.json')
+        with open(self.dump_path, 'w', encoding='utf-8') as dump:
+            dump.write("[\n")
+            dump.write(",\n".join(json.dumps(entity) for entity in DUMP_ENTITIES))
+            dump.write("\n]\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_preload_dump(self):
+        cache = WikidataCache(self.db_path, offline=True)
+        self.assertEqual(cache.preload_dump(self.dump_path), 3)
+        # lowest QID wins for shared labels; lookups are case-insensitive
+        self.assertEqual(cache.get_qid('paris'), 'Q90')
+        self.assertEqual(cache.get_qid('Frankreich', 'de'), 'Q142')
+        self.assertEqual(cache.get_labels('Q142'), { 'en' : 'France', 'de' : 'Frankreich' })
+        self.assertIsNone(cache.get_qid('Atlantis'))
+        cache.close()
+
+    def test_preload_dump_langs(self):
+        cache = WikidataCache(self.db_path, offline=True)
+        cache.preload_dump(self.dump_path, {'de'})
+        self.assertIsNone(cache.get_qid('France'))
+        self.assertEqual(cache.get_labels('Q142'), { 'de' : 'Frankreich' })
+        cache.close()
+
+    def test_repeat_lookups_are_local(self):
+        cache = CountingCache(self.db_path)
+        self.assertEqual(cache.get_qid('Universe'), 'Q1')
+        self.assertEqual(cache.get_qid('universe '), 'Q1')
+        self.assertIsNone(cache.get_qid('Atlantis'))
+        self.assertIsNone(cache.get_qid('Atlantis'))
+        self.assertEqual(cache.get_labels('Q1'), { 'en' : 'universe' })
+        self.assertEqual(cache.get_labels('Q1'), { 'en' : 'universe' })
+        self.assertEqual(cache.lookups, 3)
+        cache.close()
+
+    def test_expired_entries_are_refreshed(self):
+        cache = CountingCache(self.db_path, ttl=0)
+        cache.get_qid('Universe')
+        cache.get_qid('Universe')
+        self.assertEqual(cache.lookups, 2)
+        cache.close()
@@ -5,14 +5,19 @@ from collectionbuilder.xmlutil import XMLQueryEditor
 from collectionbuilder.xmlutil.InconsistentOperatorException import InconsistentOperatorException
 from collectionbuilder.xmlutil.ZeroResultsException import ZeroResultsException
 from django.core import serializers
+from django.conf import settings
 from io import StringIO
 import copy
 import requests
 import json
 import re
 import os
+import threading
 
 SOLR_URL = "http://sol7.eanadev.org:9191/solr/search_production_publish_1/select?wt=json"
+# shared label <-> Wikidata identifier cache, see get_wikidata_cache()
+WIKIDATA_CACHE = None
+WIKIDATA_CACHE_LOCK = threading.Lock()
 EXPANSION_LANGUAGES = {"fr" : "French", "de" : "German", "es" : "Spanish", "nl" : "Dutch", "pl" : "Polish", "it" : "Italian", "bg" : "Bulgarian", "hu" : "Hungarian", "cs" : "Czech", "da" : "Danish", "et" : "Estonian", "fi" : "Finnish", "el" : "Greek", "hr" : "Croatian", "ga": "Gaelic - Irish", "lt": "Lithuanian", "lv" : "Latvian", "pt" : "Portuguese", "ro" : "Romanian", "sk": "Slovak", "sl" : "Slovene", "sv" : "Swedish", "mt" : "Maltese", "la" : "Latin", "gd" : "Gaelic - Scots", "ru" : "Russian", "ca" : "Catalan", "cu" : "Old Church Slavonic", "cy" : "Welsh", "sr" : "Serbian"}
 
 def index(request):
@@ -125,23 +130,27 @@ def facetvalues(request):
 	store_XQE(request, XQE)
 	return HttpResponse(json.dumps(all_values), 'application/json')
 
+def get_wikidata_cache():
+	# opened on first use at settings.WIKIDATA_CACHE_PATH (the default cache database of WikidataCache if not set)
+	# rather than at import time. WikidataCache comes from the entities package of
+	# entity_collection/munge/mongo_import, which must be on the Python path
+	global WIKIDATA_CACHE
+	with WIKIDATA_CACHE_LOCK:
+		if(WIKIDATA_CACHE is None):
+			from entities.WikidataCache import WikidataCache
+			WIKIDATA_CACHE = WikidataCache(getattr(settings, 'WIKIDATA_CACHE_PATH', WikidataCache.DEFAULT_DB_PATH))
+	return WIKIDATA_CACHE
+
 def translate(request):
 	term = request.GET["term"]
-	wkdt_termsearch = "https://www.wikidata.org/w/api.php?format=json&action=wbsearchentities&language=en&limit=1&search=" + term
-	termsearch_as_json = requests.get(wkdt_termsearch).json()
-	success = (termsearch_as_json['success'] == 1 and len(termsearch_as_json["search"]) > 0)
 	terms = {}
-	if(success):
-		entity_id = termsearch_as_json["search"][0]["id"]
-		wkdt_idsearch = "https://www.wikidata.org/w/api.php?format=json&action=wbgetentities&props=labels&ids=" + entity_id
-		idsearch_as_json = requests.get(wkdt_idsearch).json()
-		inner_success = idsearch_as_json['success'] == 1 and len(idsearch_as_json['entities']) > 0
-		if(inner_success):
-			labels = idsearch_as_json['entities'][entity_id]['labels']
-			for lang_code in EXPANSION_LANGUAGES.keys():
-			 if lang_code in labels:
-			 	trans_term = labels[lang_code]["value"]
-			 	terms[EXPANSION_LANGUAGES[lang_code]] = trans_term
+	wikidata_cache = get_wikidata_cache()
+	entity_id = wikidata_cache.get_qid(term, 'en')
+	if(entity_id is not None):
+		labels = wikidata_cache.get_labels(entity_id)
+		for lang_code in EXPANSION_LANGUAGES.keys():
+			if lang_code in labels:
+				terms[EXPANSION_LANGUAGES[lang_code]] = labels[lang_code]
 	return HttpResponse(json.dumps(terms), 'application/json')
 
 def updateoperator(request):
@@ -1,17 +1,19 @@
+import gzip
 import json
 import re
+import warnings
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
 from urllib.parse import urlencode
 from urllib.parse import urljoin, urlsplit
 
-from httplib2 import Http
 from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import requests
 import requests.exceptions
 
-s = requests.Session()
-s.mount('http://', HTTPAdapter(max_retries=10))
-s.mount('https://', HTTPAdapter(max_retries=10))
 # sleep for every field analysis request to avoid "Max retries exceeded with url"
 sleep_seconds_before_field_analysis_request = 0.1
 from time import sleep
@@ -19,6 +21,65 @@ from time import sleep
 
 ER_RE = re.compile ('<pre>(.|\n)*?</pre>')
 
+# approximate size of the chunks of a streamed request body
+JSON_CHUNK_BYTES = 64 * 1024
+
+
+def _json_default(obj):
+    # documents may be merged views such as ChainMap, which json only encodes as dict
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=_json_default)
+
+
+def encode_json_doc(doc):
+    """
+    doc: document, a dict or other mapping
+    return: utf-8 encoded JSON of the document
+    """
+    return _json_encoder.encode(doc).encode(encoding='utf_8')
+
+
+def iter_json_array(docs, chunk_bytes=JSON_CHUNK_BYTES):
+    """
+    encode documents incrementally as a JSON array
+
+    only about chunk_bytes of encoded JSON is held at a time, whatever the number and size of docs
+
+    docs: iterable of documents (dicts or other mappings) or of already encoded JSON documents (bytes)
+    return: generator of utf-8 encoded chunks
+    """
+    pending = [b'[']
+    pending_bytes = 1
+    separator = b''
+    for doc in docs:
+        encoded_doc = doc if isinstance(doc, bytes) else encode_json_doc(doc)
+        pending.append(separator)
+        pending.append(encoded_doc)
+        pending_bytes += len(encoded_doc) + 1
+        separator = b','
+        if pending_bytes >= chunk_bytes:
+            yield b''.join(pending)
+            pending = []
+            pending_bytes = 0
+    pending.append(b']')
+    yield b''.join(pending)
+
+
+def gzip_chunks(chunks, compresslevel=3):
+    """
+    gzip compress a stream of chunks
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
 class Results(object):
     def __init__(self, response=None, decoder=None):
         self.decoder = decoder or json.JSONDecoder()
@@ -93,8 +154,26 @@ class SolrClient(object):
 
     solrURL = "http://144.76.218.178:9192/solr/fulltext"
 
+    # uniqueKey of the fulltext core schema, on which cursor paging sorts
+    UNIQUE_KEY = "europeana_id"
+
+    # request bodies from this size on are gzip compressed, if enabled. Streamed bodies are always compressed.
+    GZIP_MIN_BYTES = 64 * 1024
+
     def __init__(self, server_url, decoder=None, timeout=60, result_class=Results, use_cache=None, cache=None,
-                 username=None, password=None):
+                 username=None, password=None, pool_size=10, retries=3, gzip_requests=False):
+        """
+        :param timeout: connect and read timeout of every request in seconds
+        :param use_cache: deprecated and ignored, responses are no longer cached (kept for positional callers)
+        :param cache: deprecated and ignored, see use_cache
+        :param pool_size: number of keep-alive connections kept to the server, at least the number of threads
+                          sharing this client
+        :param retries: number of retries of requests failing to connect, and of GET requests answered with 502, 503
+                        or 504. POST requests (updates, commits) are not retried on a status, as their body may be
+                        streamed from a generator which cannot be sent again.
+        :param gzip_requests: gzip large request bodies (batch updates). Solr only accepts these when its Jetty
+                              inflates gzip requests, so this is off by default.
+        """
         # self._logger=logging.getLogger(__name__)
 
         self.decoder = decoder or json.JSONDecoder()
@@ -115,10 +194,17 @@ class SolrClient(object):
         self.timeout = timeout
         self.result_class = result_class
 
-        if use_cache:
-            self.http = Http(cache=cache or ".cache", timeout=self.timeout)
-        else:
-            self.http = Http(timeout=self.timeout)
+        if use_cache is not None or cache is not None:
+            warnings.warn("SolrClient use_cache and cache are deprecated and ignored", DeprecationWarning, stacklevel=2)
+
+        self.gzip_requests = gzip_requests
+        # one session shared by all requests, so that connections are kept alive and reused
+        self.session = requests.Session()
+        # urllib3 only retries idempotent methods on a status, see the retries parameter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(502, 503, 504)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
         self._auth = None
         if username is not None and password is not None:
@@ -131,6 +217,8 @@ class SolrClient(object):
         start: $page_number
         rows: $rows_per_page
 
+        deep paging with start gets slower the larger start is, use export_documents() to go through many documents
+
         return documents {'docs'[],'numFound','start' }
         """
         params = {'q': '*:*', 'start': start, 'rows': rows}
@@ -141,20 +229,18 @@ class SolrClient(object):
 
         return response['response']
 
-    def batch_update_documents(self, docs, commit=True):
+    def batch_update_documents(self, docs, commit=True, commit_within=None):
         """
         batch update documents
 
-        docs: documment object set in dict json format
+        docs: documment object set in dict json format, any iterable (e.g., a generator) of them
+        commit: hard commit (and open a new searcher) after the update
+        commit_within: milliseconds within which Solr is to make the update visible, None to leave it to Solr's
+                       autoCommit settings
         """
 
-        docs = json.dumps(docs, ensure_ascii=False).encode(encoding='utf_8')
-
-        params={'commit':'true' if commit else 'false'}
-        val_headers= {"Content-type": "application/json"}
-        path = '%s/update/json?%s' % (self.path, urlencode(params, True))
-
-        response = self._send_request('POST', path, data=docs, headers=val_headers)
+        # the request body is encoded while it is sent (chunked transfer encoding), never as a whole
+        docs = iter_json_array(docs)
 
         '''
         import pysolr
@@ -162,7 +248,36 @@ class SolrClient(object):
         response = solr.add(docs, commit=commit)
         '''
         #{'responseHeader': {'status': 0, 'QTime': 115}}
-        return response
+        return self.update_json(docs, commit=commit, commit_within=commit_within)
+
+    def update_json(self, data, commit=False, commit_within=None):
+        """
+        send an update request with an already serialised JSON body, e.g., an array of documents
+
+        data: utf-8 encoded JSON, or an iterator of its chunks (see iter_json_array)
+        """
+        params = {'commit': 'true' if commit else 'false'}
+        if commit_within:
+            params['commitWithin'] = int(commit_within)
+        val_headers = {"Content-type": "application/json"}
+        path = '%s/update/json?%s' % (self.path, urlencode(params, True))
+
+        return self._send_request('POST', path, data=data, headers=val_headers)
+
+    def commit(self, soft=False, open_searcher=True):
+        """
+        explicit commit of all pending updates
+
+        soft: soft commit, which makes updates visible without flushing them to stable storage
+        open_searcher: open a new searcher on hard commit, i.e., make the updates visible
+        """
+        if soft:
+            params = {'softCommit': 'true'}
+        else:
+            params = {'commit': 'true', 'openSearcher': 'true' if open_searcher else 'false'}
+        path = '%s/update?%s' % (self.path, urlencode(params, True))
+
+        return self._send_request('POST', path)
 
     def load_documents_by_custom_query(self, query_condition, start=0, rows=10):
         """
@@ -180,6 +295,45 @@ class SolrClient(object):
 
         return response['response']
 
+    def export_documents(self, query_condition='*:*', fields=None, filter_queries=None, rows=1000, prefetch=True):
+        """
+        stream all documents matching a query, paging with cursorMark
+
+        Unlike start/rows paging, each page costs the same however deep into the results it is, as Solr continues
+        from the sort value of the last document returned. Documents are therefore sorted on the unique key.
+
+        :param query_condition: solr query condition '*:*'
+        :param fields: list of fields to return, None for all stored fields
+        :param filter_queries: list of filter queries (fq)
+        :param rows: number of documents per request
+        :param prefetch: request the next page in a background thread while the current one is consumed
+        :return: generator of documents
+        """
+        params = {'q': query_condition, 'rows': rows, 'sort': '%s asc' % self.UNIQUE_KEY, 'wt': 'json'}
+        if fields:
+            params['fl'] = ','.join(fields)
+        if filter_queries:
+            params['fq'] = list(filter_queries)
+
+        def load_page(cursor_mark):
+            path = '%s/select?%s' % (self.path, urlencode(dict(params, cursorMark=cursor_mark), True))
+            response = self._send_request('GET', path)
+            return response['response']['docs'], response['nextCursorMark']
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            cursor_mark = '*'
+            docs, next_cursor_mark = load_page(cursor_mark)
+            while True:
+                # the cursor mark stays the same once all documents have been returned
+                has_next_page = next_cursor_mark != cursor_mark
+                next_page = executor.submit(load_page, next_cursor_mark) if has_next_page and prefetch else None
+                for doc in docs:
+                    yield doc
+                if not has_next_page:
+                    break
+                cursor_mark = next_cursor_mark
+                docs, next_cursor_mark = next_page.result() if next_page else load_page(cursor_mark)
+
     def load_document_by_id(self, doc_url):
         id_query="id:\"%s\""%doc_url
 
@@ -197,6 +351,9 @@ class SolrClient(object):
         return result['numFound']
 
 
+    def close(self):
+        self.session.close()
+
     def _send_request(self, method, path, data=None, headers=None, sleep_before_request=0):
         """
         :param method: HTTP method include 'GET','POST','DELETE','PUT'
@@ -210,16 +367,20 @@ class SolrClient(object):
 
         url = self.solrURL.replace(self.path, '')
         sleep(sleep_before_request)
+        if self.gzip_requests and data is not None:
+            if not isinstance(data, bytes):
+                data = gzip_chunks(data)
+                headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+            elif len(data) >= self.GZIP_MIN_BYTES:
+                data = gzip.compress(data, compresslevel=3)
+                headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
         try:
-            if self._auth:
-                response = requests.request(method=method, url=urljoin(url, path),
-                                            headers=headers,data=data,auth=self._auth)
-            else:
-                response = requests.request(method=method, url=urljoin(url, path),
-                                            headers=headers,data=data)
-        except requests.exceptions.ConnectionError:
+            response = self.session.request(method=method, url=urljoin(url, path), headers=headers, data=data,
+                                            auth=self._auth, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.RetryError) as conn_err:
             # self._logger.warning("Connection refused when requesting [%s]", urljoin(url, path))
-            raise SolrError("Connection refused.")
+            raise SolrError("Connection failed: %s" % conn_err)
 
         if response.status_code not in (200, 304):
             # self._logger.error("failed to send request to [%s]. Reason: [%s]", urljoin(url, path),response.reason)
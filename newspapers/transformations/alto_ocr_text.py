@@ -2,7 +2,9 @@
 # Usage: python alto_ocr_text.py <alto_zip_file>
 
 import codecs
+import io
 import os
+import re
 import sys
 import xml.etree.ElementTree as ET
 import zipfile
@@ -24,11 +26,66 @@ class FullTextProfile(object):
         self.language = ""
 
     def to_fulltext(self):
-        text_blocks_content = list()
+        return "\n".join([text_block.content for text_block in self.text_blocks if text_block.content])
+
+    def word_boxes(self):
+        """
+        word coordinates of the page, if parsed with word_boxes=True
+
+        :return: list of (start, length, hpos, vpos, width, height), start and length locating the word in
+                 to_fulltext(), the String coordinates rounded to integers. Words hyphenated across lines have a box
+                 per part.
+        """
+        page_word_boxes = list()
+        block_offset = 0
         for text_block in self.text_blocks:
-            text_blocks_content.append(text_block.content)
-
-        return "\n".join(text_blocks_content)
+            if not text_block.content:
+                continue
+            for start, length, hpos, vpos, width, height in text_block.word_boxes or ():
+                page_word_boxes.append((block_offset + start, length, hpos, vpos, width, height))
+            block_offset += len(text_block.content) + 1
+        return page_word_boxes
+
+    def truncate(self, max_chars):
+        """
+        drop the text beyond max_chars characters of to_fulltext(), e.g., of giant blocks of OCR garbage
+
+        the last block kept is cut at a word boundary where possible
+
+        :param max_chars: maximum length of the page fulltext
+        :return: int, number of characters dropped
+        """
+        block_lengths = [len(text_block.content) for text_block in self.text_blocks if text_block.content]
+        fulltext_length = sum(block_lengths) + max(len(block_lengths) - 1, 0)
+        if fulltext_length <= max_chars:
+            return 0
+
+        kept_blocks = list()
+        length = 0
+        for text_block in self.text_blocks:
+            if not text_block.content:
+                continue
+            # blocks are separated by a newline
+            separator_length = 1 if kept_blocks else 0
+            if length + separator_length + len(text_block.content) <= max_chars:
+                kept_blocks.append(text_block)
+                length += separator_length + len(text_block.content)
+                continue
+            room = max_chars - length - separator_length
+            content = text_block.content[:room] if room > 0 else ""
+            if " " in content and text_block.content[len(content)] != " ":
+                content = content[:content.rindex(" ")]
+            if content:
+                word_boxes = None
+                if text_block.word_boxes is not None:
+                    word_boxes = [word_box for word_box in text_block.word_boxes
+                                  if word_box[0] + word_box[1] <= len(content)]
+                kept_blocks.append(TextBlock(text_block.language, content, word_boxes))
+                length += separator_length + len(content)
+            break
+
+        self.text_blocks = kept_blocks
+        return fulltext_length - length
 
     def to_edm_json(self):
         newspaper_fulltext = {}
@@ -50,57 +107,327 @@ class TextBlock(object):
     """
     
     """
-    def __init__(self, language, content):
+    def __init__(self, language, content, word_boxes=None):
         self.language = language
         self.content = content
+        # list of (start, length, hpos, vpos, width, height) with start in content, see FullTextProfile.word_boxes()
+        self.word_boxes = word_boxes
+
+
+class _TextBlockBuilder(object):
+    """
+    collects the words of the String elements of a text block into a single list, which is joined once
+
+    Words hyphenated across lines are joined: ALTO marks the part before the line break with SUBS_TYPE="HypPart1",
+    followed by a HYP element, and the part after it with SUBS_TYPE="HypPart2", both giving the whole word in
+    SUBS_CONTENT. Without SUBS_CONTENT, the parts around a HYP element are concatenated. Whitespace within and
+    between String contents collapses to single spaces, SP elements are not needed.
+
+    With word_boxes, the coordinates of every String are kept with the index of the word(s) it makes up.
+    """
+    __slots__ = ("words", "joining", "skip_hyp_part2", "boxes")
+
+    def __init__(self, word_boxes=False):
+        self.words = list()
+        # the next word continues the last one, after a HYP element
+        self.joining = False
+        # the whole word of HypPart1 was taken from SUBS_CONTENT
+        self.skip_hyp_part2 = False
+        # list of (word index, hpos, vpos, width, height), None if word boxes are not collected
+        self.boxes = list() if word_boxes else None
+
+    def add_string(self, content, subs_type=None, subs_content=None, box=None):
+        """
+        :param box: (hpos, vpos, width, height) of the String, see _string_box()
+        """
+        first_word = self._add_words(content, subs_type, subs_content)
+        if box is not None and self.boxes is not None and first_word is not None:
+            for word_index in range(first_word, len(self.words)):
+                self.boxes.append((word_index,) + box)
+
+    def _add_words(self, content, subs_type, subs_content):
+        """
+        :return: index of the first word the String contributed to, None if none
+        """
+        if subs_type is None and not self.joining and not self.skip_hyp_part2:
+            # plain word, by far the most common
+            if content:
+                first_word = len(self.words)
+                self.words.extend(content.split())
+                return first_word if len(self.words) > first_word else None
+            return None
+        if subs_type == "HypPart2" and self.skip_hyp_part2:
+            # the whole word was added with HypPart1
+            self.skip_hyp_part2 = False
+            return len(self.words) - 1
+        self.skip_hyp_part2 = False
+        if subs_type == "HypPart1" and subs_content:
+            self.joining = False
+            self.words.append(subs_content)
+            self.skip_hyp_part2 = True
+            return len(self.words) - 1
+        if not content:
+            return None
+        first_word = None
+        for word in content.split():
+            if self.joining and self.words:
+                last_word = self.words[-1]
+                # a hyphen left in CONTENT, e.g., by producers writing it in the String as well as the HYP
+                if last_word[-1] in "-\u00ac":
+                    last_word = last_word[:-1]
+                self.words[-1] = last_word + word
+            else:
+                self.words.append(word)
+            self.joining = False
+            if first_word is None:
+                first_word = len(self.words) - 1
+        return first_word
+
+    def add_hyp(self):
+        if not self.skip_hyp_part2:
+            self.joining = True
+
+    def content(self):
+        return " ".join(self.words)
+
+    def word_boxes(self):
+        """
+        :return: list of (start, length, hpos, vpos, width, height) with start in content(), None if not collected
+        """
+        if self.boxes is None:
+            return None
+        starts = list()
+        offset = 0
+        for word in self.words:
+            starts.append(offset)
+            offset += len(word) + 1
+        return [(starts[word_index], len(self.words[word_index]), hpos, vpos, width, height)
+                for word_index, hpos, vpos, width, height in self.boxes]
+
+
+def _string_box(attrib):
+    """
+    :param attrib: attributes of a String element
+    :return: tuple, (hpos, vpos, width, height) rounded to integers, None if the String has no complete coordinates
+    """
+    try:
+        return (int(round(float(attrib['HPOS']))), int(round(float(attrib['VPOS']))),
+                int(round(float(attrib['WIDTH']))), int(round(float(attrib['HEIGHT']))))
+    except (KeyError, ValueError):
+        return None
+
+
+ALTO_NAMESPACES = {'alto-1': 'http://schema.ccs-gmbh.com/ALTO',
+                   'alto-2': 'http://www.loc.gov/standards/alto/ns-v2#',
+                   'alto-3': 'http://www.loc.gov/standards/alto/ns-v3#'}
+
+# ALTO parser backend, see ALTO_PARSERS and set_alto_parser()
+alto_parser = "etree"
 
 
 def load_fulltext_profile_from_alto_file(alto_file_path):
-    with open(alto_file_path, "r", encoding="utf-8") as alto_file:
+    with open(alto_file_path, "rb") as alto_file:
         page_no = os.path.basename(alto_file_path).split(".")[0]
-        fulltext_profile = alto_ocr_2_text_profile(alto_file.read(), page_no=str(page_no))
+        fulltext_profile = alto_ocr_2_text_profile(alto_file, page_no=str(page_no))
 
     return fulltext_profile
 
 
-def alto_ocr_2_text_profile(alto_xml_file, issue_no="", page_no=""):
+def alto_ocr_2_text_profile(alto_xml_file, issue_no="", page_no="", parser=None, word_boxes=False):
     """
 
-    :param alto_xml_file:
+    :param alto_xml_file: ALTO page content as bytes or str, or a binary file object to read it from
     :param page_no:
-    :return: list, list of text blocks from given ALTO file
+    :param parser: name of the ALTO parser backend, defaults to the one set with set_alto_parser()
+    :param word_boxes: whether to keep the coordinates of the words, see FullTextProfile.word_boxes()
+    :return: FullTextProfile, with the text blocks from given ALTO file
     """
+    parse_text_blocks = ALTO_PARSERS[parser or alto_parser]
+    fulltext_profile = FullTextProfile("", issue_no, page_no)
+    fulltext_profile.text_blocks = parse_text_blocks(alto_xml_file, word_boxes)
+    fulltext_profile.language = _determine_page_language(fulltext_profile.text_blocks)
+    return fulltext_profile
+
+
+def _as_xml_source(alto_xml_file):
+    if isinstance(alto_xml_file, bytes):
+        return io.BytesIO(alto_xml_file)
+    if isinstance(alto_xml_file, str):
+        return io.StringIO(alto_xml_file)
+    return alto_xml_file
+
+
+def _alto_namespace(root_tag):
+    """
+    determine ALTO namespace from the tag of the root element
 
-    namespace = {'alto-1': 'http://schema.ccs-gmbh.com/ALTO',
-                 'alto-2': 'http://www.loc.gov/standards/alto/ns-v2#',
-                 'alto-3': 'http://www.loc.gov/standards/alto/ns-v3#'}
-    tree = ET.ElementTree(ET.fromstring(alto_xml_file))
-    xmlns = tree.getroot().tag.split('}')[0].strip('{')
-    if xmlns == "alto":
-        alto_xml_file = alto_xml_file.replace("<alto", "<alto xmlns=\"http://www.loc.gov/standards/alto/ns-v2#\"")
+    :param root_tag: e.g., '{http://www.loc.gov/standards/alto/ns-v2#}alto'
+    :return: namespace uri, '' if the document has no default namespace, or None if not an ALTO document
+    """
+    if root_tag.startswith('{'):
+        xmlns = root_tag[1:].split('}')[0]
+        return xmlns if xmlns in ALTO_NAMESPACES.values() else None
+    if root_tag == "alto":
         # no default namespace e.g., National_Library_of_Estonia\Postimees\1897-08-08.alto.zip
-        # quick fix by inserting name space
-        tree = ET.ElementTree(ET.fromstring(alto_xml_file))
-        xmlns = tree.getroot().tag.split('}')[0].strip('{')
+        return ''
+    return None
 
-    fulltext_profile = FullTextProfile("", issue_no, page_no)
+
+def _parse_alto_text_blocks(alto_xml_file, word_boxes=False):
+    """
+    parse text blocks incrementally from an ALTO document with xml.etree
+
+    The namespace is taken from the root element on the first start event. Every element is removed from its parent
+    once it ended, whatever its type (e.g., Illustration or ComposedBlock elements too), and text lines are cleared
+    with their words. Only the open elements from the root to the current text line are thus held in memory, never
+    the full tree.
+
+    :param alto_xml_file: ALTO XML as bytes, str or file object
+    :param word_boxes: whether to keep the coordinates of the words
+    :return: list, list of TextBlock
+    """
     text_blocks = list()
-    if xmlns in namespace.values():
-        for textblocks in tree.iterfind('.//{%s}TextBlock' % xmlns):
-            textblock_lang = textblocks.attrib.get('language')
-            fulltext_text_lines = list()
-            for lines in textblocks.iterfind('.//{%s}TextLine' % xmlns):
-                for line in lines.findall('{%s}String' % xmlns):
-                    text = line.attrib.get('CONTENT') + ' '
-                    fulltext_text_lines.append(text)
-            textblock = TextBlock(textblock_lang, "".join(fulltext_text_lines))
-            text_blocks.append(textblock)
+    context = ET.iterparse(_as_xml_source(alto_xml_file), events=('start', 'end'))
+    event, root = next(context)
+    xmlns = _alto_namespace(root.tag)
+    if xmlns is None:
+        print('ERROR: Not a valid ALTO file (namespace declaration missing)')
+        return text_blocks
+
+    ns_prefix = '{%s}' % xmlns if xmlns else ''
+    textblock_tag = ns_prefix + 'TextBlock'
+    textline_tag = ns_prefix + 'TextLine'
+    string_tag = ns_prefix + 'String'
+    hyp_tag = ns_prefix + 'HYP'
+
+    textblock_lang = None
+    text_builder = None
+    in_text_line = False
+    # the open elements from the root to the current text line, the elements within a line are dropped with it
+    open_elems = [root]
+    for event, elem in context:
+        tag = elem.tag
+        if in_text_line:
+            if event == 'start':
+                continue
+            if tag == string_tag:
+                if text_builder is not None:
+                    attrib = elem.attrib
+                    text_builder.add_string(attrib.get('CONTENT'), attrib.get('SUBS_TYPE'), attrib.get('SUBS_CONTENT'),
+                                            _string_box(attrib) if word_boxes else None)
+                continue
+            elif tag == hyp_tag:
+                if text_builder is not None:
+                    text_builder.add_hyp()
+                continue
+            elif tag != textline_tag:
+                continue
+            in_text_line = False
+            elem.clear()
+        elif event == 'start':
+            open_elems.append(elem)
+            if tag == textline_tag:
+                in_text_line = True
+            elif tag == textblock_tag:
+                textblock_lang = elem.attrib.get('language')
+                text_builder = _TextBlockBuilder(word_boxes)
+            continue
+
+        open_elems.pop()
+        if open_elems:
+            # the ended element is the only child left in its parent, as its earlier siblings were removed already
+            open_elems[-1].remove(elem)
+        if tag == textblock_tag:
+            text_blocks.append(TextBlock(textblock_lang, text_builder.content(), text_builder.word_boxes()))
+            text_builder = None
+
+    return text_blocks
+
+
+# compiled XPath expressions per ALTO namespace, for the lxml backend
+_lxml_xpaths = {}
+
+
+def _get_lxml_xpaths(xmlns):
+    """
+    :param xmlns: ALTO namespace uri, '' for documents without default namespace
+    :return: tuple, (XPath of all text blocks, XPath of the String and HYP elements of the text lines in a block,
+                     XPath of String contents of the text lines in a block, XPath testing an element for hyphenation
+                     markup)
+    """
+    if xmlns not in _lxml_xpaths:
+        from lxml import etree
+        namespaces = {'alto': xmlns} if xmlns else None
+        prefix = 'alto:' if xmlns else ''
+        _lxml_xpaths[xmlns] = (etree.XPath('//%sTextBlock' % prefix, namespaces=namespaces),
+                               etree.XPath('.//%sTextLine/%sString | .//%sTextLine/%sHYP' % ((prefix,) * 4),
+                                           namespaces=namespaces),
+                               etree.XPath('.//%sTextLine/%sString/@CONTENT' % (prefix, prefix), namespaces=namespaces),
+                               etree.XPath('boolean(.//%sTextLine/%sHYP | .//%sTextLine/%sString[@SUBS_TYPE])' %
+                                           ((prefix,) * 4), namespaces=namespaces))
+    return _lxml_xpaths[xmlns]
+
+
+def _parse_alto_text_blocks_lxml(alto_xml_file, word_boxes=False):
+    """
+    parse text blocks from an ALTO document with lxml (libxml2)
+
+    :param alto_xml_file: ALTO XML as bytes, str or file object
+    :param word_boxes: whether to keep the coordinates of the words
+    :return: list, list of TextBlock
+    """
+    from lxml import etree
+
+    if isinstance(alto_xml_file, str):
+        # lxml refuses str input with an encoding declaration, so parse it as utf-8 bytes whatever it declares
+        root = etree.fromstring(alto_xml_file.encode('utf-8'), etree.XMLParser(encoding='utf-8', huge_tree=True))
+    elif isinstance(alto_xml_file, bytes):
+        root = etree.fromstring(alto_xml_file, etree.XMLParser(huge_tree=True))
     else:
+        root = etree.parse(alto_xml_file, etree.XMLParser(huge_tree=True)).getroot()
+
+    text_blocks = list()
+    xmlns = _alto_namespace(root.tag)
+    if xmlns is None:
         print('ERROR: Not a valid ALTO file (namespace declaration missing)')
+        return text_blocks
+
+    hyp_tag = '{%s}HYP' % xmlns if xmlns else 'HYP'
+    find_text_blocks, find_words, find_contents, has_hyphenation = _get_lxml_xpaths(xmlns)
+    page_has_hyphenation = has_hyphenation(root)
+    for textblock in find_text_blocks(root):
+        if not word_boxes and (not page_has_hyphenation or not has_hyphenation(textblock)):
+            # no elements needed, the words are just the String contents
+            text_blocks.append(TextBlock(textblock.get('language'), " ".join(" ".join(find_contents(textblock)).split())))
+            continue
+        text_builder = _TextBlockBuilder(word_boxes)
+        for word in find_words(textblock):
+            if word.tag == hyp_tag:
+                text_builder.add_hyp()
+            else:
+                text_builder.add_string(word.get('CONTENT'), word.get('SUBS_TYPE'), word.get('SUBS_CONTENT'),
+                                        _string_box(word.attrib) if word_boxes else None)
+        text_blocks.append(TextBlock(textblock.get('language'), text_builder.content(), text_builder.word_boxes()))
+    return text_blocks
+
+
+ALTO_PARSERS = {"etree": _parse_alto_text_blocks,
+                "lxml": _parse_alto_text_blocks_lxml}
+
+
+def set_alto_parser(name):
+    """
+    select the ALTO parser backend used by default
 
-    fulltext_profile.text_blocks = text_blocks
-    fulltext_profile.language = _determine_page_language(text_blocks)
-    return fulltext_profile
+    :param name: 'etree' (standard library, streaming) or 'lxml' (libxml2, requires lxml to be installed)
+    """
+    global alto_parser
+    if name not in ALTO_PARSERS:
+        raise ValueError("unknown ALTO parser [%s], expected one of %s" % (name, sorted(ALTO_PARSERS)))
+    if name == "lxml":
+        # fail early rather than on the first page
+        import lxml.etree
+    alto_parser = name
 
 
 def _determine_page_language(text_blocks):
@@ -124,45 +451,70 @@ def _determine_page_language(text_blocks):
     return language
 
 
-def extract_fulltext_4_issue(issue_fulltext_zip_file):
+def extract_fulltext_4_issue(issue_fulltext_zip_file, parser=None):
     """
     load fulltext of page from an issue in sequence
 
     :param issue_fulltext_zip_file:
+    :param parser: name of the ALTO parser backend, see alto_ocr_2_text_profile()
     :return:list
     """
-    fulltext_alto_files = load_alto_ocr_files(issue_fulltext_zip_file)
+    return list(iter_fulltext_4_issue(issue_fulltext_zip_file, parser))
 
-    fulltext_list = list()
-    page_no = 0
 
-    for fulltext_alto_file, issue_name in fulltext_alto_files:
-        page_no += 1
-        fulltext_list.append(alto_ocr_2_text_profile(fulltext_alto_file, issue_no=issue_name, page_no=page_no))
+def iter_fulltext_4_issue(issue_fulltext_zip_file, parser=None, word_boxes=False):
+    """
+    load fulltext of page from an issue in sequence, one page at a time
 
-    return fulltext_list
+    :param issue_fulltext_zip_file:
+    :param parser: name of the ALTO parser backend, see alto_ocr_2_text_profile()
+    :param word_boxes: whether to keep the coordinates of the words, see alto_ocr_2_text_profile()
+    :return: generator of FullTextProfile
+    """
+    page_no = 0
+    for fulltext_alto_file, issue_name in load_alto_ocr_files(issue_fulltext_zip_file):
+        page_no += 1
+        yield alto_ocr_2_text_profile(fulltext_alto_file, issue_no=issue_name, page_no=page_no, parser=parser,
+                                      word_boxes=word_boxes)
 
 
 def load_alto_ocr_files(fulltext_zip_file_path):
     """
     load fulltext of issue from alto zip file of an issue in order
 
+    Pages are not read into memory: each is a binary file object streaming (and decompressing) the page out of the
+    zip file, which is only valid until the next page is requested. The zip file is closed once all pages have been
+    iterated, or when the generator is closed.
+
     :param fulltext_zip_file_path: absolute path of zipped alto file
-    :return: generator, list of OCR file content in order
+    :return: generator, (OCR file object, issue name) in page order
     """
     print("loading fulltext files from [%s] ... " % fulltext_zip_file_path)
-    zipped_alto_files = zipfile.ZipFile(fulltext_zip_file_path)
-    issue_name = os.path.basename(zipped_alto_files.filename).replace(".alto.zip", "")
-    # adapt for National_Library_of_the_Netherlands dataset
-    issue_name = issue_name.replace('_',' ')
-    print("issue name: ", issue_name)
-    alto_files = zipped_alto_files.filelist
-    print("total alto file size: ", len(alto_files))
-    # example file name: 1794-06-15_alto/79.alto.xml
-    for f in sorted(zipped_alto_files.namelist(), key=lambda f_name: int(f_name.split("/")[1].split(".")[0])):
-        xml_content = zipped_alto_files.read(f)
-        # xml_content = codecs.decode(xml_content, encoding='utf-8', errors='strict')
-        yield xml_content.decode(encoding='utf-8'), issue_name
+    with zipfile.ZipFile(fulltext_zip_file_path) as zipped_alto_files:
+        issue_name = os.path.basename(zipped_alto_files.filename).replace(".alto.zip", "")
+        # adapt for National_Library_of_the_Netherlands dataset
+        issue_name = issue_name.replace('_',' ')
+        print("issue name: ", issue_name)
+        alto_files = [f for f in zipped_alto_files.infolist() if not f.is_dir() and f.filename.lower().endswith(".xml")]
+        print("total alto file size: ", len(alto_files))
+        # example file name: 1794-06-15_alto/79.alto.xml
+        for f in sorted(alto_files, key=lambda alto_file: _page_sort_key(alto_file.filename)):
+            with zipped_alto_files.open(f) as alto_file:
+                yield alto_file, issue_name
+
+
+def _page_sort_key(alto_file_name):
+    """
+    sort key ordering page files by the numbers in their name, e.g., 2.alto.xml before 10.alto.xml, and
+    page_2.xml before page_10.xml
+
+    :param alto_file_name: file name in zip file, e.g., 1794-06-15_alto/79.alto.xml
+    :return: tuple
+    """
+    page_name = alto_file_name.rsplit("/", 1)[-1]
+    # numbers and text alternate after re.split, starting with (possibly empty) text
+    return tuple((0, int(part), "") if i % 2 else (1, 0, part)
+                 for i, part in enumerate(re.split(r'(\d+)', page_name)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Usage: python benchmark_alto_parsers.py [--repeat 3] [--parser etree --parser lxml] <alto_zip_file> [<alto_zip_file> ...]
+#
+# Compares the ALTO parser backends of alto_ocr_text over sample issues.
+#
+# All pages are read from the zip files into memory first, so that only parsing is timed. Every backend is checked
+# to give the same text blocks and page language as the first one, and its throughput is reported in pages per second.
+
+import argparse
+import sys
+import time
+import zipfile
+
+from alto_ocr_text import ALTO_PARSERS, alto_ocr_2_text_profile, load_alto_ocr_files
+
+
+def load_sample_pages(alto_zip_files):
+    pages = []
+    for alto_zip_file in alto_zip_files:
+        if not zipfile.is_zipfile(alto_zip_file):
+            print("skipping [%s], not a zip file" % alto_zip_file)
+            continue
+        pages.extend((alto_file.read(), issue_name) for alto_file, issue_name in load_alto_ocr_files(alto_zip_file))
+    return pages
+
+
+def profile_signature(fulltext_profile):
+    return (fulltext_profile.language,
+            [(text_block.language, text_block.content) for text_block in fulltext_profile.text_blocks])
+
+
+def benchmark_parser(parser, pages, repeat):
+    """
+    :return: tuple, (best pages per second over the repeats, page profile signatures of the last run)
+    """
+    best_elapsed = None
+    signatures = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        profiles = [alto_ocr_2_text_profile(page, issue_no=issue_name, parser=parser) for page, issue_name in pages]
+        elapsed = time.perf_counter() - start
+        if best_elapsed is None or elapsed < best_elapsed:
+            best_elapsed = elapsed
+        signatures = [profile_signature(profile) for profile in profiles]
+    return len(pages) / best_elapsed if best_elapsed else 0.0, signatures
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark of the ALTO parser backends")
+    arg_parser.add_argument('alto_zip_files', nargs='+', help="issue alto zip files to parse")
+    arg_parser.add_argument('--parser', action='append', choices=sorted(ALTO_PARSERS),
+                            help="backend to benchmark (repeatable), defaults to all")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="number of runs per backend, the best one is reported")
+    args = arg_parser.parse_args()
+
+    pages = load_sample_pages(args.alto_zip_files)
+    total_bytes = sum(len(page) for page, _ in pages)
+    print("loaded %d pages (%.1f MB) from %d files" % (len(pages), total_bytes / 1048576.0, len(args.alto_zip_files)))
+    if not pages:
+        sys.exit(1)
+
+    reference = None
+    mismatches = 0
+    for parser in args.parser or sorted(ALTO_PARSERS):
+        try:
+            pages_per_sec, signatures = benchmark_parser(parser, pages, args.repeat)
+        except ImportError as import_err:
+            print("%-8s not available: %s" % (parser, import_err))
+            continue
+        if reference is None:
+            reference = (parser, signatures)
+            check = "reference"
+        else:
+            differing = sum(1 for ref, sig in zip(reference[1], signatures) if ref != sig)
+            mismatches += differing
+            check = "identical to %s" % reference[0] if differing == 0 else "%d pages differ from %s" % (differing, reference[0])
+        print("%-8s %10.1f pages/sec  %8.2f MB/sec  (%s)" %
+              (parser, pages_per_sec, pages_per_sec * total_bytes / len(pages) / 1048576.0, check))
+
+    if mismatches:
+        sys.exit(1)
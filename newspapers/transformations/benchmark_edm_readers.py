@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Usage: python benchmark_edm_readers.py <edm_xml_file_or_directory> [<edm_xml_file_or_directory> ...]
+#
+# Checks the lightweight EDM reader of metadata_reader against rdflib over sample EDM files, and compares their speed.
+#
+# Every file is read with both readers, and the resulting BibliographicResource dicts must be equal (ignoring the
+# order of multi-valued fields). Files which the lightweight reader does not support are read with rdflib by both,
+# and are counted separately.
+
+import os
+import sys
+import time
+
+import metadata_reader
+from metadata_reader import load_edm_in_xml
+
+
+def find_edm_files(paths):
+    edm_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                edm_files.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(".edm.xml"))
+        else:
+            edm_files.append(path)
+    return edm_files
+
+
+def normalise(bb_resource):
+    return dict((attr, sorted(value) if isinstance(value, list) else value)
+                for attr, value in bb_resource.to_dict().items())
+
+
+def time_reader(edm_files, use_rdflib):
+    start = time.perf_counter()
+    resources = [load_edm_in_xml(edm_file, use_rdflib=use_rdflib) for edm_file in edm_files]
+    return time.perf_counter() - start, resources
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("python benchmark_edm_readers.py <edm_xml_file_or_directory> [<edm_xml_file_or_directory> ...]")
+        sys.exit(1)
+
+    edm_files = find_edm_files(sys.argv[1:])
+    print("%d EDM files" % len(edm_files))
+    if not edm_files:
+        sys.exit(1)
+
+    # count the files the lightweight reader hands over to rdflib
+    unsupported = 0
+    for edm_file in edm_files:
+        try:
+            metadata_reader._read_edm_rdf_xml(edm_file)
+        except (metadata_reader.UnsupportedRdfXml, metadata_reader.ET.ParseError):
+            unsupported += 1
+
+    rdflib_seconds, rdflib_resources = time_reader(edm_files, use_rdflib=True)
+    fast_seconds, fast_resources = time_reader(edm_files, use_rdflib=False)
+
+    mismatches = 0
+    for edm_file, rdflib_resource, fast_resource in zip(edm_files, rdflib_resources, fast_resources):
+        if normalise(rdflib_resource) != normalise(fast_resource):
+            mismatches += 1
+            print("MISMATCH [%s]" % edm_file)
+            expected, actual = normalise(rdflib_resource), normalise(fast_resource)
+            for attr in sorted(set(expected) | set(actual)):
+                if expected.get(attr) != actual.get(attr):
+                    print("  %s: rdflib %s, lightweight %s" % (attr, expected.get(attr), actual.get(attr)))
+
+    print("rdflib:      %8.1f files/sec" % (len(edm_files) / rdflib_seconds))
+    print("lightweight: %8.1f files/sec (%d files read with rdflib instead)" %
+          (len(edm_files) / fast_seconds, unsupported))
+    print("%d of %d files differ" % (mismatches, len(edm_files)))
+    if mismatches:
+        sys.exit(1)
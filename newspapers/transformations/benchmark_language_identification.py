@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Usage: python benchmark_language_identification.py <language_profiles.json> <alto_zip_file> [<alto_zip_file> ...]
+#
+# Measures language_identification over sample issues: the accuracy on pages with an ALTO language (use issues not
+# sampled by build_language_profiles.py), and the throughput in pages per second next to that of ALTO parsing, as
+# identification runs in the parse workers and should only add a fraction to the parsing time.
+
+import sys
+import time
+import zipfile
+
+from alto_ocr_text import iter_fulltext_4_issue
+from language_identification import load_language_identifier
+
+
+def load_sample_pages(alto_zip_files):
+    """
+    :return: tuple, (list of (ALTO language, page text), seconds spent parsing)
+    """
+    pages = []
+    start = time.perf_counter()
+    for alto_zip_file in alto_zip_files:
+        if not zipfile.is_zipfile(alto_zip_file):
+            print("skipping [%s], not a zip file" % alto_zip_file)
+            continue
+        pages.extend(((fulltext_page.language or "").split('-')[0], fulltext_page.to_fulltext())
+                     for fulltext_page in iter_fulltext_4_issue(alto_zip_file))
+    return pages, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("python benchmark_language_identification.py <language_profiles.json> <alto_zip_file> [<alto_zip_file> ...]")
+        sys.exit(1)
+
+    identifier = load_language_identifier(sys.argv[1])
+    print("profiles of %d languages: %s" % (len(identifier.languages), ", ".join(identifier.languages)))
+
+    pages, parse_seconds = load_sample_pages(sys.argv[2:])
+    print("parsed %d pages, %.1f pages/sec" % (len(pages), len(pages) / parse_seconds if parse_seconds else 0.0))
+    if not pages:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    identified = [identifier.identify(text) for _, text in pages]
+    identify_seconds = time.perf_counter() - start
+    print("identified %d pages, %.1f pages/sec (%.0f%% of the parsing time, %d cache hits)" %
+          (len(pages), len(pages) / identify_seconds, 100.0 * identify_seconds / parse_seconds, identifier.cache_hits))
+
+    start = time.perf_counter()
+    for _, text in pages:
+        identifier.identify(text)
+    print("identified them again from the cache, %.1f pages/sec" % (len(pages) / (time.perf_counter() - start)))
+
+    labelled = [(alto_language, language) for (alto_language, _), language in zip(pages, identified) if alto_language]
+    correct = sum(1 for alto_language, language in labelled if alto_language == language)
+    undecided = sum(1 for _, language in labelled if language is None)
+    if labelled:
+        print("accuracy on %d pages with ALTO language: %.1f%% (%d too short to identify)" %
+              (len(labelled), 100.0 * correct / len(labelled), undecided))
+        for alto_language, language in sorted(set(labelled), key=str):
+            if alto_language != language:
+                print("  %s identified as %s: %d pages" %
+                      (alto_language, language, labelled.count((alto_language, language))))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# Usage: python build_language_profiles.py [--max-pages 2000] [--issue-step 10] [--top-ngrams 3000] <language_profiles.json>
+#                                          <newspaper_library_directory> [<newspaper_library_directory> ...]
+#
+# Builds the character n-gram profiles of language_identification from the pages of library dumps whose ALTO
+# text blocks carry a language. Every --issue-step-th issue of every newspaper is read, and at most --max-pages pages
+# are sampled per language. The profiles are then used with newspaper_dumps_reader.py --language-profiles.
+
+import argparse
+import sys
+import zipfile
+from collections import Counter, defaultdict
+
+from alto_ocr_text import iter_fulltext_4_issue
+from language_identification import build_profiles, count_ngrams, normalise_text, save_profiles
+from library_catalogue import catalogue_library
+
+
+def collect_ngram_counts(issue_fulltext_paths, max_pages):
+    """
+    :return: tuple, (dict of language to Counter of n-grams, dict of language to number of pages)
+    """
+    ngram_counts = defaultdict(Counter)
+    pages = defaultdict(int)
+    for issue_fulltext_path in issue_fulltext_paths:
+        try:
+            for fulltext_page in iter_fulltext_4_issue(issue_fulltext_path):
+                # same normalisation as FullTextProfile.to_edm_json(), e.g., en-US
+                language = (fulltext_page.language or "").split('-')[0]
+                if not language or pages[language] >= max_pages:
+                    continue
+                ngram_counts[language].update(count_ngrams(normalise_text(fulltext_page.to_fulltext())))
+                pages[language] += 1
+        except zipfile.BadZipFile as badFileErr:
+            print("skipping [%s] !!! Error: %s" % (issue_fulltext_path, badFileErr))
+    return ngram_counts, pages
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Build language profiles from library dumps with ALTO languages")
+    arg_parser.add_argument('profiles_path', help="json file to write the profiles to")
+    arg_parser.add_argument('library_dirs', nargs='+', help="library directories containing one directory per newspaper")
+    arg_parser.add_argument('--max-pages', type=int, default=2000, help="maximum number of pages sampled per language")
+    arg_parser.add_argument('--issue-step', type=int, default=10, help="sample every nth issue of every newspaper")
+    arg_parser.add_argument('--top-ngrams', type=int, default=3000, help="number of n-grams kept per language")
+    args = arg_parser.parse_args()
+
+    issue_fulltext_paths = []
+    for library_dir in args.library_dirs:
+        for newspaper_dir, issues in catalogue_library(library_dir):
+            issue_fulltext_paths.extend(alto_zip_file for alto_zip_file, _ in issues[::max(1, args.issue_step)])
+    print("sampling [%s] issues" % len(issue_fulltext_paths))
+
+    ngram_counts, pages = collect_ngram_counts(issue_fulltext_paths, args.max_pages)
+    for language in sorted(pages):
+        print("%-6s %6d pages %8d distinct n-grams" % (language, pages[language], len(ngram_counts[language])))
+    if not pages:
+        print("no pages with ALTO language found")
+        sys.exit(1)
+
+    save_profiles(build_profiles(ngram_counts, top_ngrams=args.top_ngrams), args.profiles_path)
+    print("profiles of [%s] languages written to [%s]" % (len(pages), args.profiles_path))
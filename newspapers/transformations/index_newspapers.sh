@@ -1,2 +1,3 @@
 #!/usr/bin/env bash
-nohup ~/Python-3.6.3/python newspaper_dumps_reader.py <NEWSPAPERS_PROVIDER_DIRECTORY> > indexing_newspaper.log &
+# re-running resumes from the ledger, only issues not committed yet or changed since are indexed
+nohup ~/Python-3.6.3/python newspaper_dumps_reader.py --ledger indexing_ledger.db --commit-every 50000 <NEWSPAPERS_PROVIDER_DIRECTORY> > indexing_newspaper.log &
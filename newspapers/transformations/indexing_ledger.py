@@ -0,0 +1,95 @@
+"""
+Durable progress ledger of newspaper indexing runs.
+
+Every issue alto zip file is recorded in a sqlite database with its size, mtime, page count, status and the id of
+the Solr update request which carried its last documents. An issue is 'posted' once all its documents were accepted
+by Solr, and becomes 'committed' with the next hard commit; it is 'failed' if any of its documents could not be posted,
+or if the issue could not be parsed completely (e.g., an invalid zip file).
+
+A later run over the same library skips committed issues whose zip file is unchanged (same size and mtime), so that
+an interrupted run resumes where it stopped, and a re-run only indexes new or changed issues. Posted but uncommitted
+issues are indexed again, which is harmless as documents are replaced by id.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+STATUS_POSTED = "posted"
+STATUS_COMMITTED = "committed"
+STATUS_FAILED = "failed"
+
+
+class IndexingLedger(object):
+    """
+    usage:
+        ledger = IndexingLedger("indexing_ledger.db")
+        for issue_path in ledger.pending_issues(issue_paths):
+            ...
+            ledger.issue_posted(issue_path, pages, batch_id)
+        ledger.issues_committed(commit_start_time)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS issues (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                            "pages INTEGER, status TEXT, batch_id TEXT, updated REAL)")
+        # (size, mtime) of the issues of the current run, as found when they were scheduled
+        self._file_stats = {}
+
+    def pending_issues(self, issue_paths, stats=None):
+        """
+        :param issue_paths: iterable of issue alto zip files
+        :param stats: optional IndexingStats counting the skipped issues
+        :return: generator of the issues which are not committed in their current version
+        """
+        with self.lock:
+            committed = dict((row[0], (row[1], row[2])) for row in self.db.execute(
+                "SELECT path, size, mtime FROM issues WHERE status=?", (STATUS_COMMITTED,)))
+        for issue_path in issue_paths:
+            try:
+                file_stat = os.stat(issue_path)
+            except OSError as os_err:
+                print("Failed to stat issue [%s] !!! Error: %s" % (issue_path, os_err))
+                continue
+            file_version = (file_stat.st_size, file_stat.st_mtime)
+            if committed.get(issue_path) == file_version:
+                if stats is not None:
+                    stats.total_issues_skipped += 1
+                continue
+            self._file_stats[issue_path] = file_version
+            yield issue_path
+
+    def issue_posted(self, issue_path, pages, batch_id):
+        self._record(issue_path, pages, STATUS_POSTED, batch_id)
+
+    def issue_failed(self, issue_path, pages, batch_id):
+        self._record(issue_path, pages, STATUS_FAILED, batch_id)
+
+    def _record(self, issue_path, pages, status, batch_id):
+        size, mtime = self._file_stats.pop(issue_path, (None, None))
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (issue_path, size, mtime, pages, status, batch_id, time.time()))
+
+    def issues_committed(self, posted_before):
+        """
+        mark the issues posted before a successful hard commit as committed
+
+        :param posted_before: time the commit request was sent
+        :return: int, number of issues committed
+        """
+        with self.lock, self.db:
+            return self.db.execute("UPDATE issues SET status=?, updated=? WHERE status=? AND updated<=?",
+                                   (STATUS_COMMITTED, time.time(), STATUS_POSTED, posted_before)).rowcount
+
+    def status_counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM issues GROUP BY status").fetchall())
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,324 @@
+"""
+Bounded producer/consumer pipeline between issue parsing and Solr posting.
+
+The parsing side puts Solr documents on a bounded queue, and posting threads take them off in batches of at most
+batch_size documents. Parsing and Solr ingestion thus overlap, and a full queue blocks the parsing side (backpressure)
+rather than letting parsed documents pile up in memory. Every stage records how long it was busy and how long it
+waited on the other side, which shows where the bottleneck is.
+
+Update requests do not commit. Documents become visible through commitWithin and/or an explicit (soft or hard) commit
+every commit_every documents, and the pipeline always ends with one hard commit once everything has been posted.
+
+With an indexing_ledger.IndexingLedger, the pipeline tracks which issue every document belongs to, records an issue as
+posted once all its documents were posted (or as failed, also when the issue was not parsed completely), and marks
+posted issues committed after each hard commit.
+"""
+
+import itertools
+import queue
+import threading
+import time
+
+from SolrClient import encode_json_doc, iter_json_array
+
+
+class StageStats(object):
+    """
+    throughput and waiting time of a pipeline stage
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+        self.data_bytes = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.started = time.time()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def add(self, items=0, batches=0, errors=0, data_bytes=0, busy_seconds=0.0, wait_seconds=0.0):
+        with self.lock:
+            self.items += items
+            self.batches += batches
+            self.errors += errors
+            self.data_bytes += data_bytes
+            self.busy_seconds += busy_seconds
+            self.wait_seconds += wait_seconds
+
+    def finish(self):
+        self.finished = time.time()
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def throughput(self):
+        elapsed = self.elapsed()
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+    def report(self, unit, batch_unit, busy_label, wait_label):
+        print("[%s] %d %s in %d %s (%d failed), %.1f %s/sec over %.1fs; %s %.1fs, %s %.1fs" %
+              (self.name, self.items, unit, self.batches, batch_unit, self.errors, self.throughput(), unit,
+               self.elapsed(), busy_label, self.busy_seconds, wait_label, self.wait_seconds))
+
+
+class _IssueProgress(object):
+    """
+    posting progress of the documents of an issue
+    """
+    __slots__ = ("pending", "pages", "all_queued", "failed", "batch_id")
+
+    def __init__(self):
+        # documents queued but not posted yet
+        self.pending = 0
+        self.pages = 0
+        self.all_queued = False
+        self.failed = False
+        # last update request carrying documents of the issue
+        self.batch_id = None
+
+
+class SolrPostingPipeline(object):
+    """
+    posts Solr documents put on a bounded queue from a number of posting threads
+
+    usage:
+        pipeline = SolrPostingPipeline(solr_client, posting_threads=2, batch_size=1000, queue_size=5000,
+                                       commit_within=60000)
+        pipeline.start()
+        pipeline.put(solr_docs)
+        ...
+        pipeline.close()
+    """
+
+    # a partial batch is posted once no further document arrived within this time
+    MAX_BATCH_WAIT_SECONDS = 1.0
+
+    def __init__(self, solr_client, posting_threads=2, batch_size=1000, queue_size=5000, batch_bytes=8 * 1024 * 1024,
+                 commit_within=None, commit_every=None, soft_commit=False, ledger=None):
+        """
+        :param batch_size: maximum number of documents per update request
+        :param batch_bytes: maximum size of the JSON body of an update request, except for single larger documents
+        :param commit_within: commitWithin (milliseconds) of update requests, None to leave it to Solr's autoCommit
+        :param commit_every: explicit commit after every this many documents posted, None to commit at the end only
+        :param soft_commit: whether the commits every commit_every documents are soft commits
+        :param ledger: optional IndexingLedger recording the progress of the issues put
+        """
+        self.solr_client = solr_client
+        self.posting_threads = max(1, posting_threads)
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = batch_bytes
+        self.commit_within = commit_within
+        self.commit_every = commit_every
+        self.soft_commit = soft_commit
+        self.ledger = ledger
+        self.queue = queue.Queue(maxsize=max(queue_size, self.batch_size))
+        self.parse_stage = StageStats("parse")
+        self.post_stage = StageStats("post")
+        self.commit_stage = StageStats("commit")
+        self._uncommitted = 0
+        self._commit_lock = threading.Lock()
+        self._threads = []
+        self._run_id = time.strftime("%Y%m%d%H%M%S")
+        self._batch_ids = itertools.count(1)
+        # issue -> _IssueProgress, for the issues tracked in the ledger which are not done yet
+        self._issues = {}
+        self._issues_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.posting_threads):
+            thread = threading.Thread(target=self._post_documents, name="solr-poster-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, solr_docs, parse_wait_seconds=0.0, issue=None, issue_complete=None):
+        """
+        queue the documents of an issue for posting, blocking while the queue is full
+
+        solr_docs may be a generator parsing pages as they are taken, in which case the documents of an issue flow
+        through the bounded queue without ever being held together, and the time spent generating them is counted as
+        waiting for parsed issues.
+
+        :param solr_docs: iterable of solr docs
+        :param parse_wait_seconds: time the producer spent waiting for these documents to be parsed
+        :param issue: issue the documents belong to, tracked in the ledger
+        :param issue_complete: callable telling whether the issue was parsed completely, called once all its documents
+                               were taken (a generator only knows then). An incomplete issue is recorded as failed
+                               rather than posted, whatever happens to the documents it had.
+        """
+        tracked = self.ledger is not None and issue is not None
+        if tracked:
+            with self._issues_lock:
+                progress = self._issues[issue] = _IssueProgress()
+        start = time.time()
+        blocked_seconds = 0.0
+        docs = 0
+        for solr_doc in solr_docs:
+            if tracked:
+                with self._issues_lock:
+                    progress.pending += 1
+                    progress.pages += 1
+            put_start = time.time()
+            self.queue.put((issue if tracked else None, solr_doc))
+            blocked_seconds += time.time() - put_start
+            docs += 1
+        if tracked:
+            with self._issues_lock:
+                progress.all_queued = True
+                progress.failed = progress.failed or (issue_complete is not None and not issue_complete())
+            self._update_issues([issue], None, failed=False)
+        generating_seconds = time.time() - start - blocked_seconds
+        self.parse_stage.add(items=docs, batches=1, busy_seconds=blocked_seconds,
+                             wait_seconds=parse_wait_seconds + generating_seconds)
+
+    def close(self):
+        """
+        post the remaining documents and stop the posting threads
+
+        :return: int, number of documents posted
+        """
+        self.parse_stage.finish()
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.post_stage.finish()
+        self._commit(soft=False)
+        return self.post_stage.items
+
+    def report(self):
+        self.parse_stage.report("pages", "issues", "blocked on full queue", "waiting for parsed issues")
+        self.post_stage.report("docs", "requests", "posting", "idle (summed over threads)")
+        megabytes = self.post_stage.data_bytes / 1048576.0
+        print("[post] %.1f MB sent, %.2f MB/sec" % (megabytes, megabytes / max(self.post_stage.elapsed(), 1e-6)))
+        print("[commit] %d commits (%d failed), committing %.1fs" %
+              (self.commit_stage.batches, self.commit_stage.errors, self.commit_stage.busy_seconds))
+        if self.parse_stage.busy_seconds > self.post_stage.wait_seconds / self.posting_threads:
+            print("bottleneck: Solr posting (consider more posting threads)")
+        else:
+            print("bottleneck: issue parsing (consider more workers)")
+
+    def _next_batch(self, carried=None):
+        """
+        :param carried: (issue, serialised document) which did not fit into the previous batch, or None
+        :return: tuple, (list of (issue, serialised doc), (issue, serialised doc) exceeding the byte budget or None,
+                         True if the end of input was reached)
+        """
+        batch = [carried] if carried is not None else []
+        batch_bytes = len(carried[1]) if carried is not None else 0
+        while len(batch) < self.batch_size:
+            try:
+                # block until the first document of a batch arrives, then only briefly for the rest
+                queued = self.queue.get(timeout=self.MAX_BATCH_WAIT_SECONDS if batch else None)
+            except queue.Empty:
+                return batch, None, False
+            if queued is None:
+                return batch, None, True
+            issue, solr_doc = queued
+            try:
+                encoded_doc = encode_json_doc(solr_doc)
+            except Exception as encode_err:
+                # e.g., a TypeError for a value that is not JSON serializable, the document is dropped
+                print("Failed to encode a document of issue [%s] !!! Error: %s" % (issue, encode_err))
+                self.post_stage.add(errors=1)
+                self._update_issues([issue], "%s-unencoded" % self._run_id, failed=True)
+                continue
+            if batch and batch_bytes + len(encoded_doc) > self.batch_bytes:
+                return batch, (issue, encoded_doc), False
+            batch.append((issue, encoded_doc))
+            batch_bytes += len(encoded_doc) + 1
+        return batch, None, False
+
+    def _post_documents(self):
+        finished = False
+        carried = None
+        while not finished:
+            wait_start = time.time()
+            batch, carried, finished = self._next_batch(carried)
+            waited = time.time() - wait_start
+            if not batch:
+                self.post_stage.add(wait_seconds=waited)
+                continue
+
+            batch_id = "%s-%d" % (self._run_id, next(self._batch_ids))
+            post_start = time.time()
+            try:
+                # stream the body from the encoded documents rather than joining them into a copy
+                response = self.solr_client.update_json(iter_json_array(doc for _, doc in batch), commit=False,
+                                                        commit_within=self.commit_within)
+                print("[%s] indexed %d docs in batch [%s]. status: %s" %
+                      (threading.current_thread().name, len(batch), batch_id, response))
+                self.post_stage.add(items=len(batch), batches=1,
+                                    data_bytes=sum(len(doc) + 1 for _, doc in batch) + 1,
+                                    busy_seconds=time.time() - post_start, wait_seconds=waited)
+            except Exception as post_err:
+                # not only SolrError, e.g., a ValueError for a response which is not JSON: a posting thread must not
+                # die, or the parsing side blocks forever on the full queue
+                print("Failed to index batch [%s] of [%d] docs !!! Error: %s" % (batch_id, len(batch), post_err))
+                self.post_stage.add(batches=1, errors=1, busy_seconds=time.time() - post_start, wait_seconds=waited)
+                self._update_issues([issue for issue, _ in batch], batch_id, failed=True)
+                continue
+            self._update_issues([issue for issue, _ in batch], batch_id, failed=False)
+
+            if self.commit_every:
+                with self._commit_lock:
+                    self._uncommitted += len(batch)
+                    commit_due = self._uncommitted >= self.commit_every
+                    if commit_due:
+                        self._uncommitted = 0
+                if commit_due:
+                    self._commit(soft=self.soft_commit)
+
+    def _update_issues(self, issues, batch_id, failed):
+        """
+        count posted documents against their issues, and record the issues of which all documents are done
+
+        :param issues: issue of every document posted, None for untracked documents
+        :param batch_id: id of the update request, None if no documents were posted
+        :param failed: whether the update request failed
+        """
+        done = []
+        with self._issues_lock:
+            for issue in issues:
+                if issue is None:
+                    continue
+                progress = self._issues[issue]
+                if batch_id is not None:
+                    progress.pending -= 1
+                    progress.failed = progress.failed or failed
+                    progress.batch_id = batch_id
+                if progress.pending == 0 and progress.all_queued:
+                    done.append((issue, progress))
+                    del self._issues[issue]
+        for issue, progress in done:
+            try:
+                if progress.failed:
+                    self.ledger.issue_failed(issue, progress.pages, progress.batch_id)
+                else:
+                    self.ledger.issue_posted(issue, progress.pages, progress.batch_id)
+            except Exception as ledger_err:
+                # e.g., sqlite3.OperationalError, the issue is then indexed again by a resumed run
+                print("Failed to record issue [%s] in the ledger !!! Error: %s" % (issue, ledger_err))
+                self.post_stage.add(errors=1)
+
+    def _commit(self, soft):
+        commit_start = time.time()
+        try:
+            response = self.solr_client.commit(soft=soft)
+        except Exception as commit_err:
+            print("Failed to commit !!! Error: %s" % commit_err)
+            self.commit_stage.add(batches=1, errors=1, busy_seconds=time.time() - commit_start)
+            return
+        print("%s commit done. status: %s" % ("soft" if soft else "hard", response))
+        self.commit_stage.add(batches=1, busy_seconds=time.time() - commit_start)
+        if self.ledger is not None and not soft:
+            try:
+                self.ledger.issues_committed(commit_start)
+            except Exception as ledger_err:
+                # the issues stay posted in the ledger, and are indexed again by a resumed run
+                print("Failed to record the commit in the ledger !!! Error: %s" % ledger_err)
+                self.commit_stage.add(errors=1)
@@ -0,0 +1,152 @@
+"""
+Offline n-gram language identification of OCR page text.
+
+Pages whose ALTO blocks carry no language (e.g., the National Library of the Netherlands dumps) otherwise get the
+issue level dc:language. The identifier scores a sample of the page text against character trigram profiles with
+naive Bayes, and returns nothing when the sample is too short or no language is clearly ahead of the issue language.
+
+Profiles are built from the pages of the dumps which do carry an ALTO language (see build_language_profiles.py), so
+that they match historical OCR text rather than modern web text, and no network service or model download is needed.
+Results are cached per hash of the scored sample, as empty and boilerplate pages recur within a newspaper.
+
+usage:
+    identifier = load_language_identifier("language_profiles.json")
+    language = identifier.identify(page_text, prior="nl")
+"""
+
+import hashlib
+import json
+import math
+import re
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+NGRAM_ORDER = 3
+# language identification needs a few hundred characters, the middle of a page is sampled to keep it fast
+MAX_SAMPLE_CHARS = 2000
+MIN_SAMPLE_NGRAMS = 100
+# average log probability per n-gram by which a language must beat the prior language
+MIN_MARGIN = 0.05
+MAX_CACHED_TEXTS = 10000
+
+_NON_LETTERS_RE = re.compile(r'[\W\d_]+')
+
+
+def normalise_text(text, max_chars=MAX_SAMPLE_CHARS):
+    """
+    :return: lower case letters of (the middle of) the text, with every run of other characters as a single space
+    """
+    if len(text) > max_chars:
+        start = (len(text) - max_chars) // 2
+        text = text[start:start + max_chars]
+    return " " + _NON_LETTERS_RE.sub(" ", text).lower().strip() + " "
+
+
+def count_ngrams(normalised_text, order=NGRAM_ORDER):
+    return Counter(normalised_text[i:i + order] for i in range(len(normalised_text) - order + 1))
+
+
+class LanguageIdentifier(object):
+    """
+    naive Bayes language identification over character n-gram profiles
+    """
+
+    def __init__(self, profiles, min_margin=MIN_MARGIN, min_ngrams=MIN_SAMPLE_NGRAMS):
+        """
+        :param profiles: dict as built by build_profiles()
+        """
+        self.order = profiles["order"]
+        self.languages = sorted(profiles["languages"])
+        # language -> (dict of n-gram to log probability, log probability of unseen n-grams)
+        self.models = dict((language, (profile["ngrams"], profile["unseen"]))
+                           for language, profile in profiles["languages"].items())
+        self.min_margin = min_margin
+        self.min_ngrams = min_ngrams
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+
+    def identify(self, text, prior=None):
+        """
+        :param text: page text
+        :param prior: language to keep unless another one is clearly more likely, e.g., the issue language
+        :return: language code, or None if the text is too short or the most likely language is not clearly ahead of
+                 the prior, which the caller then keeps
+        """
+        # only the sample is scored, so pages with the same sample get the same language
+        sample = normalise_text(text)
+        cache_key = (hashlib.sha1(sample.encode('utf-8', 'surrogatepass')).digest(), prior)
+        if cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return self._cache[cache_key]
+
+        language = self._identify(sample, prior)
+        self._cache[cache_key] = language
+        if len(self._cache) > MAX_CACHED_TEXTS:
+            self._cache.popitem(last=False)
+        return language
+
+    def _identify(self, sample, prior):
+        """
+        :param sample: page text normalised with normalise_text()
+        """
+        ngram_counts = count_ngrams(sample, self.order)
+        total_ngrams = sum(ngram_counts.values())
+        if total_ngrams < self.min_ngrams:
+            return None
+
+        scores = self.scores(ngram_counts)
+        best_language = max(scores, key=scores.get)
+        if prior is not None and prior != best_language and prior in scores \
+                and (scores[best_language] - scores[prior]) / total_ngrams < self.min_margin:
+            # not identified, rather than the prior, so that callers can tell the two apart
+            return None
+        return best_language
+
+    def scores(self, ngram_counts):
+        """
+        :param ngram_counts: Counter of n-grams of a normalised text
+        :return: dict of language to log likelihood
+        """
+        ngram_counts = list(ngram_counts.items())
+        scores = {}
+        for language, (ngrams, unseen) in self.models.items():
+            scores[language] = sum(count * ngrams.get(ngram, unseen) for ngram, count in ngram_counts)
+        return scores
+
+
+def build_profiles(ngram_counts_by_language, top_ngrams=3000, order=NGRAM_ORDER):
+    """
+    :param ngram_counts_by_language: dict of language to Counter of n-grams of its training texts
+    :param top_ngrams: number of most frequent n-grams kept per language
+    :return: dict, the profiles of LanguageIdentifier
+    """
+    languages = {}
+    for language, ngram_counts in ngram_counts_by_language.items():
+        total = sum(ngram_counts.values())
+        if total == 0:
+            continue
+        # add-one smoothing over the kept n-grams, all others share the probability of an unseen n-gram
+        denominator = float(total + top_ngrams + 1)
+        languages[language] = {
+            "ngrams": dict((ngram, math.log((count + 1) / denominator))
+                           for ngram, count in ngram_counts.most_common(top_ngrams)),
+            "unseen": math.log(1 / denominator)}
+    return {"order": order, "languages": languages}
+
+
+def save_profiles(profiles, profiles_path):
+    with open(profiles_path, 'w', encoding='utf-8') as profiles_file:
+        json.dump(profiles, profiles_file, ensure_ascii=False)
+
+
+@lru_cache(maxsize=4)
+def load_language_identifier(profiles_path):
+    """
+    load the identifier once per process, e.g., in every parse worker
+
+    :param profiles_path: json file written by save_profiles()
+    :return: LanguageIdentifier
+    """
+    with open(profiles_path, encoding='utf-8') as profiles_file:
+        return LanguageIdentifier(json.load(profiles_file))
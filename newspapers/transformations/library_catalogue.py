@@ -0,0 +1,102 @@
+"""
+Catalogue of the newspapers and issues of a library dump, and prefetching of issue files.
+
+Library dumps are typically on NFS, where every listdir/isdir/isfile is a round trip to the server. The catalogue is
+built with os.scandir, whose entries carry the file type, listing the newspaper directories from a few threads in
+parallel. Each issue alto zip file is paired with its EDM file from the listing of its directory, rather than by
+probing the file system for every issue.
+
+prefetch_files() reads files ahead of their use from background threads, so that issues are in the page cache by the
+time the workers parse them.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_CHUNK_BYTES = 1024 * 1024
+
+
+def catalogue_library(library_dir, threads=8):
+    """
+    usage: catalogue = catalogue_library("/europeana-research-newspapers-dump-2nd/National_Library_of_France")
+
+    :param library_dir: library directory containing one directory per newspaper
+    :param threads: number of directories listed in parallel
+    :return: list of (newspaper directory, list of (issue alto zip file, issue edm xml file))
+    """
+    newspaper_dirs = list_newspaper_dirs(library_dir)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        return list(zip(newspaper_dirs, executor.map(catalogue_newspaper, newspaper_dirs)))
+
+
+def list_newspaper_dirs(library_dir):
+    with os.scandir(library_dir) as entries:
+        return [entry.path for entry in entries if entry.is_dir()]
+
+
+def catalogue_newspaper(newspaper_dir):
+    """
+    list the issues of a newspaper, paired with their EDM metadata file
+
+    Issue files are the *.alto.zip files starting with a digit (e.g. 1897-11-06.alto.zip), other zip files contain
+    all issues. The EDM file of 1897-11-06.alto.zip is 1897-11-06.edm.xml, and names with underscores may have
+    spaces instead in the EDM file name, e.g., in 'National_Library_of_the_Netherlands/Journal_d%27Amsterdam/'.
+
+    :param newspaper_dir: newspaper directory
+    :return: list of (issue alto zip file, issue edm xml file, which may not exist)
+    """
+    alto_file_names = []
+    file_names = set()
+    with os.scandir(newspaper_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            file_names.add(entry.name)
+            if entry.name.endswith(".alto.zip") and entry.name[0].isdigit():
+                alto_file_names.append(entry.name)
+
+    issues = []
+    for alto_file_name in alto_file_names:
+        edm_xml_file_name = alto_file_name.replace("alto.zip", "edm.xml")
+        if edm_xml_file_name not in file_names:
+            edm_xml_file_name = edm_xml_file_name.replace('_', ' ')
+        issues.append((os.path.join(newspaper_dir, alto_file_name), os.path.join(newspaper_dir, edm_xml_file_name)))
+    return issues
+
+
+def prefetch_files(items, ahead, files_of=lambda item: [item], threads=2):
+    """
+    read the files of the next items into the page cache while the items are consumed
+
+    :param items: iterable, e.g., of issue alto zip files
+    :param ahead: number of items read ahead of the one consumed, 0 to not prefetch
+    :param files_of: function giving the files of an item
+    :param threads: number of reading threads
+    :return: generator of the items
+    """
+    if ahead <= 0:
+        yield from items
+        return
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        prefetched = deque()
+        for item in items:
+            prefetched.append(item)
+            executor.submit(_read_files, files_of(item))
+            if len(prefetched) > ahead:
+                yield prefetched.popleft()
+        while prefetched:
+            yield prefetched.popleft()
+
+
+def _read_files(file_paths):
+    buffer = bytearray(PREFETCH_CHUNK_BYTES)
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb', buffering=0) as f:
+                while f.readinto(buffer):
+                    pass
+        except OSError:
+            # missing files are reported where they are used
+            pass
@@ -1,8 +1,12 @@
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import urldefrag, urlparse
+from urllib.parse import urldefrag
 
-import rdflib
 import json
+import os
+import re
+import xml.etree.ElementTree as ET
 
 """
 see also https://docs.google.com/document/d/1vhQstotXm4b-t8FHCzStHNCoz1dVzGFsaXLrn2vCPVI
@@ -12,7 +16,35 @@ supported_langs = ["de", "el", "en", "es", "et", "fi", "fr", "hr", "it", "la", "
                    "sv", "uk", "ar", "bg", "ca", "cz", "da", "eu", "fa", "ga", "gl", "hi", "hu", "hy", "id",
                    "no", "pt", "ro", "ja", "th", "tr", "ws", "und"]
 
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+RDF_TYPE = RDF_NS + "type"
+
+EDM_WEB_RESOURCE = "http://www.europeana.eu/schemas/edm/WebResource"
+EDM_PROVIDED_CHO = "http://www.europeana.eu/schemas/edm/ProvidedCHO"
+ORE_AGGREGATION = "http://www.openarchives.org/ore/terms/Aggregation"
+EDM_PLACE = "http://www.europeana.eu/schemas/edm/Place"
+SKOS_CONCEPT = "http://www.w3.org/2004/02/skos/core#Concept"
+EDM_TIME_SPAN = "http://www.europeana.eu/schemas/edm/TimeSpan"
+
+URI_SCHEME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.\-]*:')
+
+# field cache per newspaper title (directory of EDM files), see _get_title_field_cache()
+MAX_CACHED_TITLES = 16
+MAX_CACHED_TRIPLES_PER_TITLE = 50000
+_title_field_caches = OrderedDict()
+
+
 def _ns_prefix_uri(uriref_str, namespace_dict):
+    url, frag = _split_uri(uriref_str)
+    return "%s:%s"%(namespace_dict[url], frag)
+
+
+@lru_cache(maxsize=4096)
+def _split_uri(uriref_str):
+    """
+    split a predicate uri into namespace and local name, memoised as there are few distinct predicates
+    """
     if '#' in uriref_str:
         url, frag = urldefrag(uriref_str)
         url = url + "#"
@@ -21,7 +53,7 @@ def _ns_prefix_uri(uriref_str, namespace_dict):
         url = url_list[0] + "/"
         frag = url_list[1]
 
-    return "%s:%s"%(namespace_dict[url], frag)
+    return url, frag
 
 
 class BibliographicResource(object):
@@ -32,174 +64,331 @@ class BibliographicResource(object):
 
     see also EDM record requirements for creating the IIIF Manifests,
         https://docs.google.com/document/d/1vhQstotXm4b-t8FHCzStHNCoz1dVzGFsaXLrn2vCPVI
-    """
-    def __int__(self):
-        self.europeana_id = ""
-        self.issue_id = ""
-        self.dc_title = ""
-        self.dc_identifier = ""
-        self.dcterms_isPartOf = ""
-        self.dcterms_issued = ""
-
-        # same as "what" for Aggregated Field/Facet
-        # make it language specific ?
-        self.dc_type=[]
-        # where, location, subject for Aggregated Field/Facet
-        self.dcterms_spatial=[]
-        # when, subject for Aggregated Field/Facet
-        self.dcterms_temporal=[]
 
-
-        self.aggregation_edm_object = ""
-        self.aggregation_edm_aggregatedCHO = ""
-        self.aggregation_edm_rights = ""
-        # self.*_[lang] e.g., self.dc_type_en, self.dc_type_fr
+    Fields are read and set as attributes, and kept in the order they are first set. Multi-valued fields (see
+    add_value) are ordered sets, so that adding a value is O(1) and values keep the order they were first seen in;
+    they are turned into lists by to_dict().
+    """
+    __slots__ = ("_fields",)
+
+    def __init__(self):
+        # e.g., issue_id, proxy_dc_title, proxy_dc_identifier, proxy_dcterms_isPartOf, proxy_dcterms_issued,
+        #   proxy_dc_type (same as "what" for Aggregated Field/Facet),
+        #   proxy_dcterms_spatial (where, location, subject for Aggregated Field/Facet),
+        #   proxy_dcterms_temporal (when, subject for Aggregated Field/Facet),
+        #   provider_aggregation_edm_object, provider_aggregation_edm_aggregatedCHO, provider_aggregation_edm_rights
+        #   and their language specific variants, e.g., proxy_dc_type.en, proxy_dc_type.fr
+        # multi-valued fields are dicts used as ordered sets (values mapped to None)
+        object.__setattr__(self, "_fields", {})
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        try:
+            value = self._fields[attr]
+        except KeyError:
+            raise AttributeError(attr)
+        return list(value) if isinstance(value, dict) else value
+
+    def __setattr__(self, attr, value):
+        if attr.startswith("_"):
+            object.__setattr__(self, attr, value)
+        elif isinstance(value, list):
+            self._fields[attr] = dict.fromkeys(value)
+        else:
+            self._fields[attr] = value
+
+    def add_value(self, attr, value):
+        """
+        add a value to a multi-valued field, unless the field has it already
+        """
+        values = self._fields.get(attr)
+        if not isinstance(values, dict):
+            values = self._fields[attr] = {}
+        values[value] = None
 
     def to_json(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(self.to_dict())
 
     def to_dict(self):
-        return self.__dict__
+        return dict((attr, list(value) if isinstance(value, dict) else value) for attr, value in self._fields.items())
 
 
 def _add_attr_value_multi(obj, attr, value):
     if not _validate_value(attr, value):
         return
 
-    if hasattr(obj, attr):
-        current_value = getattr(obj, attr, [])
-        if str(value) not in current_value:
-            current_value.append(str(value))
-
-        # reduce duplications
-        current_value = list(set(current_value))
-        setattr(obj, attr, current_value)
-    else:
-        setattr(obj, attr, [str(value)])
+    obj.add_value(attr, str(value))
 
 
 def _add_attr_value_single(obj, attr, value):
     setattr(obj, attr, value)
 
 
-def load_edm_in_xml(edm_xml_path):
+def load_edm_in_xml(edm_xml_path, use_rdflib=False):
     """
     load EMD field from edm RDF/XML file
 
     see also http://preview.labs.eanadev.org/api/data-fields/
 
+    EDM files are read with a lightweight RDF/XML reader covering the subset of RDF/XML used in EDM (see
+    _read_edm_rdf_xml). Files using other RDF/XML constructs are read with rdflib.
+
     :param edm_xml_path: string
+    :param use_rdflib: always read the file with rdflib
     :return: BibliographicResource| None if file is not exist
     """
     if not Path(edm_xml_path).is_file():
         print(edm_xml_path, " not exist!")
         return None
 
-    graph_in_memory = rdflib.Graph("IOMemory")
+    edm_triples = None
+    if not use_rdflib:
+        try:
+            edm_triples = _read_edm_rdf_xml(edm_xml_path)
+        except (UnsupportedRdfXml, ET.ParseError) as unsupported_err:
+            print("reading [%s] with rdflib: %s" % (edm_xml_path, unsupported_err))
+    if edm_triples is None:
+        edm_triples = _read_edm_rdflib(edm_xml_path)
+
+    namespaces_dict, triples = edm_triples
+    bg_resource = BibliographicResource()
+
+    # load resource types
+    resource_type_dict = _load_resource_types(triples)
+
+    # most triples are the same in all issues of a title, so their fields are only worked out once per title
+    triple_fields_cache = _get_title_field_cache(edm_xml_path, namespaces_dict)
+
+    for resource_uri, pred, value, lang in triples:
+        resource_type = resource_type_dict.get(resource_uri)
+        triple_key = (resource_type, pred, value, lang)
+        triple_fields = triple_fields_cache.get(triple_key)
+        if triple_fields is None:
+            triple_fields = _map_triple_fields(resource_type, pred, value, lang, namespaces_dict)
+            if len(triple_fields_cache) >= MAX_CACHED_TRIPLES_PER_TITLE:
+                triple_fields_cache.clear()
+            triple_fields_cache[triple_key] = triple_fields
+
+        for attr_name, field_value in triple_fields:
+            if attr_name == "issue_id":
+                bg_resource.issue_id = resource_uri
+            elif attr_name == "ocr_confidence":
+                _add_attr_value_single(bg_resource, attr_name, field_value)
+            else:
+                _add_attr_value_multi(bg_resource, attr_name, field_value)
+
+    # print(bg_resource.to_json())
+    # print("resource type dictionary: ", resource_type_dict)
+
+    return bg_resource
+
+
+def _get_title_field_cache(edm_xml_path, namespaces_dict):
+    """
+    cache of the fields of the triples seen in the EDM files of a newspaper title
+
+    the fields of a triple depend on the namespace prefixes of the file, so the cache is reset when they change
+
+    :param edm_xml_path: EDM file of an issue, titles are told apart by directory
+    :return: dict, (resource type, predicate, value, language) to list of (field, value)
+    """
+    title_dir = os.path.dirname(os.path.abspath(edm_xml_path))
+    title_cache = _title_field_caches.pop(title_dir, None)
+    if title_cache is None or title_cache[0] != namespaces_dict:
+        title_cache = (namespaces_dict, {})
+    _title_field_caches[title_dir] = title_cache
+    if len(_title_field_caches) > MAX_CACHED_TITLES:
+        _title_field_caches.popitem(last=False)
+    return title_cache[1]
+
+
+def _map_triple_fields(resource_type, pred, value, lang, namespaces_dict):
+    """
+    work out the BibliographicResource fields set by a triple
+
+    :return: list of (field, value), where field 'issue_id' stands for the subject of the triple being the issue
+    """
+    triple_fields = []
+    abbv_pred = _ns_prefix_uri(pred, namespaces_dict)
+    if "rdf:type" == abbv_pred:
+        return triple_fields
+
+    attr_name = abbv_pred.replace(":","_")
+
+    # rare case: en-US, e.g., Te%C3%9Fmann_Library\Tiroler_Volksbote\1919-12-24.alto.zip
+    # do we need to differentiate UK english and US english ?
+    if lang is not None and '-' in lang:
+        lang = lang.split('-')[0]
+
+    # attr_name = edm_field_mapping.get(attr_name, attr_name)
+
+    # if resource (i.e.,resource_uri) is a web resource, the property/pred name should start with "wr_*"
+    # http://preview.labs.eanadev.org/api/data-fields/#edmwebresource
+    if resource_type == EDM_WEB_RESOURCE:
+        # print(resource_uri, " is a web resource!")
+        attr_name = "wr_" + attr_name
+
+    if resource_type == EDM_PROVIDED_CHO:
+        # http://preview.labs.eanadev.org/api/data-fields/#edmprovidedcho
+        # print(resource_uri, " is ProvidedCHO!")
+        attr_name = "proxy_" + attr_name
+
+    if resource_type == ORE_AGGREGATION:
+        # http://preview.labs.eanadev.org/api/data-fields/#oreaggregation
+        if attr_name == "edm:ugc":
+            attr_name = "edm_UGC"
+        else:
+            attr_name = "provider_aggregation_" + attr_name
+
+    if resource_type == EDM_PLACE:
+        # http://preview.labs.eanadev.org/api/data-fields/#edmplace
+        attr_name = "pl_" + attr_name
+
+    if resource_type == SKOS_CONCEPT:
+        # http://preview.labs.eanadev.org/api/data-fields/#skosconcept
+        attr_name = "cc_" + attr_name
+
+    if resource_type == EDM_TIME_SPAN:
+        # http://preview.labs.eanadev.org/api/data-fields/#edmTimeSpan
+        attr_name = "ts_" + attr_name
+
+    triple_fields.append((attr_name, value))
+    if lang:
+        triple_fields.append((attr_name+"."+lang, value))
+
+    if 'proxy_dc_title' == attr_name or 'proxy_dc_type' == attr_name or 'proxy_edm_type' == attr_name:
+        triple_fields.append(("issue_id", None))
+
+    # newspaper fulltext specific fields
+    if 'proxy_dc_format' == attr_name:
+        if "[OCR confidence]" in value:
+            ocr_confidence_value = None
+            try:
+                ocr_confidence_value = float(value.replace("[OCR confidence]", "").strip().replace(',','.'))
+            except:
+                print("ocr_confidence value conversion error. ignore this field. Original value: %s" % value)
+
+            if ocr_confidence_value:
+                triple_fields.append(("ocr_confidence", ocr_confidence_value))
+
+    return triple_fields
+
+
+class UnsupportedRdfXml(Exception):
+    pass
+
+
+def _read_edm_rdflib(edm_xml_path):
+    """
+    read the triples of an RDF/XML file with rdflib
+
+    :return: tuple, (dict of namespace uri to prefix, list of (subject, predicate, value, language) tuples)
+    """
+    import rdflib
+
+    # the default in-memory store, named IOMemory before rdflib 6
+    graph_in_memory = rdflib.Graph()
     g = graph_in_memory.parse(edm_xml_path,format="xml")
 
     namespaces = list(g.namespaces())
     # namespaces_dict = dict()
     namespaces_dict = dict([(str(ns), abv) for abv, ns in namespaces])
 
-    predicates = list(g.predicates(None, None))
+    triples = []
+    for resource_uri, pred, value in g:
+        lang = None
+        if isinstance(value, rdflib.term.Literal):
+            lang = value.language
+        triples.append((str(resource_uri), str(pred), str(value), lang))
+    return namespaces_dict, triples
 
-    bg_resource = BibliographicResource()
 
-    # load resource types
-    resource_type_dict = _load_resource_types(g, namespaces_dict, predicates)
+def _read_edm_rdf_xml(edm_xml_path):
+    """
+    read the triples of an EDM RDF/XML file without rdflib
 
-    for pred in predicates:
-        abbv_pred = _ns_prefix_uri(pred, namespaces_dict)
-        subject_object_tuples = g.subject_objects(pred)
-        if "rdf:type" == abbv_pred:
-            continue
+    Supported is the RDF/XML used in EDM: typed node elements or rdf:Description with rdf:about, whose property
+    elements have a literal value (with xml:lang or rdf:datatype), an rdf:resource, or a nested node element with
+    rdf:about. Anything else, e.g., blank nodes, relative URIs or rdf:parseType, raises UnsupportedRdfXml.
+
+    :return: tuple, (dict of namespace uri to prefix, list of (subject, predicate, value, language) tuples)
+    """
+    namespaces_dict = {RDF_NS: "rdf", XML_NS: "xml"}
+    context = ET.iterparse(edm_xml_path, events=("start-ns",))
+    for event, (prefix, uri) in context:
+        namespaces_dict[uri] = prefix
+    rdf_root = context.root
 
-        # print("pred: ", abbv_pred)
-        for obj_tuple in subject_object_tuples:
-            # print(obj_tuple)
-            resource_uri = obj_tuple[0]
-            value = obj_tuple[1]
-
-            attr_name = abbv_pred.replace(":","_")
-
-            lang=None
-            if isinstance(value, rdflib.term.Literal):
-                if hasattr(value, 'language'):
-                    lang = value.language
-                    # rare case: en-US, e.g., Te%C3%9Fmann_Library\Tiroler_Volksbote\1919-12-24.alto.zip
-                    # do we need to differentiate UK english and US english ?
-                    if lang is not None and '-' in lang:
-                        lang = lang.split('-')[0]
-
-            # attr_name = edm_field_mapping.get(attr_name, attr_name)
-
-            # if resource (i.e.,resource_uri) is a web resource, the property/pred name should start with "wr_*"
-            # http://preview.labs.eanadev.org/api/data-fields/#edmwebresource
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.europeana.eu/schemas/edm/WebResource'):
-                # print(resource_uri, " is a web resource!")
-                attr_name = "wr_" + attr_name
-
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.europeana.eu/schemas/edm/ProvidedCHO'):
-                # http://preview.labs.eanadev.org/api/data-fields/#edmprovidedcho
-                # print(resource_uri, " is ProvidedCHO!")
-                attr_name = "proxy_" + attr_name
-
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.openarchives.org/ore/terms/Aggregation'):
-                # http://preview.labs.eanadev.org/api/data-fields/#oreaggregation
-                if attr_name == "edm:ugc":
-                    attr_name = "edm_UGC"
-                else:
-                    attr_name = "provider_aggregation_" + attr_name
-
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.europeana.eu/schemas/edm/Place'):
-                # http://preview.labs.eanadev.org/api/data-fields/#edmplace
-                attr_name = "pl_" + attr_name
-
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.w3.org/2004/02/skos/core#Concept'):
-                # http://preview.labs.eanadev.org/api/data-fields/#skosconcept
-                attr_name = "cc_" + attr_name
-
-            if resource_uri in resource_type_dict \
-                    and resource_type_dict[resource_uri] == rdflib.term.URIRef('http://www.europeana.eu/schemas/edm/TimeSpan'):
-                # http://preview.labs.eanadev.org/api/data-fields/#edmTimeSpan
-                attr_name = "ts_" + attr_name
-
-            attr_name_lang_specific=None
-            if lang:
-                attr_name_lang_specific = attr_name+"."+lang
-
-            _add_attr_value_multi(bg_resource, attr_name, value)
-
-            if attr_name_lang_specific:
-                _add_attr_value_multi(bg_resource, attr_name_lang_specific, value)
-
-            if 'proxy_dc_title' == attr_name or 'proxy_dc_type' == attr_name or 'proxy_edm_type' == attr_name:
-                bg_resource.issue_id = str(resource_uri)
-
-            # newspaper fulltext specific fields
-            if 'proxy_dc_format' == attr_name:
-                if "[OCR confidence]" in value:
-                    ocr_confidence_value = None
-                    try:
-                        ocr_confidence_value = float(value.replace("[OCR confidence]", "").strip().replace(',','.'))
-                    except:
-                        print("ocr_confidence value conversion error. ignore this field. Original value: %s" % value)
-
-                    ocr_confidence_attr = "ocr_confidence"
-                    if ocr_confidence_value:
-                        _add_attr_value_single(bg_resource, ocr_confidence_attr, ocr_confidence_value)
+    if rdf_root.tag != "{%s}RDF" % RDF_NS:
+        raise UnsupportedRdfXml("root element is not rdf:RDF")
 
+    triples = []
+    for node_elem in rdf_root:
+        _read_rdf_node_element(node_elem, rdf_root.get("{%s}lang" % XML_NS), triples)
+    return namespaces_dict, triples
 
-    # print(bg_resource.to_json())
-    # print("resource type dictionary: ", resource_type_dict)
 
-    return bg_resource
+def _rdf_uri(elem, attr):
+    uri = elem.get("{%s}%s" % (RDF_NS, attr))
+    if uri is None or not URI_SCHEME_RE.match(uri):
+        raise UnsupportedRdfXml("missing or relative rdf:%s [%s] on %s" % (attr, uri, elem.tag))
+    return uri
+
+
+@lru_cache(maxsize=4096)
+def _qname_uri(qname):
+    """
+    :param qname: element or attribute name as given by ElementTree, e.g., '{http://purl.org/dc/elements/1.1/}title'
+    :return: uri, e.g., 'http://purl.org/dc/elements/1.1/title'
+    """
+    if not qname.startswith("{"):
+        raise UnsupportedRdfXml("name without namespace: %s" % qname)
+    return qname[1:].replace("}", "", 1)
+
+
+def _read_rdf_node_element(node_elem, lang, triples):
+    """
+    :return: subject uri of the node element
+    """
+    subject = _rdf_uri(node_elem, "about")
+    lang = node_elem.get("{%s}lang" % XML_NS, lang)
+    if node_elem.tag != "{%s}Description" % RDF_NS:
+        triples.append((subject, RDF_TYPE, _qname_uri(node_elem.tag), None))
+
+    for attr, value in node_elem.attrib.items():
+        if attr.startswith("{%s}" % XML_NS) or attr == "{%s}about" % RDF_NS:
+            continue
+        if attr.startswith("{%s}" % RDF_NS) and attr != "{%s}type" % RDF_NS:
+            raise UnsupportedRdfXml("attribute %s on node element" % attr)
+        # property attributes
+        if attr == "{%s}type" % RDF_NS:
+            triples.append((subject, RDF_TYPE, value, None))
+        else:
+            triples.append((subject, _qname_uri(attr), value, lang))
+
+    for property_elem in node_elem:
+        predicate = _qname_uri(property_elem.tag)
+        if predicate.startswith(RDF_NS) and predicate != RDF_TYPE:
+            # rdf:li and containers
+            raise UnsupportedRdfXml("property element %s" % property_elem.tag)
+        property_lang = property_elem.get("{%s}lang" % XML_NS, lang)
+        for attr in property_elem.attrib:
+            if attr not in ("{%s}resource" % RDF_NS, "{%s}datatype" % RDF_NS, "{%s}lang" % XML_NS):
+                raise UnsupportedRdfXml("attribute %s on property element %s" % (attr, property_elem.tag))
+
+        if "{%s}resource" % RDF_NS in property_elem.attrib:
+            triples.append((subject, predicate, _rdf_uri(property_elem, "resource"), None))
+        elif len(property_elem):
+            if len(property_elem) > 1:
+                raise UnsupportedRdfXml("more than one node element in %s" % property_elem.tag)
+            triples.append((subject, predicate, _read_rdf_node_element(property_elem[0], property_lang, triples), None))
+        elif "{%s}datatype" % RDF_NS in property_elem.attrib:
+            # typed literals have no language
+            triples.append((subject, predicate, property_elem.text or "", None))
+        else:
+            triples.append((subject, predicate, property_elem.text or "", property_lang or None))
+    return subject
 
 
 def _validate_value(attr, value):
@@ -218,14 +407,11 @@ def _validate_value(attr, value):
     return True
 
 
-def _load_resource_types(g, namespaces_dict, predicates):
+def _load_resource_types(triples):
     resource_type_dict = {}
-    for pred in predicates:
-        abbv_pred = _ns_prefix_uri(pred, namespaces_dict)
-        subject_object_tuples = g.subject_objects(pred)
-        if "rdf:type" == abbv_pred:
-            for obj_tuple in subject_object_tuples:
-                resource_type_dict[obj_tuple[0]] = obj_tuple[1]
+    for resource_uri, pred, value, lang in triples:
+        if RDF_TYPE == pred:
+            resource_type_dict[resource_uri] = value
     return resource_type_dict
 
 # C:\Data\europeana\Te%C3%9Fmann_Library\Tiroler_Volksbote\1919-12-24.alto.zip
@@ -1,20 +1,68 @@
 #!/usr/bin/env python
-# Usage: python newspaper_dumps_reader.py <solr_server_url> <newspaper_library_directory>
+# Usage: python newspaper_dumps_reader.py [--solr-url URL] [--gzip] [--workers N] [--max-in-flight N] [--alto-parser etree|lxml]
+#                                        [--posting-threads N] [--batch-size N] [--batch-mb MB] [--queue-size N]
+#                                        [--commit-within MS] [--commit-every N [--soft-commit]] [--ledger FILE]
+#                                        [--discovery-threads N] [--prefetch N] [--language-profiles FILE]
+#                                        [--max-fulltext-chars N] [--word-boxes-dir DIR] <newspaper_library_directory>
 
+import itertools
 import os
+import time
+import warnings
 
 import zipfile
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from SolrClient import SolrClient, SolrError
+from indexing_ledger import IndexingLedger
+from indexing_pipeline import SolrPostingPipeline
+from language_identification import load_language_identifier
+from library_catalogue import catalogue_library, catalogue_newspaper, list_newspaper_dirs, prefetch_files
 from metadata_reader import load_edm_in_xml, BibliographicResource
-from alto_ocr_text import extract_fulltext_4_issue
+from word_boxes import WordBoxWriter, word_boxes_path
+from alto_ocr_text import iter_fulltext_4_issue
 
-solrClient = SolrClient("http://144.76.218.178:9192/solr/fulltext")
+SOLR_URL = "http://144.76.218.178:9192/solr/fulltext"
+solrClient = SolrClient(SOLR_URL)
 
-# global statistics
-invalid_fulltext_file = 0
-fulltext_without_edm_metadata = 0
-fulltext_without_page_level_lang = 0
-total_page_indexed = 0
+
+
+class IndexingStats(object):
+    """
+    statistics of an indexing run
+
+    every worker process counts into its own instance, which are merged into the totals of the run
+    """
+    COUNTERS = ("total_issues", "total_page_indexed", "invalid_fulltext_file", "fulltext_without_edm_metadata",
+                "fulltext_without_page_level_lang", "total_issues_skipped", "page_language_identified",
+                "fulltext_truncated", "fulltext_chars_truncated", "empty_fulltext_file")
+
+    def __init__(self):
+        for counter in self.COUNTERS:
+            setattr(self, counter, 0)
+
+    def merge(self, other):
+        for counter in self.COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+        return self
+
+    def issue_complete(self):
+        """
+        whether all pages of an issue were parsed, for the stats of a single issue once its documents were generated
+        """
+        return not self.invalid_fulltext_file and not self.empty_fulltext_file
+
+    def report(self):
+        print("total issues processed: ", self.total_issues)
+        print("total page indexed: ", self.total_page_indexed)
+        print("total documents without fulltext or fulltext file is invalid: ", self.invalid_fulltext_file)
+        print("total issues without any page: ", self.empty_fulltext_file)
+        print("total documents without edm metadata: ", self.fulltext_without_edm_metadata)
+        print("total documents without page level language: ", self.fulltext_without_page_level_lang)
+        print("total documents with page level language identified from text: ", self.page_language_identified)
+        print("total documents with fulltext truncated: %s (%s characters dropped)" %
+              (self.fulltext_truncated, self.fulltext_chars_truncated))
+        print("total issues skipped as already indexed: ", self.total_issues_skipped)
 
 
 def load_all_issues_fulltext(newspaper_dir):
@@ -26,28 +74,20 @@ def load_all_issues_fulltext(newspaper_dir):
     :param issue_dir:
     :return:
     """
-    all_alto_files = []
-    for file in os.listdir(newspaper_dir):
-        if file.endswith(".alto.zip"):
-            # skip entire issue alto zip file
-            if file[0].isdigit():
-                all_alto_files.append(os.path.join(newspaper_dir, file))
-    return all_alto_files
+    # entire issue alto zip files are skipped, see library_catalogue.catalogue_newspaper()
+    return [alto_zip_file for alto_zip_file, _ in catalogue_newspaper(newspaper_dir)]
 
 
 def load_all_newspapers_from_library(library_dir):
-    all_newspapers_dir = []
-    for newspaper_dir in os.listdir(library_dir):
-        newspaper_abs_dir = os.path.join(library_dir, newspaper_dir)
-        if os.path.isdir(newspaper_abs_dir):
-            all_newspapers_dir.append(newspaper_abs_dir)
-    return all_newspapers_dir
+    return list_newspaper_dirs(library_dir)
 
 
 def _get_edm_xml_file(alto_zip_file_path):
     """
 
     hard code for consistency file names in Netherlands library, e.g., 'National_Library_of_the_Netherlands/Journal_d%27Amsterdam/'
+
+    probes the file system, issues found through library_catalogue come with their EDM file already
     :param alto_zip_file_path:
     :return:
     """
@@ -63,65 +103,248 @@ def _get_edm_xml_file(alto_zip_file_path):
     return edm_xml_file_path
 
 
-def index_whole_library_newspapers(library_dir):
+def index_whole_library_newspapers(library_dir, workers=None, max_in_flight=None, alto_parser=None,
+                                   discovery_threads=8, **posting_options):
     """
 
     :param library_dir: library directory path that contains all the issues datasets
-    :return: None
+    :param workers: number of worker processes parsing issues, defaults to the number of cores
+    :param max_in_flight: maximum number of issues submitted to the workers and not yet indexed
+    :param alto_parser: ALTO parser backend, see alto_ocr_text.ALTO_PARSERS
+    :param discovery_threads: number of newspaper directories listed in parallel
+    :param posting_options: further options of index_issues()
+    :return: IndexingStats
     """
-    all_newspaper_dir = load_all_newspapers_from_library(library_dir)
-    print("total [%s] newspapers found from library [%s]" % (len(all_newspaper_dir), library_dir))
-    for newspaper_dir in all_newspaper_dir:
-        index_whole_newspaper_fulltext(newspaper_dir)
+    catalogue = catalogue_library(library_dir, threads=discovery_threads)
+    print("total [%s] newspapers found from library [%s]" % (len(catalogue), library_dir))
+    # issues of all newspapers are scheduled together, so that small newspapers do not leave workers idle
+    all_issue_files = []
+    edm_xml_files = {}
+    for newspaper_dir, issues in catalogue:
+        print("total [%s] issues found from newspaper [%s]" % (len(issues), newspaper_dir))
+        for alto_zip_file, edm_xml_file in issues:
+            all_issue_files.append(alto_zip_file)
+            edm_xml_files[alto_zip_file] = edm_xml_file
+
+    stats = index_issues(all_issue_files, workers=workers, max_in_flight=max_in_flight, alto_parser=alto_parser,
+                         edm_xml_files=edm_xml_files, **posting_options)
 
     print("all newspapers are indexed from library [%s] " % library_dir)
-    print("total page indexed: ", total_page_indexed)
-    print("total documents without fulltext or fulltext file is invalid: ", invalid_fulltext_file)
-    print("total documents without edm metadata: ", fulltext_without_edm_metadata)
-    print("total documents without page level language: ", fulltext_without_page_level_lang)
+    stats.report()
+    return stats
 
 
-
-def index_whole_newspaper_fulltext(newspaper_dir):
+def index_whole_newspaper_fulltext(newspaper_dir, workers=None, max_in_flight=None, alto_parser=None, **posting_options):
     """
 
     :param newspaper_dir: issue directory path that contains all the page fulltext datasets of an issue
-    :return:
+    :return: IndexingStats
+    """
+    issues = catalogue_newspaper(newspaper_dir)
+    print("total [%s] issues found from newspaper [%s]" % (len(issues), newspaper_dir))
+    return index_issues([alto_zip_file for alto_zip_file, _ in issues], workers=workers, max_in_flight=max_in_flight,
+                        alto_parser=alto_parser, edm_xml_files=dict(issues), **posting_options)
+
+
+def index_issues(issue_fulltext_paths, workers=None, max_in_flight=None, alto_parser=None, posting_threads=2,
+                 batch_size=1000, queue_size=5000, batch_bytes=8 * 1024 * 1024, commit_within=None, commit_every=None,
+                 soft_commit=False, ledger=None, edm_xml_files=None, prefetch=0, language_profiles=None,
+                 max_fulltext_chars=None, word_boxes_dir=None):
     """
-    issue_all_issue_files = load_all_issues_fulltext(newspaper_dir)
-    print("total [%s] issues found from newspaper [%s]" % (len(issue_all_issue_files), newspaper_dir))
-    for issue_fulltext_path in issue_all_issue_files:
-        index_issue_page_fulltext(issue_fulltext_path)
+    index issues, parsing them in a pool of worker processes and posting them from a pool of threads
+
+    ALTO parsing and EDM loading are CPU bound and run in the workers. The resulting Solr documents are sent back to
+    this process and put on a bounded queue, from which posting threads send them to Solr in batches, so that
+    parsing and Solr ingestion overlap (see indexing_pipeline.SolrPostingPipeline). Batches span issues, and are only
+    committed according to the commit options and once at the end.
+
+    With a ledger, issues committed in a previous run are skipped unless their zip file changed since, and the
+    progress of the issues of this run is recorded as they are posted and committed. Issues with an invalid page or
+    without any page are recorded as failed, so that they are indexed again by later runs.
+
+    :param issue_fulltext_paths: list of issue alto zip files
+    :param workers: number of worker processes, defaults to the number of cores. 1 parses in this process.
+    :param max_in_flight: maximum number of issues being parsed, defaults to twice the number of workers
+    :param alto_parser: ALTO parser backend, see alto_ocr_text.ALTO_PARSERS
+    :param posting_threads: number of threads posting to Solr
+    :param batch_size: maximum number of documents per Solr update request
+    :param queue_size: maximum number of parsed documents waiting to be posted
+    :param batch_bytes: maximum size in bytes of a Solr update request
+    :param commit_within: commitWithin in milliseconds for update requests, None to rely on Solr's autoCommit
+    :param commit_every: explicit commit every this many documents, None to commit at the end only
+    :param soft_commit: use soft commits for the commits every commit_every documents
+    :param ledger: optional indexing_ledger.IndexingLedger
+    :param edm_xml_files: dict of issue alto zip file to its EDM file, e.g., from library_catalogue. The EDM file of
+                          other issues is looked up on the file system.
+    :param prefetch: number of issues read into the page cache ahead of parsing, 0 not to prefetch
+    :param language_profiles: profiles file of language_identification, to identify the language of pages without
+                              ALTO language. None to use the issue language for them.
+    :param max_fulltext_chars: maximum length of the fulltext of a page, the rest is dropped. None for no limit.
+    :param word_boxes_dir: directory to write the word coordinates of every issue to, see word_boxes. None not to
+                           keep them.
+    :return: IndexingStats
+    """
+    stats = IndexingStats()
+    edm_xml_files = edm_xml_files or {}
+    if ledger is not None:
+        issue_fulltext_paths = ledger.pending_issues(issue_fulltext_paths, stats)
+    issue_fulltext_paths = prefetch_files(
+        issue_fulltext_paths, prefetch,
+        files_of=lambda issue_fulltext_path: [issue_fulltext_path, edm_xml_files.get(issue_fulltext_path)
+                                              or _get_edm_xml_file(issue_fulltext_path)])
+    pipeline = SolrPostingPipeline(solrClient, posting_threads=posting_threads, batch_size=batch_size,
+                                   queue_size=queue_size, batch_bytes=batch_bytes, commit_within=commit_within,
+                                   commit_every=commit_every, soft_commit=soft_commit, ledger=ledger)
+    pipeline.start()
+    try:
+        wait_start = time.time()
+        for issue_fulltext_path, solr_docs, issue_stats in parse_issues(issue_fulltext_paths, workers, max_in_flight,
+                                                                         alto_parser, edm_xml_files, language_profiles,
+                                                                         max_fulltext_chars, word_boxes_dir):
+            parse_wait_seconds = time.time() - wait_start
+            # issues with an invalid or no page are recorded as failed in the ledger, and parsed again when resuming
+            pipeline.put(solr_docs, parse_wait_seconds, issue=issue_fulltext_path,
+                         issue_complete=issue_stats.issue_complete)
+            stats.merge(issue_stats)
+            wait_start = time.time()
+    finally:
+        stats.total_page_indexed = pipeline.close()
+    pipeline.report()
+    if ledger is not None:
+        print("ledger [%s] issues by status: %s" % (ledger.path, ledger.status_counts()))
+    return stats
+
+
+def parse_issues(issue_fulltext_paths, workers=None, max_in_flight=None, alto_parser=None, edm_xml_files=None,
+                 language_profiles=None, max_fulltext_chars=None, word_boxes_dir=None):
+    """
+    parse issues into Solr documents in a pool of worker processes
 
+    At most max_in_flight issues are submitted and not yet consumed at any time, which bounds the memory taken by
+    parsed documents when the consumer falls behind.
 
-def index_issue_page_fulltext(issue_fulltext_path):
+    With a single worker, issues are parsed in this process and their documents are generated lazily while the
+    consumer iterates over them, so that the IndexingStats of an issue are complete only after that.
+
+    :param edm_xml_files: dict of issue alto zip file to its EDM file, see index_issues()
+    :param language_profiles: profiles file of language_identification, see index_issues()
+    :param max_fulltext_chars: maximum length of the fulltext of a page, see index_issues()
+    :param word_boxes_dir: directory of the word coordinates sidecars, see index_issues()
+    :return: generator, (issue_fulltext_path, iterable of solr docs, IndexingStats of the issue) in order of completion
     """
+    edm_xml_files = edm_xml_files or {}
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or 2 * workers, workers)
+
+    if workers == 1:
+        for issue_fulltext_path in issue_fulltext_paths:
+            issue_stats = IndexingStats()
+            solr_docs = iter_issue_solr_docs(issue_fulltext_path, issue_stats, alto_parser,
+                                             edm_xml_files.get(issue_fulltext_path), language_profiles,
+                                             max_fulltext_chars, word_boxes_dir)
+            yield issue_fulltext_path, solr_docs, issue_stats
+        return
 
-    :param page_fulltext_path: page fulltext file of an issue
-    :return:
+    issue_fulltext_paths = iter(issue_fulltext_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            for issue_fulltext_path in issue_fulltext_paths:
+                pending.add(executor.submit(build_issue_solr_docs_task, issue_fulltext_path, alto_parser,
+                                            edm_xml_files.get(issue_fulltext_path), language_profiles,
+                                            max_fulltext_chars, word_boxes_dir))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def build_issue_solr_docs_task(issue_fulltext_path, alto_parser=None, edm_xml_file=None, language_profiles=None,
+                               max_fulltext_chars=None, word_boxes_dir=None):
     """
+    worker process entry point
+
+    The documents of an issue all share one issue metadata dict, which is pickled only once in the result.
+    As when parsing in a single process, an issue with an invalid page keeps the documents of the pages before it,
+    and is counted as invalid in its IndexingStats.
 
-    global invalid_fulltext_file
-    global fulltext_without_edm_metadata
-    global fulltext_without_page_level_lang
-    global total_page_indexed
+    :return: tuple, (issue_fulltext_path, list of solr docs, IndexingStats of the issue)
+    """
+    issue_stats = IndexingStats()
+    solr_docs = list(iter_issue_solr_docs(issue_fulltext_path, issue_stats, alto_parser, edm_xml_file,
+                                          language_profiles, max_fulltext_chars, word_boxes_dir))
+    return issue_fulltext_path, solr_docs, issue_stats
 
-    parsing_err = False
-    issue_fulltext_pages = []
+
+def index_issue_page_fulltext(issue_fulltext_path, stats=None, alto_parser=None, language_profiles=None,
+                              max_fulltext_chars=None, word_boxes_dir=None, commit_within=None, commit=False):
+    """
+    index a single issue in one update request
+
+    Deprecated, use index_issues(), which batches the documents of many issues and commits them according to its
+    commit options. As there, the update request does not commit by default: the documents become visible through
+    commit_within or Solr's autoCommit.
+
+    :param page_fulltext_path: page fulltext file of an issue
+    :param stats: IndexingStats to count into
+    :param alto_parser: ALTO parser backend, see alto_ocr_text.ALTO_PARSERS
+    :param language_profiles: profiles file of language_identification, see index_issues()
+    :param max_fulltext_chars: maximum length of the fulltext of a page, see index_issues()
+    :param word_boxes_dir: directory of the word coordinates sidecars, see index_issues()
+    :param commit_within: commitWithin in milliseconds for the update request, see index_issues()
+    :param commit: hard commit with the update request, e.g., for the last issue of a run
+    :return:
+    """
+    warnings.warn("index_issue_page_fulltext() is deprecated, use index_issues()", DeprecationWarning, stacklevel=2)
+    stats = stats if stats is not None else IndexingStats()
+    solr_docs = iter_issue_solr_docs(issue_fulltext_path, stats, alto_parser, language_profiles=language_profiles,
+                                     max_fulltext_chars=max_fulltext_chars, word_boxes_dir=word_boxes_dir)
+    first_solr_doc = next(solr_docs, None)
+    if first_solr_doc is not None:
+        post_issue_solr_docs(issue_fulltext_path, itertools.chain([first_solr_doc], solr_docs), stats,
+                             commit_within=commit_within, commit=commit)
+
+
+def iter_issue_solr_docs(issue_fulltext_path, stats, alto_parser=None, edm_xml_file=None, language_profiles=None,
+                         max_fulltext_chars=None, word_boxes_dir=None):
+    """
+    combine the page fulltext of an issue with the issue metadata into Solr documents
+
+    Pages are parsed one at a time as the documents are consumed. Every document is a ChainMap of its page fields
+    over the issue metadata dict, which is shared by all pages of the issue rather than copied into each of them.
+    The issue is counted as invalid if its fulltext file is, and nothing more is yielded from the invalid page on.
+    The pages yielded before it are kept, whether they are generated lazily or in a worker process, as they may
+    already be consumed.
+
+    :param issue_fulltext_path: alto zip file of an issue
+    :param stats: IndexingStats to count into
+    :param alto_parser: ALTO parser backend, see alto_ocr_text.ALTO_PARSERS
+    :param edm_xml_file: EDM metadata file of the issue, None to look it up next to the alto zip file
+    :param language_profiles: profiles file of language_identification, see index_issues()
+    :param max_fulltext_chars: maximum length of the fulltext of a page, see index_issues()
+    :param word_boxes_dir: directory of the word coordinates sidecars, see index_issues(). The sidecar of the issue is
+                           written from the same parsing pass, and completed once all its documents were generated.
+    :return: generator of solr docs
+    """
+    stats.total_issues += 1
+    issue_fulltext_pages = iter_fulltext_4_issue(issue_fulltext_path, parser=alto_parser,
+                                                 word_boxes=word_boxes_dir is not None)
     try:
-        issue_fulltext_pages = extract_fulltext_4_issue(issue_fulltext_path)
+        first_fulltext_page = next(issue_fulltext_pages, None)
     except zipfile.BadZipFile as badFileErr:
         # e.g., National_Library_of_Estonia\Postimees\1897-11-06.alto.zip is invalid
         print("Failed to index current issue [%s] !!! Error: %s " % (issue_fulltext_path, badFileErr))
-        invalid_fulltext_file += 1
-        parsing_err = True
-
-    if parsing_err:
+        stats.invalid_fulltext_file += 1
+        return
+    if first_fulltext_page is None:
+        print("total [0] pages loaded for issue [%s]" % issue_fulltext_path)
+        stats.empty_fulltext_file += 1
         return
 
-    print("total [%s] pages loaded for issue [%s]" %(len(issue_fulltext_pages), issue_fulltext_path))
-
-    bb_resource = load_edm_in_xml(_get_edm_xml_file(issue_fulltext_path))
+    bb_resource = load_edm_in_xml(edm_xml_file or _get_edm_xml_file(issue_fulltext_path))
 
     if bb_resource is None:
         # raise Exception("no edm metadata found for issue [%s]" % issue_fulltext_path)
@@ -130,45 +353,146 @@ def index_issue_page_fulltext(issue_fulltext_path):
         print("Warning: no edm metadata found for issue [%s]" % issue_fulltext_path)
         bb_resource = BibliographicResource()
         bb_resource.issue_id = os.path.basename(issue_fulltext_path).replace(".alto.zip", "")
-        fulltext_without_edm_metadata += 1
+        stats.fulltext_without_edm_metadata += 1
 
     bb_resource_dict = bb_resource.to_dict()
     issue_id = bb_resource_dict['issue_id']
     bb_resource_dict.pop('issue_id')
-    solr_docs = []
-    for issue_fulltext_page in issue_fulltext_pages:
-        if (issue_fulltext_page.language is None or issue_fulltext_page.language == '') \
-                and 'proxy_dc_language' in bb_resource_dict:
-            # language is not available in National_Library_of_the_Netherlands alto file dataset
-            # we use the language in issue level edm metadata temporarily instead if it is available
-            #   set page level language with issue level page
-            issue_fulltext_page.language = bb_resource_dict["proxy_dc_language"][0]
-            fulltext_without_page_level_lang += 1
-
-        # combine page fulltext with metadata into every individual Solr doc
-        solr_doc = {**issue_fulltext_page.to_edm_json(), **bb_resource_dict}
-        # set document id as a combination of issue id and page no
-        solr_doc['europeana_id'] = issue_id + "_" + str(issue_fulltext_page.page_no)
-        #todo good to have an indexing time field
-        solr_docs.append(solr_doc)
-
-    print("total [%s] solr document size to be indexed for issue [%s]: " % (len(solr_docs), issue_fulltext_path))
-
-    # print(solr_docs)
-    total_page_indexed += len(solr_docs)
-    response = solrClient.batch_update_documents(solr_docs)
+    issue_language = bb_resource_dict["proxy_dc_language"][0] if 'proxy_dc_language' in bb_resource_dict else None
+    language_identifier = load_language_identifier(language_profiles) if language_profiles else None
+    total_pages = 0
+    # the sidecar is only completed once every page was generated, e.g., not when the consumer gives up halfway
+    word_box_writer = WordBoxWriter(word_boxes_path(word_boxes_dir, issue_fulltext_path)) \
+        if word_boxes_dir is not None else None
+    try:
+        for issue_fulltext_page in itertools.chain([first_fulltext_page], issue_fulltext_pages):
+            total_pages += 1
+            if max_fulltext_chars is not None:
+                truncated_chars = issue_fulltext_page.truncate(max_fulltext_chars)
+                if truncated_chars:
+                    print("Warning: fulltext of page [%s] of issue [%s] truncated by [%s] characters" %
+                          (issue_fulltext_page.page_no, issue_fulltext_path, truncated_chars))
+                    stats.fulltext_truncated += 1
+                    stats.fulltext_chars_truncated += truncated_chars
+            if issue_fulltext_page.language is None or issue_fulltext_page.language == '':
+                # language is not available in National_Library_of_the_Netherlands alto file dataset
+                # we identify it from the page text, keeping the issue language unless another one is clearly
+                # more likely (no language is identified then, and the page counts as without page level language)
+                page_language = language_identifier.identify(issue_fulltext_page.to_fulltext(), prior=issue_language) \
+                    if language_identifier is not None else None
+                if page_language:
+                    issue_fulltext_page.language = page_language
+                    stats.page_language_identified += 1
+                elif issue_language is not None:
+                    # we use the language in issue level edm metadata temporarily instead if it is available
+                    #   set page level language with issue level page
+                    issue_fulltext_page.language = issue_language
+                    stats.fulltext_without_page_level_lang += 1
+
+            if word_box_writer is not None:
+                word_box_writer.add_page(issue_fulltext_page.page_no, issue_fulltext_page.word_boxes(),
+                                         len(issue_fulltext_page.to_fulltext()))
+
+            # combine page fulltext with metadata into every individual Solr doc (metadata over page fields)
+            # set document id as a combination of issue id and page no
+            #todo good to have an indexing time field
+            yield ChainMap({'europeana_id': issue_id + "_" + str(issue_fulltext_page.page_no)}, bb_resource_dict,
+                           issue_fulltext_page.to_edm_json())
+    except zipfile.BadZipFile as badFileErr:
+        # e.g., a page with a bad CRC-32, found only once the page is read
+        print("Failed to index current issue [%s] at page [%s] !!! Error: %s " %
+              (issue_fulltext_path, total_pages + 1, badFileErr))
+        stats.invalid_fulltext_file += 1
+        if word_box_writer is not None:
+            word_box_writer.discard()
+        return
+    except BaseException:
+        if word_box_writer is not None:
+            word_box_writer.discard()
+        raise
+    if word_box_writer is not None:
+        word_box_writer.close()
+
+    print("total [%s] pages loaded for issue [%s]" % (total_pages, issue_fulltext_path))
+
+
+def post_issue_solr_docs(issue_fulltext_path, solr_docs, stats, commit_within=None, commit=False):
+    """
+    post the documents of an issue in one update request, see index_issue_page_fulltext()
+
+    :param solr_docs: iterable of solr docs, streamed into the update request
+    :param commit_within: commitWithin in milliseconds for the update request, None to rely on Solr's autoCommit
+    :param commit: hard commit with the update request
+    """
+    posted_docs = [0]
+
+    def count_docs(docs):
+        for doc in docs:
+            posted_docs[0] += 1
+            yield doc
+
+    response = solrClient.batch_update_documents(count_docs(solr_docs), commit=commit, commit_within=commit_within)
+    stats.total_page_indexed += posted_docs[0]
+    print("total [%s] solr documents indexed for issue [%s]: " % (posted_docs[0], issue_fulltext_path))
     print("indexing done. status: ", response)
 
     print(">>>>>>>>>>>>>>>>>>>>>>>")
 
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) > 1:
-        news_paper_library_directory_path = str(sys.argv[1])
-        print("news_paper_library_directory_path: ", news_paper_library_directory_path)
-        index_whole_library_newspapers(news_paper_library_directory_path)
-    else:
-        print("python newspaper_dumps_reader.py <solr_server_url> <newspaper_library_directory>")
+    import argparse
+    from alto_ocr_text import ALTO_PARSERS
+
+    parser = argparse.ArgumentParser(description="Index the newspaper issues of a library dump into the fulltext Solr core")
+    parser.add_argument('newspaper_library_directory', help="library directory containing one directory per newspaper")
+    parser.add_argument('--solr-url', default=SOLR_URL, help="fulltext Solr core URL")
+    parser.add_argument('--gzip', action='store_true', help="gzip update requests (Solr must accept gzip bodies)")
+    parser.add_argument('--workers', type=int, default=None, help="number of parsing processes (default: number of cores)")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="maximum number of issues parsed ahead of indexing (default: twice the workers)")
+    parser.add_argument('--alto-parser', choices=sorted(ALTO_PARSERS), default=None, help="ALTO parser backend")
+    parser.add_argument('--posting-threads', type=int, default=2, help="number of threads posting to Solr")
+    parser.add_argument('--batch-size', type=int, default=1000, help="maximum number of documents per Solr update")
+    parser.add_argument('--queue-size', type=int, default=5000,
+                        help="maximum number of parsed documents waiting to be posted")
+    parser.add_argument('--batch-mb', type=float, default=8, help="maximum size of a Solr update request in MB")
+    parser.add_argument('--commit-within', type=int, default=None,
+                        help="commitWithin in milliseconds for updates (default: rely on Solr's autoCommit)")
+    parser.add_argument('--commit-every', type=int, default=None,
+                        help="explicit commit every N documents (default: a single commit at the end)")
+    parser.add_argument('--soft-commit', action='store_true', help="make the commits every N documents soft commits")
+    parser.add_argument('--ledger', default=None,
+                        help="sqlite progress ledger; issues committed in an earlier run with this ledger are skipped "
+                             "unless changed (resume points come from hard commits, see --commit-every)")
+    parser.add_argument('--discovery-threads', type=int, default=8,
+                        help="number of newspaper directories listed in parallel")
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help="number of issues read into the page cache ahead of parsing (default: no prefetch)")
+    parser.add_argument('--language-profiles', default=None,
+                        help="language profiles built by build_language_profiles.py, to identify the language of pages "
+                             "without ALTO language (default: use the issue language)")
+    parser.add_argument('--max-fulltext-chars', type=int, default=1000000,
+                        help="maximum length of the fulltext of a page, longer text is dropped (0 for no limit)")
+    parser.add_argument('--word-boxes-dir', default=None,
+                        help="directory to write the word coordinates of every issue to, for hit highlighting "
+                             "(default: not kept)")
+    args = parser.parse_args()
+
+    solrClient = SolrClient(args.solr_url, pool_size=max(10, args.posting_threads), gzip_requests=args.gzip)
+    news_paper_library_directory_path = args.newspaper_library_directory
+    print("news_paper_library_directory_path: ", news_paper_library_directory_path)
+    ledger = IndexingLedger(args.ledger) if args.ledger else None
+    index_whole_library_newspapers(news_paper_library_directory_path, workers=args.workers,
+                                   max_in_flight=args.max_in_flight, alto_parser=args.alto_parser,
+                                   posting_threads=args.posting_threads, batch_size=args.batch_size,
+                                   queue_size=args.queue_size, batch_bytes=int(args.batch_mb * 1024 * 1024),
+                                   commit_within=args.commit_within, commit_every=args.commit_every,
+                                   soft_commit=args.soft_commit, ledger=ledger,
+                                   discovery_threads=args.discovery_threads, prefetch=args.prefetch,
+                                   language_profiles=args.language_profiles,
+                                   max_fulltext_chars=args.max_fulltext_chars or None,
+                                   word_boxes_dir=args.word_boxes_dir)
+    if ledger is not None:
+        ledger.close()
 
 
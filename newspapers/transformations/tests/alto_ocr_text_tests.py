@@ -0,0 +1,117 @@
+import importlib.util
+import unittest
+from unittest import mock
+
+import alto_ocr_text
+from alto_ocr_text import FullTextProfile, TextBlock
+
+ALTO_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<alto xmlns="http://www.loc.gov/standards/alto/ns-v2#">
+  <Layout><Page ID="P1"><PrintSpace>
+    <TextBlock ID="B1" language="de">
+      <TextLine>
+        <String CONTENT="Zeitung" HPOS="10" VPOS="20" WIDTH="70" HEIGHT="12"/><SP/>
+        <String CONTENT="Ber" SUBS_TYPE="HypPart1" SUBS_CONTENT="Berlin" HPOS="90" VPOS="20" WIDTH="30" HEIGHT="12"/>
+        <HYP CONTENT="-"/>
+      </TextLine>
+      <TextLine>
+        <String CONTENT="lin" SUBS_TYPE="HypPart2" SUBS_CONTENT="Berlin" HPOS="10" VPOS="40" WIDTH="30" HEIGHT="12"/><SP/>
+        <String CONTENT="  am   Montag " HPOS="50" VPOS="40" WIDTH="90.6" HEIGHT="12"/>
+      </TextLine>
+    </TextBlock>
+    <TextBlock ID="B2" language="de">
+      <TextLine>
+        <String CONTENT="Haupt" HPOS="10" VPOS="60" WIDTH="50" HEIGHT="12"/>
+        <HYP CONTENT="-"/>
+      </TextLine>
+      <TextLine>
+        <String CONTENT="stadt" HPOS="10" VPOS="80" WIDTH="50" HEIGHT="12"/><SP/>
+        <String CONTENT="der&#10;Welt" HPOS="70" VPOS="80" WIDTH="80" HEIGHT="12"/>
+      </TextLine>
+    </TextBlock>
+    <TextBlock ID="B3" language="de"/>
+    <TextBlock ID="B4" language="de">
+      <TextLine>
+        <String CONTENT="Die" HPOS="10" VPOS="100" WIDTH="30" HEIGHT="12"/><SP/>
+        <String CONTENT="Presse  " HPOS="50" VPOS="100" WIDTH="60" HEIGHT="12"/>
+      </TextLine>
+    </TextBlock>
+  </PrintSpace></Page></Layout>
+</alto>
+"""
+
+PAGE_TEXT = "Zeitung Berlin am Montag\nHauptstadt der Welt\nDie Presse"
+
+
+def _page(*contents):
+    page = FullTextProfile("", "", 1)
+    page.text_blocks = [TextBlock("de", content) for content in contents]
+    return page
+
+
+class AltoTextTest(unittest.TestCase):
+
+    def test_dehyphenation_and_whitespace(self):
+        page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="etree")
+        # HypPart1/HypPart2 give SUBS_CONTENT, a HYP without it joins the parts, empty blocks are skipped
+        self.assertEqual(page.to_fulltext(), PAGE_TEXT)
+        self.assertEqual(page.language, "de")
+
+    def test_etree_parser_releases_elements(self):
+        page_with_other_blocks = ALTO_PAGE.replace(
+            '<TextBlock ID="B3" language="de"/>',
+            '<Illustration ID="I1"/><ComposedBlock ID="C1"><TextBlock ID="B3" language="de"/></ComposedBlock>')
+        parsed_elems = []
+        iterparse = alto_ocr_text.ET.iterparse
+
+        def recording_iterparse(source, events):
+            for event, elem in iterparse(source, events):
+                parsed_elems.append(elem)
+                yield event, elem
+
+        with mock.patch.object(alto_ocr_text.ET, "iterparse", recording_iterparse):
+            page = alto_ocr_text.alto_ocr_2_text_profile(page_with_other_blocks.encode('utf-8'), parser="etree")
+        self.assertEqual(page.to_fulltext(), PAGE_TEXT)
+        # every element was removed from its parent once parsed, not only the text blocks
+        self.assertEqual([elem.tag for elem in parsed_elems if len(elem)], [])
+
+    def test_truncate_at_word_boundary(self):
+        page = _page("Zeitung Berlin am Montag", "Hauptstadt")
+        self.assertEqual(page.truncate(12), 35 - 7)
+        self.assertEqual(page.to_fulltext(), "Zeitung")
+
+    def test_truncate_at_space(self):
+        page = _page("Zeitung Berlin am Montag")
+        self.assertEqual(page.truncate(14), 10)
+        self.assertEqual(page.to_fulltext(), "Zeitung Berlin")
+
+    def test_truncate_in_later_block(self):
+        page = _page("Zeitung Berlin am Montag", "", "Hauptstadt der Welt")
+        self.assertEqual(page.truncate(36), 44 - 35)
+        self.assertEqual(page.to_fulltext(), "Zeitung Berlin am Montag\nHauptstadt")
+
+    def test_truncate_long_word(self):
+        # a single word longer than the limit is cut within the word
+        page = _page("Donaudampfschifffahrt")
+        self.assertEqual(page.truncate(5), 16)
+        self.assertEqual(page.to_fulltext(), "Donau")
+
+    def test_truncate_short_page(self):
+        page = _page("Zeitung", "Berlin")
+        self.assertEqual(page.truncate(14), 0)
+        self.assertEqual(page.to_fulltext(), "Zeitung\nBerlin")
+
+
+@unittest.skipIf(importlib.util.find_spec('lxml') is None, "lxml is not installed")
+class AltoParsersTest(unittest.TestCase):
+
+    def test_same_text_as_etree(self):
+        etree_page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="etree")
+        lxml_page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="lxml")
+        self.assertEqual(lxml_page.to_fulltext(), PAGE_TEXT)
+        self.assertEqual([(block.language, block.content) for block in lxml_page.text_blocks],
+                         [(block.language, block.content) for block in etree_page.text_blocks])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from language_identification import LanguageIdentifier, build_profiles, count_ngrams, normalise_text
+
+GERMAN_TEXT = ("Die Zeitung berichtet heute über die Sitzung des Landtages in der Hauptstadt. Der Abgeordnete sprach "
+               "lange über die Eisenbahn und die Schule, und die Versammlung beschloss nach einer langen Debatte, "
+               "dass die neue Brücke über den Fluss im nächsten Jahr gebaut werden soll. Man erwartet, dass die "
+               "Arbeiter aus der Umgebung der Stadt dabei Beschäftigung finden werden.")
+ENGLISH_TEXT = ("The newspaper reports today on the meeting of the council in the capital. The member spoke at length "
+                "about the railway and the school, and after a long debate the assembly resolved that the new bridge "
+                "over the river should be built in the coming year. It is expected that the workers of the "
+                "surrounding country will find employment thereby.")
+
+
+def sample_profiles():
+    return build_profiles({"de": count_ngrams(normalise_text(GERMAN_TEXT)),
+                           "en": count_ngrams(normalise_text(ENGLISH_TEXT))}, top_ngrams=500)
+
+
+class LanguageIdentifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.identifier = LanguageIdentifier(sample_profiles(), min_ngrams=50)
+
+    def test_identify(self):
+        self.assertEqual(self.identifier.identify(GERMAN_TEXT), "de")
+        self.assertEqual(self.identifier.identify(ENGLISH_TEXT), "en")
+        # a clearly more likely language wins over the prior
+        self.assertEqual(self.identifier.identify(ENGLISH_TEXT, prior="de"), "en")
+        # a prior without profile is ignored
+        self.assertEqual(self.identifier.identify(GERMAN_TEXT, prior="nl"), "de")
+
+    def test_prior_margin(self):
+        identifier = LanguageIdentifier(sample_profiles(), min_margin=100.0, min_ngrams=50)
+        # the most likely language is not ahead of the prior by the margin, nothing is identified
+        self.assertIsNone(identifier.identify(ENGLISH_TEXT, prior="de"))
+        self.assertEqual(identifier.identify(ENGLISH_TEXT, prior="en"), "en")
+        self.assertEqual(identifier.identify(ENGLISH_TEXT), "en")
+
+    def test_min_ngrams(self):
+        self.assertIsNone(self.identifier.identify("Die Zeitung berichtet", prior="de"))
+        self.assertIsNone(self.identifier.identify(""))
+
+    def test_cache_keyed_on_sample(self):
+        self.assertEqual(self.identifier.identify(GERMAN_TEXT), "de")
+        # digits and punctuation are not part of the sample
+        self.assertEqual(self.identifier.identify(GERMAN_TEXT.replace(".", " 1881 ;")), "de")
+        self.assertEqual(self.identifier.cache_hits, 1)
+        # nor is text outside the middle of long pages
+        long_text = ENGLISH_TEXT * 20
+        self.assertEqual(self.identifier.identify("Die Zeitung " + long_text), "en")
+        self.assertEqual(self.identifier.identify("Le journal " + long_text), "en")
+        self.assertEqual(self.identifier.cache_hits, 2)
+        # the prior is part of the key
+        self.assertEqual(self.identifier.identify(GERMAN_TEXT, prior="de"), "de")
+        self.assertEqual(self.identifier.cache_hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import importlib.util
+import os
+import unittest
+
+import metadata_reader
+
+TESTFILES = os.path.join(os.path.dirname(__file__), 'testfiles')
+# plain EDM, read by _read_edm_rdf_xml
+EDM_FILE = os.path.join(TESTFILES, '1881-01-01.edm.xml')
+# the same with a relative rdf:resource, which is left to rdflib
+UNSUPPORTED_EDM_FILE = os.path.join(TESTFILES, '1882-01-01.edm.xml')
+
+
+def _fields(bg_resource):
+    # rdflib gives the triples in no particular order
+    return dict((attr, sorted(value) if isinstance(value, list) else value)
+                for attr, value in bg_resource.to_dict().items())
+
+
+class EdmRdfXmlReaderTest(unittest.TestCase):
+
+    def test_fields(self):
+        fields = _fields(metadata_reader.load_edm_in_xml(EDM_FILE))
+        self.assertEqual(fields['issue_id'], "http://data.theeuropeanlibrary.org/BibliographicResource/3000000001")
+        self.assertEqual(fields['ocr_confidence'], 0.85)
+        # xml:lang
+        self.assertEqual(fields['proxy_dc_title.de'], ["Tiroler Volksbote 1881-01-01"])
+        self.assertEqual(fields['proxy_dc_title'], ["Tiroler Volksbote", "Tiroler Volksbote 1881-01-01"])
+        # en-US is indexed as en
+        self.assertEqual(fields['proxy_dc_type.en'], ["Newspaper issue"])
+        # typed literals have no language
+        self.assertEqual(fields['proxy_dcterms_issued'], ["1881-01-01"])
+        # nested typed node
+        self.assertEqual(fields['proxy_dcterms_spatial'], ["http://sws.geonames.org/2775220/"])
+        self.assertEqual(fields['pl_skos_prefLabel.de'], ["Innsbruck"])
+        self.assertEqual(fields['pl_wgs84_pos_long'], ["11.39454"])
+        # rdf:Description with rdf:type
+        self.assertEqual(fields['cc_skos_prefLabel.fr'], ["Journaux"])
+        self.assertEqual(fields['wr_dc_format'], ["image/jpeg"])
+        self.assertEqual(fields['provider_aggregation_edm_dataProvider.en'], ["Teßmann Library"])
+
+    def test_unsupported_rdf_xml(self):
+        with self.assertRaises(metadata_reader.UnsupportedRdfXml):
+            metadata_reader._read_edm_rdf_xml(UNSUPPORTED_EDM_FILE)
+
+    def test_missing_file(self):
+        self.assertIsNone(metadata_reader.load_edm_in_xml(os.path.join(TESTFILES, 'missing.edm.xml')))
+
+
+@unittest.skipIf(importlib.util.find_spec('rdflib') is None, "rdflib is not installed")
+class EdmRdfXmlReaderVsRdflibTest(unittest.TestCase):
+
+    def test_same_fields_as_rdflib(self):
+        self.assertEqual(_fields(metadata_reader.load_edm_in_xml(EDM_FILE, use_rdflib=False)),
+                         _fields(metadata_reader.load_edm_in_xml(EDM_FILE, use_rdflib=True)))
+
+    def test_unsupported_rdf_xml_read_with_rdflib(self):
+        fields = _fields(metadata_reader.load_edm_in_xml(UNSUPPORTED_EDM_FILE, use_rdflib=False))
+        self.assertEqual(fields, _fields(metadata_reader.load_edm_in_xml(UNSUPPORTED_EDM_FILE, use_rdflib=True)))
+        self.assertTrue(fields['provider_aggregation_edm_object'][0].endswith("/testfiles/iiif/1/1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
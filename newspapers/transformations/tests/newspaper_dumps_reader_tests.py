@@ -0,0 +1,167 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import newspaper_dumps_reader
+from indexing_ledger import IndexingLedger
+from language_identification import LanguageIdentifier
+from newspaper_dumps_reader import IndexingStats, index_issue_page_fulltext, index_issues, iter_issue_solr_docs, \
+    parse_issues
+from tests.alto_ocr_text_tests import ALTO_PAGE
+from tests.language_identification_tests import ENGLISH_TEXT, sample_profiles
+
+EDM_XML_FILE = os.path.join(os.path.dirname(__file__), "testfiles", "1881-01-01.edm.xml")
+
+
+def write_issue_zip(path, pages, corrupt_page=None):
+    """
+    :param pages: ALTO content of every page
+    :param corrupt_page: number of a page whose content is changed after its CRC-32 was computed
+    """
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as issue_zip:
+        for page_no, page in enumerate(pages, 1):
+            issue_zip.writestr("1881-01-01_alto/%d.alto.xml" % page_no, page)
+    if corrupt_page is not None:
+        with open(path, "rb") as issue_zip:
+            data = issue_zip.read()
+        # the ALTO stays well-formed, only reading the page fails the CRC check
+        page_offset = data.index(b"1881-01-01_alto/%d.alto.xml" % corrupt_page)
+        word_offset = data.index(b'CONTENT="Zeitung"', page_offset) + len(b'CONTENT="')
+        with open(path, "wb") as issue_zip:
+            issue_zip.write(data[:word_offset] + b"S" + data[word_offset + 1:])
+
+
+class ParseIssuesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _parse(self, issue_path, workers):
+        parsed = []
+        for parsed_issue_path, solr_docs, issue_stats in parse_issues([issue_path], workers=workers,
+                                                                      edm_xml_files={issue_path: EDM_XML_FILE}):
+            # the documents are taken before the stats are read, as they are generated lazily with one worker
+            parsed.append((parsed_issue_path, [doc['europeana_id'] for doc in solr_docs], issue_stats))
+        return parsed
+
+    def test_issue_with_invalid_page(self):
+        issue_path = os.path.join(self.tmp.name, "1881-01-01.alto.zip")
+        write_issue_zip(issue_path, [ALTO_PAGE, ALTO_PAGE, ALTO_PAGE], corrupt_page=2)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                [(parsed_issue_path, doc_ids, issue_stats)] = self._parse(issue_path, workers)
+                self.assertEqual(parsed_issue_path, issue_path)
+                # both modes keep the page before the invalid one, and count the issue as invalid
+                self.assertEqual(len(doc_ids), 1)
+                self.assertTrue(doc_ids[0].endswith("_1"))
+                self.assertEqual(issue_stats.invalid_fulltext_file, 1)
+
+    def test_valid_issue(self):
+        issue_path = os.path.join(self.tmp.name, "1881-01-01.alto.zip")
+        write_issue_zip(issue_path, [ALTO_PAGE, ALTO_PAGE])
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                [(_, doc_ids, issue_stats)] = self._parse(issue_path, workers)
+                self.assertEqual([doc_id.rsplit("_", 1)[1] for doc_id in doc_ids], ["1", "2"])
+                self.assertEqual(issue_stats.invalid_fulltext_file, 0)
+
+    def test_page_language_identified(self):
+        # a page without ALTO language, in another language than the issue (de, see EDM_XML_FILE)
+        english_page = ('<alto xmlns="http://www.loc.gov/standards/alto/ns-v2#"><Layout><Page><PrintSpace><TextBlock>'
+                        '<TextLine><String CONTENT="%s"/></TextLine></TextBlock></PrintSpace></Page></Layout></alto>'
+                        % ENGLISH_TEXT)
+        issue_path = os.path.join(self.tmp.name, "1881-01-01.alto.zip")
+        write_issue_zip(issue_path, [english_page])
+        for min_margin, language, identified in ((0.05, "en", 1), (100.0, "de", 0)):
+            with self.subTest(min_margin=min_margin):
+                identifier = LanguageIdentifier(sample_profiles(), min_margin=min_margin)
+                stats = IndexingStats()
+                with mock.patch.object(newspaper_dumps_reader, "load_language_identifier", return_value=identifier):
+                    [solr_doc] = iter_issue_solr_docs(issue_path, stats, edm_xml_file=EDM_XML_FILE,
+                                                      language_profiles="language_profiles.json")
+                self.assertEqual(solr_doc['language'], [language])
+                # the issue language kept as the prior does not count as identified
+                self.assertEqual(stats.page_language_identified, identified)
+                self.assertEqual(stats.fulltext_without_page_level_lang, 1 - identified)
+
+
+class _SolrStub(object):
+
+    def update_json(self, data, commit=False, commit_within=None):
+        b"".join(data)
+        return {}
+
+    def commit(self, soft=False, open_searcher=True):
+        return {}
+
+
+class ResumeIndexingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.valid_issue = os.path.join(self.tmp.name, "1881-01-01.alto.zip")
+        self.invalid_issue = os.path.join(self.tmp.name, "1881-01-02.alto.zip")
+        self.empty_issue = os.path.join(self.tmp.name, "1881-01-03.alto.zip")
+        write_issue_zip(self.valid_issue, [ALTO_PAGE])
+        write_issue_zip(self.invalid_issue, [ALTO_PAGE, ALTO_PAGE], corrupt_page=2)
+        write_issue_zip(self.empty_issue, [])
+        self.ledger = IndexingLedger(os.path.join(self.tmp.name, "ledger.db"))
+
+    def tearDown(self):
+        self.ledger.close()
+        self.tmp.cleanup()
+
+    def _index(self, workers):
+        issues = [self.valid_issue, self.invalid_issue, self.empty_issue]
+        with mock.patch.object(newspaper_dumps_reader, "solrClient", _SolrStub()):
+            return index_issues(issues, workers=workers, ledger=self.ledger,
+                                edm_xml_files=dict((issue, EDM_XML_FILE) for issue in issues))
+
+    def _statuses(self):
+        return dict(self.ledger.db.execute("SELECT path, status FROM issues"))
+
+    def test_resume_retries_incomplete_issues(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                self.ledger.db.execute("DELETE FROM issues")
+                stats = self._index(workers)
+                self.assertEqual((stats.total_issues, stats.total_issues_skipped), (3, 0))
+                # the page before the invalid one is posted, but neither incomplete issue counts as indexed
+                self.assertEqual(stats.total_page_indexed, 2)
+                self.assertEqual(self._statuses(), {self.valid_issue: "committed", self.invalid_issue: "failed",
+                                                    self.empty_issue: "failed"})
+
+                stats = self._index(workers)
+                self.assertEqual((stats.total_issues, stats.total_issues_skipped), (2, 1))
+                self.assertEqual(stats.invalid_fulltext_file, 1)
+                self.assertEqual(stats.empty_fulltext_file, 1)
+                self.assertEqual(self._statuses()[self.invalid_issue], "failed")
+
+
+
+class LegacyIndexingTest(unittest.TestCase):
+
+    def test_no_commit_per_issue(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            issue_path = os.path.join(tmp, "1881-01-01.alto.zip")
+            write_issue_zip(issue_path, [ALTO_PAGE, ALTO_PAGE])
+            solr_client = mock.Mock()
+            solr_client.batch_update_documents.side_effect = lambda docs, **params: list(docs)
+            stats = IndexingStats()
+            with mock.patch.object(newspaper_dumps_reader, "solrClient", solr_client), \
+                    mock.patch.object(newspaper_dumps_reader, "_get_edm_xml_file", return_value=EDM_XML_FILE), \
+                    self.assertWarns(DeprecationWarning):
+                index_issue_page_fulltext(issue_path, stats, commit_within=60000)
+            # the update request leaves the commit to commitWithin
+            solr_client.batch_update_documents.assert_called_once_with(mock.ANY, commit=False, commit_within=60000)
+            solr_client.commit.assert_not_called()
+            self.assertEqual(stats.total_page_indexed, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
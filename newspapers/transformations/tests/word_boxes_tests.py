@@ -0,0 +1,95 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import alto_ocr_text
+from tests.alto_ocr_text_tests import ALTO_PAGE
+from word_boxes import WordBoxReader, WordBoxWriter, word_boxes_path
+
+
+def _words(page):
+    text = page.to_fulltext()
+    return [text[start:start + length] for start, length, _, _, _, _ in page.word_boxes()]
+
+
+class WordBoxesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = word_boxes_path(self.tmp.name, "/dumps/Tiroler_Volksbote/1881-01-01.alto.zip")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_word_boxes_path(self):
+        self.assertEqual(self.path, os.path.join(self.tmp.name, "Tiroler_Volksbote", "1881-01-01.wordboxes"))
+
+    def test_round_trip(self):
+        small_boxes = [(0, 7, 10, 20, 70, 12), (8, 6, 65535, 0, 30, 12)]
+        # coordinates which do not fit uint16 are written as int32
+        large_boxes = [(0, 5, -3, 70000, 50, 12)]
+        with WordBoxWriter(self.path) as writer:
+            writer.add_page(1, small_boxes, 14)
+            writer.add_page(2, [], 0)
+            writer.add_page(3, large_boxes, 5)
+
+        with WordBoxReader(self.path) as reader:
+            self.assertEqual(sorted(reader.pages), [1, 2, 3])
+            # (number of words, length of the page fulltext, bytes per coordinate, offset of the data)
+            self.assertEqual(reader.pages[1][:3], (2, 14, 2))
+            self.assertEqual(reader.pages[2][:3], (0, 0, 2))
+            self.assertEqual(reader.pages[3][:3], (1, 5, 4))
+            self.assertEqual(reader.word_boxes(1), small_boxes)
+            self.assertEqual(reader.word_boxes(2), [])
+            self.assertEqual(reader.word_boxes(3), large_boxes)
+            starts, lengths, hposes, vposes, widths, heights = reader.page_columns(1)
+            self.assertEqual((starts.tolist(), hposes.tolist()), ([0, 8], [10, 65535]))
+            del starts, lengths, hposes, vposes, widths, heights
+
+    def test_discard(self):
+        writer = WordBoxWriter(self.path)
+        writer.add_page(1, [(0, 7, 10, 20, 70, 12)], 7)
+        writer.discard()
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+    def test_discard_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with WordBoxWriter(self.path) as writer:
+                writer.add_page(1, [(0, 7, 10, 20, 70, 12)], 7)
+                raise RuntimeError("parsing failed")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+    def test_page_word_boxes(self):
+        page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), page_no=1, parser="etree",
+                                                     word_boxes=True)
+        # words hyphenated across lines have a box per part
+        self.assertEqual(_words(page), ["Zeitung", "Berlin", "Berlin", "am", "Montag", "Hauptstadt", "Hauptstadt",
+                                        "der", "Welt", "Die", "Presse"])
+        self.assertEqual(page.word_boxes()[:3], [(0, 7, 10, 20, 70, 12), (8, 6, 90, 20, 30, 12),
+                                                 (8, 6, 10, 40, 30, 12)])
+        # WIDTH="90.6", rounded
+        self.assertEqual(page.word_boxes()[3], (15, 2, 50, 40, 91, 12))
+
+        with WordBoxWriter(self.path) as writer:
+            writer.add_page(page.page_no, page.word_boxes(), len(page.to_fulltext()))
+        with WordBoxReader(self.path) as reader:
+            self.assertEqual(reader.word_boxes(page.page_no), page.word_boxes())
+
+    def test_word_boxes_after_truncate(self):
+        page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="etree", word_boxes=True)
+        page.truncate(30)
+        self.assertEqual(page.to_fulltext(), "Zeitung Berlin am Montag\nHaupt")
+        # the box of the cut word is dropped with it
+        self.assertEqual(_words(page), ["Zeitung", "Berlin", "Berlin", "am", "Montag"])
+
+    @unittest.skipIf(importlib.util.find_spec('lxml') is None, "lxml is not installed")
+    def test_same_word_boxes_as_etree(self):
+        etree_page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="etree", word_boxes=True)
+        lxml_page = alto_ocr_text.alto_ocr_2_text_profile(ALTO_PAGE.encode('utf-8'), parser="lxml", word_boxes=True)
+        self.assertEqual(lxml_page.to_fulltext(), etree_page.to_fulltext())
+        self.assertEqual(lxml_page.word_boxes(), etree_page.word_boxes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Compact sidecar files of the word coordinates of newspaper issues.
+
+Indexing keeps only the page text of ALTO files. With word boxes enabled, the coordinates of every String are kept
+from the same parsing pass and written, per issue, to a sidecar file from which hit highlighting and IIIF annotations
+can be served without parsing ALTO again. Words are located by their offset and length in the page fulltext, i.e.
+the fulltext.<lang> field of the page document.
+
+File layout, little-endian:
+    header      magic b'WBOX', version (uint16), reserved (uint16), number of pages (uint32),
+                offset of the page table (uint64)
+    page data   per page, 8-byte aligned columns of its words:
+                start (uint32), hpos, vpos, width, height (uint16 if all fit, int32 otherwise), length (uint16)
+    page table  per page: page no, number of words, length of the page fulltext, bytes per coordinate (2 or 4),
+                all uint32, and the offset of its data (uint64)
+
+The columns are fixed size arrays, which WordBoxReader maps into memory without copying, e.g., to find the boxes of
+the words in a highlighted range of the text with a binary search over start.
+
+usage:
+    with WordBoxWriter("1897-11-06.wordboxes") as writer:
+        writer.add_page(fulltext_profile.page_no, fulltext_profile.word_boxes(), len(fulltext_profile.to_fulltext()))
+
+    with WordBoxReader("1897-11-06.wordboxes") as reader:
+        starts, lengths, hposes, vposes, widths, heights = reader.page_columns(1)
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'WBOX'
+VERSION = 1
+WORD_BOXES_SUFFIX = ".wordboxes"
+
+HEADER = struct.Struct('<4sHHIQ')
+PAGE_ENTRY = struct.Struct('<IIIIQ')
+MAX_UINT16 = 0xFFFF
+
+
+def word_boxes_path(word_boxes_dir, issue_fulltext_path):
+    """
+    sidecar file of an issue, in a directory per newspaper
+
+    :param issue_fulltext_path: e.g., .../Postimees/1897-11-06.alto.zip
+    :return: e.g., <word_boxes_dir>/Postimees/1897-11-06.wordboxes
+    """
+    newspaper_name = os.path.basename(os.path.dirname(os.path.abspath(issue_fulltext_path)))
+    issue_name = os.path.basename(issue_fulltext_path).replace(".alto.zip", "")
+    return os.path.join(word_boxes_dir, newspaper_name, issue_name + WORD_BOXES_SUFFIX)
+
+
+def _little_endian(column):
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+class WordBoxWriter(object):
+    """
+    writes the word boxes of the pages of an issue as they are parsed
+
+    The file is written under a temporary name and only renamed into place by close(), so that an issue interrupted
+    halfway leaves no truncated sidecar behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = path + ".tmp"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self._page_entries = list()
+
+    def add_page(self, page_no, word_boxes, text_length):
+        """
+        :param word_boxes: list of (start, length, hpos, vpos, width, height), see FullTextProfile.word_boxes()
+        :param text_length: length of the page fulltext the starts refer to
+        """
+        coordinates = [word_box[2:] for word_box in word_boxes]
+        coordinate_type = 'H' if all(0 <= value <= MAX_UINT16 for box in coordinates for value in box) else 'i'
+        columns = [array('I', [word_box[0] for word_box in word_boxes])]
+        columns.extend(array(coordinate_type, [box[i] for box in coordinates]) for i in range(4))
+        columns.append(array('H', [min(word_box[1], MAX_UINT16) for word_box in word_boxes]))
+
+        data_offset = self._file.tell()
+        for column in columns:
+            self._file.write(_little_endian(column).tobytes())
+        padding = -self._file.tell() % 8
+        if padding:
+            self._file.write(b'\0' * padding)
+        self._page_entries.append((int(page_no), len(word_boxes), text_length, columns[1].itemsize, data_offset))
+
+    def close(self):
+        table_offset = self._file.tell()
+        for page_entry in self._page_entries:
+            self._file.write(PAGE_ENTRY.pack(*page_entry))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, len(self._page_entries), table_offset))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class WordBoxReader(object):
+    """
+    reads a word boxes sidecar through a read-only memory map
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise NotImplementedError("word boxes are memory mapped as little-endian arrays")
+        with open(path, 'rb') as sidecar_file:
+            self._mmap = mmap.mmap(sidecar_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, page_count, table_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError("[%s] is not a word boxes file of version %s" % (path, VERSION))
+        # page no -> (number of words, length of the page fulltext, bytes per coordinate, offset of the data)
+        self.pages = dict()
+        for i in range(page_count):
+            page_no, word_count, text_length, coordinate_bytes, data_offset = \
+                PAGE_ENTRY.unpack_from(self._mmap, table_offset + i * PAGE_ENTRY.size)
+            self.pages[page_no] = (word_count, text_length, coordinate_bytes, data_offset)
+
+    def page_columns(self, page_no):
+        """
+        the memoryviews must be released before the reader is closed
+
+        :return: tuple of memoryviews over the file, (starts, lengths, hposes, vposes, widths, heights)
+        """
+        word_count, _, coordinate_bytes, offset = self.pages[page_no]
+        view = memoryview(self._mmap)
+        starts = view[offset:offset + 4 * word_count].cast('I')
+        offset += 4 * word_count
+        coordinate_type = 'H' if coordinate_bytes == 2 else 'i'
+        coordinates = list()
+        for _ in range(4):
+            coordinates.append(view[offset:offset + coordinate_bytes * word_count].cast(coordinate_type))
+            offset += coordinate_bytes * word_count
+        lengths = view[offset:offset + 2 * word_count].cast('H')
+        return (starts, lengths) + tuple(coordinates)
+
+    def word_boxes(self, page_no):
+        """
+        :return: list of (start, length, hpos, vpos, width, height), as written
+        """
+        return list(zip(*[column.tolist() for column in self.page_columns(page_no)]))
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()